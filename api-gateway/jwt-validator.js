@@ -1,6 +1,6 @@
 /**
  * JWT Validator for API Gateway
- * Validates RS256 JWT tokens and extracts user information
+ * Validates RS256/ES256 JWT tokens and extracts user information
  */
 
 const jwt = require('jsonwebtoken');
@@ -55,7 +55,9 @@ function validateToken(token) {
     const cleanToken = token.replace(/^Bearer\s+/i, '');
 
     jwt.verify(cleanToken, getKey, {
-      algorithms: ['RS256'],
+      // ES256 durante e após a migração de chaves; a chave de cada kid
+      // só verifica assinaturas do seu próprio tipo
+      algorithms: ['RS256', 'ES256'],
       audience: 'ava-microservices',
       issuer: 'ava-auth-service',
       clockTolerance: 30 // 30 seconds tolerance
@@ -175,6 +175,17 @@ const proxyOptions = {
   }
 };
 
+// Batch token introspection is internal only (services call auth_service directly)
+app.use('/auth/token/introspect', (req, res) => {
+  res.status(404).json({
+    error: 'Not Found',
+    message: 'The requested endpoint does not exist',
+    code: 'ENDPOINT_NOT_FOUND',
+    path: req.originalUrl,
+    requestId: req.headers['x-request-id']
+  });
+});
+
 // Auth service routes (no JWT validation needed for login/register)
 app.use('/auth', createProxyMiddleware({
   ...proxyOptions,
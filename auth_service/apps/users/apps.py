@@ -5,3 +5,12 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
     verbose_name = 'Usuários'
+
+    def ready(self):
+        # Sign and verify RS256/ES256 tokens with the keyring (several kids, rotation)
+        from rest_framework_simplejwt import state
+        from rest_framework_simplejwt.settings import api_settings
+        from .token_backend import KeyringTokenBackend
+
+        if not api_settings.ALGORITHM.startswith('HS'):
+            state.token_backend = KeyringTokenBackend.from_settings()
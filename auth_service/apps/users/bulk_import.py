@@ -0,0 +1,289 @@
+"""
+Bulk user import from CSV.
+
+Creating accounts one by one through ``create_user`` costs a serial password
+hash plus the email/username existence queries of the registration
+serializer for every user. Here the CSV is streamed in batches:
+
+    - rows are validated in the main process (model field validators, which
+      also enforce the column lengths, and password validators); rows repeating an email/username seen earlier in the file
+      are skipped before their password is hashed
+    - passwords are hashed in a process pool with the configured hasher,
+      and the next batch is hashed while the current one is inserted
+    - each batch is written with one ``bulk_create(ignore_conflicts=True)``,
+      so accounts that already exist are skipped by the unique email/username
+      constraints instead of per-row lookups; one query per batch then tells
+      which rows were created (the stored salted hash is the one just made)
+    - one query per batch drops accounts that already exist before hashing,
+      so re-running a file does not pay for its hashes again (the
+      constraints still decide for accounts created concurrently)
+
+Expected columns: email, username, first_name, last_name and, optionally,
+password (rows without one get an unusable password).
+
+Imports uploaded through the HTTP endpoint run out of band: the file is
+spooled to USER_IMPORT_DIR and ``manage.py import_users --job`` is started
+as a separate, lower-priority process that records the job status next to it.
+"""
+import csv
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+REQUIRED_COLUMNS = ('email', 'username', 'first_name', 'last_name')
+# Row errors kept in the result (the counters cover every row)
+MAX_REPORTED_ERRORS = 100
+# Niceness of import jobs started from the HTTP endpoint
+JOB_NICENESS = 10
+
+
+def missing_columns(fieldnames: Optional[Iterable[str]]) -> List[str]:
+    fieldnames = set(fieldnames or ())
+    return [column for column in REQUIRED_COLUMNS if column not in fieldnames]
+
+
+def _init_worker():
+    # Needed with the spawn start method; a forked worker is already set up
+    if not apps.ready:
+        django.setup()
+
+
+class UserImporter:
+    """
+    Streams CSV rows into users; ``result`` holds the counters and the first
+    MAX_REPORTED_ERRORS row errors.
+    """
+
+    def __init__(self, batch_size: int = 1000, workers: Optional[int] = None,
+                 max_rows: Optional[int] = None):
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.max_rows = max_rows
+        self.result: Dict[str, Any] = {
+            'rows': 0, 'created': 0, 'duplicates': 0, 'invalid': 0,
+            'truncated': False, 'errors': [],
+        }
+        self._seen_emails = set()
+        self._seen_usernames = set()
+
+    def run(self, lines: Iterable[str]) -> Dict[str, Any]:
+        reader = csv.DictReader(lines)
+        missing = missing_columns(reader.fieldnames)
+        if missing:
+            raise ValueError(f"Colunas ausentes no CSV: {', '.join(missing)}")
+
+        rows = enumerate(reader, start=2)  # line 1 is the header
+        if self.max_rows is not None:
+            rows = islice(rows, self.max_rows + 1)
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            pending = None
+            while True:
+                batch = self._next_batch(rows)
+                if not batch:
+                    break
+                batch = self._drop_existing(batch)
+                passwords = [user.password for user in batch if user.password is not None]
+                chunksize = max(1, len(passwords) // (self.workers * 4))
+                hashed = pool.map(make_password, passwords, chunksize=chunksize)
+                if pending is not None:
+                    self._insert(*pending)
+                pending = (batch, hashed)
+            if pending is not None:
+                self._insert(*pending)
+
+        logger.info(
+            f"User import: {self.result['rows']} rows, {self.result['created']} created, "
+            f"{self.result['duplicates']} duplicates, {self.result['invalid']} invalid"
+        )
+        return self.result
+
+    def _next_batch(self, rows) -> List[Any]:
+        batch = []
+        for line, row in rows:
+            if self.max_rows is not None and self.result['rows'] >= self.max_rows:
+                self.result['truncated'] = True
+                break
+            self.result['rows'] += 1
+            user = self._build_user(line, row)
+            if user is not None:
+                batch.append(user)
+                if len(batch) >= self.batch_size:
+                    break
+        return batch
+
+    def _build_user(self, line: int, row: Dict[str, Optional[str]]):
+        """
+        Unsaved user for the row, with the plain password still in
+        ``user.password`` (None for an unusable one), or None if skipped.
+        """
+        values = {field: (row.get(field) or '').strip() for field in REQUIRED_COLUMNS}
+        values['email'] = User.objects.normalize_email(values['email'])
+        password = row.get('password') or None
+        user = User(**values)
+
+        try:
+            for field in REQUIRED_COLUMNS:
+                if not values[field]:
+                    raise ValidationError(f'Campo obrigatório vazio: {field}')
+            # Model validators: email/username format and max_length (a value
+            # over the column size would abort the whole batch with DataError)
+            user.clean_fields(exclude=['password'])
+            if password is not None:
+                validate_password(password, user)
+        except ValidationError as e:
+            if hasattr(e, 'error_dict'):
+                message = ' '.join(f"{field}: {' '.join(messages)}"
+                                   for field, messages in e.message_dict.items())
+            else:
+                message = ' '.join(e.messages)
+            self._error(line, values['email'], message)
+            self.result['invalid'] += 1
+            return None
+
+        if values['email'] in self._seen_emails or values['username'] in self._seen_usernames:
+            self.result['duplicates'] += 1
+            return None
+        self._seen_emails.add(values['email'])
+        self._seen_usernames.add(values['username'])
+
+        user.password = password
+        return user
+
+    def _drop_existing(self, batch: List[Any]) -> List[Any]:
+        emails = [user.email for user in batch]
+        usernames = [user.username for user in batch]
+        existing = User.objects.filter(Q(email__in=emails) | Q(username__in=usernames))
+        taken_emails, taken_usernames = set(), set()
+        for email, username in existing.values_list('email', 'username'):
+            taken_emails.add(email)
+            taken_usernames.add(username)
+        new = [user for user in batch
+               if user.email not in taken_emails and user.username not in taken_usernames]
+        self.result['duplicates'] += len(batch) - len(new)
+        return new
+
+    def _insert(self, batch: List[Any], hashed: Iterable[str]):
+        if not batch:
+            return
+        hashes = iter(hashed)
+        for user in batch:
+            user.password = next(hashes) if user.password is not None else make_password(None)
+
+        User.objects.bulk_create(batch, batch_size=self.batch_size, ignore_conflicts=True)
+        stored = dict(
+            User.objects.filter(email__in=[user.email for user in batch]).values_list('email', 'password')
+        )
+        created = sum(1 for user in batch if stored.get(user.email) == user.password)
+        self.result['created'] += created
+        self.result['duplicates'] += len(batch) - created
+
+    def _error(self, line: int, email: str, message: str):
+        if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+            self.result['errors'].append({'line': line, 'email': email, 'error': message})
+
+
+def import_users(lines: Iterable[str], batch_size: Optional[int] = None,
+                 workers: Optional[int] = None, max_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Imports users from CSV ``lines`` (a text file or any iterable of lines).
+    Raises ValueError if a required column is missing.
+    """
+    importer = UserImporter(
+        batch_size=batch_size or settings.USER_IMPORT_BATCH_SIZE,
+        workers=workers or settings.USER_IMPORT_WORKERS,
+        max_rows=max_rows,
+    )
+    return importer.run(lines)
+
+
+def _job_path(job_id: str, suffix: str) -> str:
+    return os.path.join(settings.USER_IMPORT_DIR, f'{job_id}{suffix}')
+
+
+def write_import_job(job_id: str, state: Dict[str, Any]):
+    path = _job_path(job_id, '.json')
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def read_import_job(job_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_job_path(job_id, '.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def start_import_job(upload, max_rows: Optional[int] = None) -> str:
+    """
+    Spools the uploaded CSV and starts ``manage.py import_users --job`` for
+    it in the background. Returns the job id (see ``read_import_job``).
+    """
+    os.makedirs(settings.USER_IMPORT_DIR, mode=0o700, exist_ok=True)
+    job_id = str(uuid.uuid4())
+    path = _job_path(job_id, '.csv')
+    with open(path, 'wb') as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    write_import_job(job_id, {'status': 'queued'})
+
+    command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'import_users', path, '--job', job_id]
+    if max_rows is not None:
+        command += ['--max-rows', str(max_rows)]
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, start_new_session=True)
+    # Reap the child when it exits; the web worker does not wait for it
+    threading.Thread(target=process.wait, daemon=True).start()
+    logger.info(f"User import job {job_id} started (pid {process.pid})")
+    return job_id
+
+
+def run_import_job(job_id: str, path: str, max_rows: Optional[int] = None,
+                   batch_size: Optional[int] = None, workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Runs a job started by ``start_import_job``, recording its status and
+    result, and removes the spooled file.
+    """
+    # Below the web workers, so logins keep being served while passwords hash
+    os.nice(JOB_NICENESS)
+    write_import_job(job_id, {'status': 'running'})
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            result = import_users(f, batch_size, workers, max_rows)
+    except UnicodeDecodeError:
+        write_import_job(job_id, {'status': 'failed', 'error': 'O arquivo CSV deve estar em UTF-8'})
+        raise
+    except Exception as e:
+        write_import_job(job_id, {'status': 'failed', 'error': str(e)})
+        raise
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    write_import_job(job_id, {'status': 'done', 'result': result})
+    return result
@@ -0,0 +1,35 @@
+"""
+Eventos do auth_service enviados a outros serviços.
+"""
+import logging
+import threading
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def send_user_event(user_id: int, event_type: str):
+    """
+    Envia um evento de ciclo de vida (ex.: login) para o recommendation service,
+    que recalcula as recomendações materializadas do usuário.
+
+    O envio roda em uma thread daemon para não somar latência ao login.
+    """
+    recommendation_url = getattr(settings, 'RECOMMENDATION_SERVICE_URL', 'http://recommendation_service:8000')
+
+    def _send():
+        try:
+            response = requests.post(
+                f"{recommendation_url}/events/user",
+                json={'user_id': user_id, 'event_type': event_type},
+                timeout=5,
+                headers={'Content-Type': 'application/json', 'X-User-Id': str(user_id)}
+            )
+            if response.status_code not in [200, 201]:
+                logger.warning(f"Failed to send user event: {response.status_code}")
+        except Exception as e:
+            logger.error(f"Error sending user event: {e}")
+
+    threading.Thread(target=_send, daemon=True).start()
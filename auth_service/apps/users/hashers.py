@@ -0,0 +1,40 @@
+"""
+Password hashers with host-calibrated parameters.
+
+The parameters come from PASSWORD_HASHER_PARAMS (the file written by
+``manage.py calibrate_password_hashers``). The algorithm identifiers are
+Django's own, so existing hashes keep verifying; when the preferred hasher
+or its parameters change, Django's ``check_password`` sees ``must_update``
+on the next successful login and re-encodes the password transparently.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+)
+
+_params = getattr(settings, 'PASSWORD_HASHER_PARAMS', {})
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    # Never below Django's default: must_update would re-encode stronger
+    # stored hashes with fewer iterations on login
+    iterations = max(
+        _params.get('pbkdf2_sha256', {}).get('iterations', PBKDF2PasswordHasher.iterations),
+        PBKDF2PasswordHasher.iterations,
+    )
+
+
+class CalibratedScryptPasswordHasher(ScryptPasswordHasher):
+    work_factor = _params.get('scrypt', {}).get('work_factor', ScryptPasswordHasher.work_factor)
+    block_size = _params.get('scrypt', {}).get('block_size', ScryptPasswordHasher.block_size)
+    parallelism = _params.get('scrypt', {}).get('parallelism', ScryptPasswordHasher.parallelism)
+    # Upper bound for hashlib.scrypt (needs ~128 * n * r bytes), not an
+    # allocation; large enough to verify hashes made with a bigger n
+    maxmem = max(256 * work_factor * block_size, 256 * 1024 * 1024)
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    time_cost = _params.get('argon2', {}).get('time_cost', Argon2PasswordHasher.time_cost)
+    memory_cost = _params.get('argon2', {}).get('memory_cost', Argon2PasswordHasher.memory_cost)
+    parallelism = _params.get('argon2', {}).get('parallelism', Argon2PasswordHasher.parallelism)
+
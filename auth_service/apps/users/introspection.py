@@ -0,0 +1,92 @@
+"""
+Batch token introspection for internal jobs and the API gateway.
+
+Each token is verified with the keyring token backend (signature by kid,
+exp, aud, iss) and, when valid, its jti is checked against simplejwt's
+blacklist. Duplicate tokens are verified once and the blacklist is looked
+up with a single query for the whole batch.
+
+The endpoint answers whether arbitrary tokens are valid and costs one
+signature check per token, so it is restricted to internal callers
+presenting TOKEN_INTROSPECTION_SECRET (``X-Internal-Token``) and to admin
+users; the API gateway does not route it.
+"""
+import hmac
+
+from django.conf import settings
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework_simplejwt import state
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+class IsInternalService(permissions.BasePermission):
+    """
+    The request carries the shared TOKEN_INTROSPECTION_SECRET in the
+    ``X-Internal-Token`` header (never granted while the secret is unset).
+    """
+
+    def has_permission(self, request, view):
+        secret = settings.TOKEN_INTROSPECTION_SECRET
+        presented = request.headers.get('X-Internal-Token', '')
+        return bool(secret) and hmac.compare_digest(presented.encode(), secret.encode())
+
+
+def introspect_tokens(tokens):
+    """
+    Introspection result of each token, in order: ``{"active": True,
+    "claims": {...}}`` or ``{"active": False, "error": ...}``.
+    """
+    decoded = {}
+    for token in set(tokens):
+        try:
+            decoded[token] = state.token_backend.decode(token)
+        except TokenBackendError:
+            decoded[token] = None
+
+    jtis = {
+        claims[api_settings.JTI_CLAIM]
+        for claims in decoded.values()
+        if claims and api_settings.JTI_CLAIM in claims
+    }
+    blacklisted = set(
+        BlacklistedToken.objects.filter(token__jti__in=jtis).values_list('token__jti', flat=True)
+    ) if jtis else set()
+
+    results = []
+    for token in tokens:
+        claims = decoded[token]
+        if claims is None:
+            results.append({'active': False, 'error': 'token_invalid'})
+        elif claims.get(api_settings.JTI_CLAIM) in blacklisted:
+            results.append({'active': False, 'error': 'token_blacklisted'})
+        else:
+            results.append({'active': True, 'claims': claims})
+    return results
+
+
+@api_view(['POST'])
+@permission_classes([IsInternalService | permissions.IsAdminUser])
+def introspect_batch(request):
+    """
+    Valida vários tokens em uma única chamada (uso interno: header
+    X-Internal-Token com TOKEN_INTROSPECTION_SECRET, ou usuário admin).
+    Corpo: {"tokens": ["<jwt>", ...]} (até TOKEN_INTROSPECTION_MAX_BATCH).
+    Resposta: {"results": [...]} na mesma ordem dos tokens enviados.
+    """
+    tokens = request.data.get('tokens') if isinstance(request.data, dict) else None
+    if not isinstance(tokens, list) or not all(isinstance(token, str) for token in tokens):
+        return Response(
+            {'error': 'O campo "tokens" deve ser uma lista de strings'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(tokens) > settings.TOKEN_INTROSPECTION_MAX_BATCH:
+        return Response(
+            {'error': f'Máximo de {settings.TOKEN_INTROSPECTION_MAX_BATCH} tokens por requisição'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response({'results': introspect_tokens(tokens)}, status=status.HTTP_200_OK)
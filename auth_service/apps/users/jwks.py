@@ -1,114 +1,72 @@
 """
 JWKS (JSON Web Key Set) utilities for JWT token validation.
 """
+import hashlib
 import json
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from typing import Optional, Tuple
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.views.decorators.http import require_http_methods
-from django.views.decorators.cache import cache_page
-import os
 
+from .keyring import get_keyring
 
-def generate_key_pair():
-    """
-    Generate RSA key pair for JWT signing.
-    Returns (private_key, public_key) as PEM strings.
-    """
-    private_key = rsa.generate_private_key(
-        public_exponent=65537,
-        key_size=2048,
-    )
-    
-    public_key = private_key.public_key()
-    
-    # Serialize private key
-    private_pem = private_key.private_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.PKCS8,
-        encryption_algorithm=serialization.NoEncryption()
-    ).decode('utf-8')
-    
-    # Serialize public key
-    public_pem = public_key.public_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo
-    ).decode('utf-8')
-    
-    return private_pem, public_pem
+# (published kids, body, etag) of the last serialized JWKS
+_document: Optional[Tuple[tuple, bytes, str]] = None
 
 
 def get_or_create_jwt_keys():
     """
-    Get or create JWT key pair, storing them in environment variables or files.
+    Get the active JWT key pair from the keyring (see keyring.py), creating
+    the keyring on first use.
     """
-    private_key = os.getenv('JWT_PRIVATE_KEY')
-    public_key = os.getenv('JWT_PUBLIC_KEY')
-    
-    if not private_key or not public_key:
-        # Generate new key pair
-        private_key, public_key = generate_key_pair()
-        
-        # Store in environment variables (in production, use secure key management)
-        os.environ['JWT_PRIVATE_KEY'] = private_key
-        os.environ['JWT_PUBLIC_KEY'] = public_key
-        
-        # Also store in settings for this session
-        settings.JWT_PRIVATE_KEY = private_key
-        settings.JWT_PUBLIC_KEY = public_key
-    
-    return private_key, public_key
+    key = get_keyring().active_key()
+    return key.private_pem, key.public_pem
 
 
-def get_jwks():
+def get_jwks_document() -> Tuple[bytes, str]:
     """
-    Generate JWKS (JSON Web Key Set) from public key.
+    Serialized JWKS and its strong ETag, rebuilt only when the published
+    keys (or the active key) change. The active signing key comes first
+    (verifiers without kid support use the first key).
     """
-    _, public_key_pem = get_or_create_jwt_keys()
-    
-    # Parse public key
-    public_key = serialization.load_pem_public_key(
-        public_key_pem.encode('utf-8')
-    )
-    
-    # Get key components
-    public_numbers = public_key.public_numbers()
-    
-    # Helper to base64url encode without padding
-    import base64
-    def b64url_uint(val: int) -> str:
-        by = val.to_bytes((val.bit_length() + 7) // 8, byteorder='big')
-        return base64.urlsafe_b64encode(by).rstrip(b'=').decode('utf-8')
+    global _document
+    keys = get_keyring().published_keys()
+    version = tuple(key.kid for key in keys)
+    if _document is None or _document[0] != version:
+        body = json.dumps(
+            {"keys": [key.public_jwk() for key in keys]},
+            separators=(',', ':')
+        ).encode('utf-8')
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        _document = (version, body, etag)
+    return _document[1], _document[2]
 
-    # Convert to JWK format (base64url)
-    jwk = {
-        "kty": "RSA",
-        "use": "sig",
-        "key_ops": ["verify"],
-        "alg": "RS256",
-        "kid": "ava-auth-key-1",  # Key ID
-        "n": b64url_uint(public_numbers.n),
-        "e": b64url_uint(public_numbers.e)
-    }
-    
-    return {
-        "keys": [jwk]
-    }
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison (W/ prefix ignored)
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
 
-@require_http_methods(["GET"])
-@cache_page(60 * 60)  # Cache for 1 hour
+
+@require_http_methods(["GET", "HEAD"])
 def jwks_endpoint(request):
     """
     JWKS endpoint for JWT token validation.
-    Returns the public key in JWKS format.
+    Returns the published public keys in JWKS format, with an ETag so
+    clients can revalidate with If-None-Match (304 Not Modified).
     """
     try:
-        jwks = get_jwks()
-        return JsonResponse(jwks)
+        body, etag = get_jwks_document()
     except Exception as e:
         return JsonResponse(
             {"error": "Failed to generate JWKS"}, 
             status=500
         )
+
+    if _etag_matches(request.META.get('HTTP_IF_NONE_MATCH', ''), etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.JWKS_MAX_AGE_SECONDS}'
+    return response
@@ -0,0 +1,343 @@
+"""
+On-disk RSA keyring for JWT signing.
+
+All keys live in one JSON file (``keyring.json`` in JWT_KEYRING_DIR, mode
+0600) shared by every worker and management command, so they all sign with
+the same key and JWKS publishes every key that may still verify a token.
+Loading the ring is a file read plus one PEM parse; a key is only generated
+when the ring is empty or due for rotation, under an exclusive file lock so
+concurrent workers never create two keys.
+
+Rotation schedule (``now`` is compared with each key's ``activates_at``):
+
+    - the active key is the newest key whose ``activates_at`` has passed
+    - ``prepublish`` before the active key is ``rotation`` old, a successor
+      is generated and published in JWKS but not used for signing yet, so
+      verifiers' JWKS caches pick it up before the first token signed by it
+    - a key keeps being published for ``overlap`` after its successor
+      activates (longest token lifetime), then it is removed from the ring
+
+Each key records its algorithm: RS256 or ES256 (P-256: ~8x faster to sign,
+~40% smaller tokens, but ~2.5x slower to verify; see
+benchmarks/bench_jwt_algorithms.py). Changing the configured algorithm makes the next key use it
+through the same prepublish / overlap schedule, so tokens of both algorithms
+verify by ``kid`` during the migration.
+
+Legacy ``JWT_PRIVATE_KEY`` / ``JWT_PUBLIC_KEY`` env vars still win: they form
+a single static RS256 key (kid ``ava-auth-key-1``) that is never rotated.
+"""
+import base64
+import fcntl
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+logger = logging.getLogger(__name__)
+
+KEYRING_FILE = 'keyring.json'
+LEGACY_KID = 'ava-auth-key-1'
+ALGORITHMS = ('RS256', 'ES256')
+# How often a process re-reads the ring to see keys added by other processes
+RELOAD_INTERVAL_SECONDS = 60
+
+
+@dataclass
+class SigningKey:
+    kid: str
+    private_pem: Optional[str]
+    public_pem: str
+    created_at: float
+    activates_at: float
+    alg: str = 'RS256'
+    _private_key: Any = field(default=None, repr=False)
+    _public_key: Any = field(default=None, repr=False)
+
+    @property
+    def private_key(self):
+        """Parsed private key (parsed on first use: only the active key signs)."""
+        if self._private_key is None:
+            # Parsed once and reused for every token. The ring only holds
+            # keys we generated: skip the slow RSA checks
+            self._private_key = serialization.load_pem_private_key(
+                self.private_pem.encode('utf-8'), password=None, unsafe_skip_rsa_key_validation=True
+            )
+        return self._private_key
+
+    @property
+    def public_key(self):
+        if self._public_key is None:
+            self._public_key = serialization.load_pem_public_key(self.public_pem.encode('utf-8'))
+        return self._public_key
+
+    def public_jwk(self) -> Dict[str, Any]:
+        """Public key in JWK format (RSA for RS256, P-256 for ES256)."""
+        public_numbers = self.public_key.public_numbers()
+
+        # Helper to base64url encode without padding
+        def b64url_uint(val: int, length: Optional[int] = None) -> str:
+            by = val.to_bytes(length or (val.bit_length() + 7) // 8, byteorder='big')
+            return base64.urlsafe_b64encode(by).rstrip(b'=').decode('utf-8')
+
+        jwk = {"use": "sig", "key_ops": ["verify"], "alg": self.alg, "kid": self.kid}
+        if self.alg == 'ES256':
+            # EC coordinates are fixed-length (32 bytes for P-256)
+            jwk.update({"kty": "EC", "crv": "P-256",
+                        "x": b64url_uint(public_numbers.x, 32), "y": b64url_uint(public_numbers.y, 32)})
+        else:
+            jwk.update({"kty": "RSA",
+                        "n": b64url_uint(public_numbers.n), "e": b64url_uint(public_numbers.e)})
+        return jwk
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'kid': self.kid,
+            'private_pem': self.private_pem,
+            'public_pem': self.public_pem,
+            'created_at': self.created_at,
+            'activates_at': self.activates_at,
+            'alg': self.alg,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SigningKey':
+        return cls(data['kid'], data['private_pem'], data['public_pem'],
+                   data['created_at'], data['activates_at'], data.get('alg', 'RS256'))
+
+
+def generate_signing_key(activates_at: float, algorithm: str = 'RS256') -> SigningKey:
+    if algorithm == 'ES256':
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    elif algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        raise ValueError(f"Unsupported JWT signing algorithm {algorithm!r}, expected one of {ALGORITHMS}")
+    now = time.time()
+    return SigningKey(
+        kid=f"ava-{time.strftime('%Y%m%d%H%M%S', time.gmtime(now))}-{secrets.token_hex(3)}",
+        private_pem=private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        ).decode('utf-8'),
+        public_pem=private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode('utf-8'),
+        created_at=now,
+        activates_at=activates_at,
+        alg=algorithm,
+        _private_key=private_key,
+    )
+
+
+class Keyring:
+    """
+    Signing keys ordered by ``activates_at`` (oldest first), backed by
+    ``directory/keyring.json``.
+    """
+
+    def __init__(self, directory: Optional[str], rotation_seconds: float, overlap_seconds: float,
+                 prepublish_seconds: float, algorithm: str = 'RS256'):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unsupported JWT signing algorithm {algorithm!r}, expected one of {ALGORITHMS}")
+        self.directory = directory
+        self.algorithm = algorithm
+        self.rotation_seconds = rotation_seconds
+        self.overlap_seconds = overlap_seconds
+        self.prepublish_seconds = min(prepublish_seconds, rotation_seconds / 2)
+        self.keys: List[SigningKey] = []
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, KEYRING_FILE)
+
+    @classmethod
+    def static(cls, private_pem: str, public_pem: str) -> 'Keyring':
+        """Single non-rotating key from the legacy env vars."""
+        ring = cls(None, float('inf'), 0, 0)
+        ring.keys = [SigningKey(LEGACY_KID, private_pem, public_pem, 0.0, 0.0)]
+        return ring
+
+    # -- reading -------------------------------------------------------
+
+    def active_key(self, now: Optional[float] = None) -> SigningKey:
+        """Key to sign new tokens with."""
+        now = time.time() if now is None else now
+        active = [key for key in self.keys if key.activates_at <= now]
+        return active[-1] if active else self.keys[0]
+
+    def get(self, kid: str) -> Optional[SigningKey]:
+        for key in self.keys:
+            if key.kid == kid:
+                return key
+        return None
+
+    def published_keys(self, now: Optional[float] = None) -> List[SigningKey]:
+        """Keys to publish in JWKS, active key first."""
+        active = self.active_key(now)
+        return [active] + [key for key in reversed(self.keys) if key is not active]
+
+    def _read(self) -> bool:
+        """Load the file if it changed since the last read; True if it exists."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime != self._mtime:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            # Keep the already parsed key objects of kids we know
+            known = {key.kid: key for key in self.keys}
+            self.keys = sorted((known.get(key['kid']) or SigningKey.from_dict(key)
+                                for key in data.get('keys', [])),
+                               key=lambda key: key.activates_at)
+            self._mtime = mtime
+        return bool(self.keys)
+
+    def _write(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'keys': [key.to_dict() for key in self.keys]}, f)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    # -- maintenance ---------------------------------------------------
+
+    def _rotation_due(self, now: float) -> bool:
+        """
+        No successor yet and the active key is ``rotation - prepublish`` old
+        or uses another algorithm than the configured one.
+        """
+        active = self.active_key(now)
+        return self.keys[-1] is active and (
+            active.alg != self.algorithm
+            or now >= active.activates_at + self.rotation_seconds - self.prepublish_seconds
+        )
+
+    def _needs_maintenance(self, now: float) -> bool:
+        if not self.keys:
+            return True
+        return self._rotation_due(now) or any(self._expired(i, now) for i in range(len(self.keys)))
+
+    def _expired(self, index: int, now: float) -> bool:
+        """Whether the key's successor has been active for longer than the overlap."""
+        return (index + 1 < len(self.keys)
+                and self.keys[index + 1].activates_at <= now - self.overlap_seconds)
+
+    def maintain(self, now: Optional[float] = None, force_rotation: bool = False,
+                 revoke: Iterable[str] = ()) -> List[str]:
+        """
+        Reload, then (under the file lock) generate the first key or the next
+        one when due and drop keys past their overlap window.
+
+        Keys in ``revoke`` are removed at once, without overlap; if the active
+        key is among them, a new key signs from now on. ``force_rotation``
+        (compromised ring) revokes every key and starts over with a new one.
+
+        Returns:
+            List[str]: kids added to the ring
+        """
+        if self.directory is None:
+            return []
+        now = time.time() if now is None else now
+        revoke = set(revoke)
+        with self._lock:
+            self._read()
+            if not force_rotation and not revoke and not self._needs_maintenance(now):
+                return []
+
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # Another process may have rotated while we waited for the lock
+                self._mtime = None
+                self._read()
+                kids = {key.kid for key in self.keys}
+                revoked = kids if force_rotation else revoke & kids
+                expired = {key.kid for i, key in enumerate(self.keys) if self._expired(i, now)}
+                added = []
+                if not self.keys or (revoked and self.active_key(now).kid in revoked):
+                    # First key, or the signing key was revoked: sign with a new key right away
+                    added.append(generate_signing_key(now, self.algorithm))
+                elif self._rotation_due(now):
+                    # Published now, used once the active key is ``rotation`` old
+                    # (and never before it has been published for ``prepublish``)
+                    active = self.active_key(now)
+                    if active.alg != self.algorithm:
+                        # Algorithm change: switch once the new key is published
+                        activates_at = now + self.prepublish_seconds
+                    else:
+                        activates_at = max(active.activates_at + self.rotation_seconds,
+                                           now + self.prepublish_seconds)
+                    added.append(generate_signing_key(activates_at, self.algorithm))
+                if added or revoked or expired:
+                    kept = [key for key in self.keys if key.kid not in revoked | expired]
+                    self.keys = sorted(kept + added, key=lambda key: key.activates_at)
+                    self._write()
+                    for key in added:
+                        logger.info(f"JWT signing key {key.kid} ({key.alg}) added, active from "
+                                    f"{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(key.activates_at))}")
+                    if revoked:
+                        logger.warning(f"JWT signing keys revoked: {', '.join(sorted(revoked))}")
+                    if expired - revoked:
+                        logger.info(f"JWT signing keys retired: {', '.join(sorted(expired - revoked))}")
+                self._checked_at = time.monotonic()
+                return [key.kid for key in added]
+
+    def refresh(self):
+        """Pick up keys written by other processes and rotate when due (throttled)."""
+        if self.directory is None or time.monotonic() - self._checked_at < RELOAD_INTERVAL_SECONDS:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            self.maintain()
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to refresh JWT keyring in {self.directory}: {e}")
+
+
+_keyring: Optional[Keyring] = None
+_keyring_lock = threading.Lock()
+
+
+def load_keyring(directory: str, rotation_days: float, overlap_days: float,
+                 prepublish_hours: float, algorithm: str = 'RS256') -> Keyring:
+    """
+    Process-wide keyring: the legacy env keys if set, otherwise the ring in
+    ``directory`` (created with a first key if missing).
+    """
+    global _keyring
+    with _keyring_lock:
+        if _keyring is None:
+            private_pem = os.getenv('JWT_PRIVATE_KEY')
+            public_pem = os.getenv('JWT_PUBLIC_KEY')
+            if private_pem and public_pem:
+                _keyring = Keyring.static(private_pem, public_pem)
+            else:
+                ring = Keyring(directory, rotation_days * 86400, overlap_days * 86400,
+                               prepublish_hours * 3600, algorithm)
+                ring.maintain()
+                _keyring = ring
+    return _keyring
+
+
+def get_keyring() -> Keyring:
+    """The process keyring, configured from settings on first use."""
+    if _keyring is None:
+        from django.conf import settings
+        load_keyring(settings.JWT_KEYRING_DIR, settings.JWT_KEY_ROTATION_DAYS,
+                     settings.JWT_KEY_OVERLAP_DAYS, settings.JWT_KEY_PREPUBLISH_HOURS,
+                     settings.JWT_SIGNING_ALGORITHM)
+    _keyring.refresh()
+    return _keyring
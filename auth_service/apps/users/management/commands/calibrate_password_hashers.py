@@ -0,0 +1,140 @@
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+)
+from django.core.management.base import BaseCommand
+
+
+# Configurações candidatas de cada hasher, da mais barata à mais cara
+CANDIDATES = {
+    'argon2': [
+        {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},
+        {'time_cost': 2, 'memory_cost': 65536, 'parallelism': 2},
+        {'time_cost': 3, 'memory_cost': 65536, 'parallelism': 4},
+        {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8},
+        {'time_cost': 4, 'memory_cost': 102400, 'parallelism': 8},
+    ],
+    'scrypt': [
+        {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+        {'work_factor': 2 ** 15, 'block_size': 8, 'parallelism': 1},
+        {'work_factor': 2 ** 16, 'block_size': 8, 'parallelism': 1},
+        {'work_factor': 2 ** 17, 'block_size': 8, 'parallelism': 1},
+    ],
+    # Nunca abaixo do padrão do Django: o rehash no login enfraqueceria as
+    # senhas já guardadas com mais iterações
+    'pbkdf2_sha256': [
+        {'iterations': iterations}
+        for iterations in sorted({PBKDF2PasswordHasher.iterations} | {
+            iterations for iterations in (600_000, 870_000, 1_200_000, 1_600_000)
+            if iterations > PBKDF2PasswordHasher.iterations
+        })
+    ],
+}
+# Preferência entre os hashers que atingem a meta: resistentes a memória primeiro
+PREFERENCE = ('argon2', 'scrypt', 'pbkdf2_sha256')
+HASHER_CLASSES = {
+    'argon2': Argon2PasswordHasher,
+    'scrypt': ScryptPasswordHasher,
+    'pbkdf2_sha256': PBKDF2PasswordHasher,
+}
+
+
+def make_hasher(name, params):
+    hasher = HASHER_CLASSES[name]()
+    for attr, value in params.items():
+        setattr(hasher, attr, value)
+    if name == 'scrypt':
+        hasher.maxmem = 256 * params['work_factor'] * params['block_size']
+    return hasher
+
+
+def measure_ms(hasher, samples):
+    """Mediana do tempo de um hash (o que cada login paga para verificar a senha)."""
+    password = 'calibracao-Senha-123'
+    hasher.encode(password, hasher.salt())  # aquecimento
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.encode(password, hasher.salt())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = ('Mede os hashers de senha disponíveis neste host e grava a configuração '
+            'recomendada para uma meta de latência por login')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250,
+                            help='Tempo máximo de hash por login, em ms (padrão: 250)')
+        parser.add_argument('--samples', type=int, default=5, help='Medições por configuração')
+        parser.add_argument('--output', default=settings.PASSWORD_HASHING_FILE,
+                            help='Arquivo de configuração (padrão: PASSWORD_HASHING_FILE)')
+        parser.add_argument('--dry-run', action='store_true', help='Só mostra o resultado, sem gravar')
+
+    def handle(self, *args, **options):
+        target = options['target_ms']
+        measured, chosen, within_target = {}, {}, set()
+
+        for name, candidates in CANDIDATES.items():
+            if name == 'argon2':
+                try:
+                    import argon2  # noqa: F401
+                except ImportError:
+                    self.stdout.write(self.style.WARNING('argon2: argon2-cffi não instalado, ignorado'))
+                    continue
+            measured[name] = {}
+            for params in candidates:
+                label = ','.join(f'{key}={value}' for key, value in params.items())
+                try:
+                    elapsed = measure_ms(make_hasher(name, params), options['samples'])
+                except (ValueError, MemoryError) as e:
+                    self.stdout.write(self.style.WARNING(f'{name} {label}: falhou ({e})'))
+                    break
+                measured[name][label] = round(elapsed, 1)
+                self.stdout.write(f"{name:14s} {label:50s} {elapsed:8.1f} ms")
+                if elapsed > target:
+                    break
+                # A mais forte que ainda cabe na meta
+                chosen[name] = params
+                within_target.add(name)
+            # Nem a configuração mais barata atinge a meta: fica com ela
+            chosen.setdefault(name, candidates[0])
+
+        preferred = next((name for name in PREFERENCE if name in within_target), 'pbkdf2_sha256')
+        config = {
+            'preferred': preferred,
+            'params': chosen,
+            'target_ms': target,
+            'measured_ms': measured,
+            'calibrated_at': datetime.now(timezone.utc).isoformat(),
+            'host': platform.node(),
+        }
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomendado: {preferred} {chosen.get(preferred)} (meta {target:.0f} ms)"
+        ))
+        if preferred == 'pbkdf2_sha256' and preferred not in within_target:
+            self.stdout.write(self.style.WARNING(
+                f'Nem o PBKDF2 com o padrão do Django ({PBKDF2PasswordHasher.iterations} iterações) '
+                f'atinge a meta; ele é mantido (menos iterações enfraqueceriam as senhas guardadas). '
+                f'Considere instalar argon2-cffi ou aumentar a meta'
+            ))
+
+        if options['dry_run']:
+            return
+        tmp_path = f"{options['output']}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, options['output'])
+        self.stdout.write(
+            f"Configuração gravada em {options['output']}. Reinicie o serviço para aplicá-la; "
+            f"as senhas são re-hasheadas no próximo login de cada usuário."
+        )
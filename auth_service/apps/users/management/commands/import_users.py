@@ -0,0 +1,46 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.bulk_import import import_users, run_import_job
+
+
+class Command(BaseCommand):
+    help = ('Importa usuários em massa de um CSV (email, username, first_name, last_name, '
+            'password opcional); usuários já existentes são ignorados')
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Arquivo CSV ("-" para ler da entrada padrão)')
+        parser.add_argument('--batch-size', type=int, help='Usuários por lote (padrão: USER_IMPORT_BATCH_SIZE)')
+        parser.add_argument('--workers', type=int,
+                            help='Processos para o hash das senhas (padrão: USER_IMPORT_WORKERS ou um por CPU)')
+        parser.add_argument('--max-rows', type=int, help='Importa no máximo este número de linhas')
+        parser.add_argument('--job', help='Job iniciado por POST /api/users/import/ (registra o status '
+                                          'em USER_IMPORT_DIR e remove o arquivo ao final)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['job']:
+                result = run_import_job(options['job'], options['csv_file'], options['max_rows'],
+                                        options['batch_size'], options['workers'])
+            elif options['csv_file'] == '-':
+                result = import_users(sys.stdin, options['batch_size'], options['workers'], options['max_rows'])
+            else:
+                with open(options['csv_file'], newline='', encoding='utf-8-sig') as f:
+                    result = import_users(f, options['batch_size'], options['workers'], options['max_rows'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"  linha {error['line']} ({error['email']}): {error['error']}"))
+        if result['invalid'] > len(result['errors']):
+            self.stdout.write(self.style.WARNING(f"  ... e mais {result['invalid'] - len(result['errors'])} linhas inválidas"))
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {result['created']} usuários criados, {result['duplicates']} já existentes, "
+            f"{result['invalid']} inválidos ({result['rows']} linhas em {elapsed:.1f}s)"
+        ))
+        if result['truncated']:
+            self.stdout.write(self.style.WARNING(f"  Arquivo truncado em {options['max_rows']} linhas"))
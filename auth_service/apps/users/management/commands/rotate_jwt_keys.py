@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.keyring import RELOAD_INTERVAL_SECONDS, get_keyring
+
+
+class Command(BaseCommand):
+    help = 'Rotaciona as chaves de assinatura JWT do keyring (agendar via cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help=('Keyring comprometido: cria uma nova chave, que assina imediatamente, e revoga '
+                  'todas as anteriores (tokens já emitidos deixam de valer)'),
+        )
+        parser.add_argument(
+            '--revoke',
+            action='append',
+            default=[],
+            metavar='KID',
+            help=('Revoga a chave KID imediatamente, sem sobreposição (repetível); '
+                  'se for a chave ativa, uma nova passa a assinar'),
+        )
+
+    def handle(self, *args, **options):
+        keyring = get_keyring()
+        if keyring.directory is None:
+            raise CommandError('JWT_PRIVATE_KEY/JWT_PUBLIC_KEY definidas: chave estática, sem rotação')
+
+        published = {key.kid for key in keyring.published_keys()}
+        unknown = [kid for kid in options['revoke'] if kid not in published]
+        if unknown:
+            raise CommandError(f"Chave(s) não encontrada(s) no keyring: {', '.join(unknown)}")
+
+        added = keyring.maintain(force_rotation=options['force'], revoke=options['revoke'])
+        revoked = published - {key.kid for key in keyring.published_keys()}
+        if options['force'] or options['revoke']:
+            revoked &= published if options['force'] else set(options['revoke'])
+            self.stdout.write(self.style.WARNING(
+                f"✓ Revogada(s): {', '.join(sorted(revoked))} — os workers deixam de aceitá-las "
+                f"em até {RELOAD_INTERVAL_SECONDS}s; learning/recommendation, quando o cache de JWKS "
+                f"de cada processo se atualiza (TTL padrão 300s; os tokens já verificados em cache "
+                f"são conferidos pelo kid); o API Gateway, em até 10 min (cache do jwks-rsa)"
+            ))
+        if added:
+            self.stdout.write(self.style.SUCCESS(f"✓ Nova chave: {', '.join(added)}"))
+        elif not revoked:
+            self.stdout.write('Nenhuma rotação pendente')
+
+        active = keyring.active_key()
+        for key in keyring.published_keys():
+            status = 'ativa' if key is active else (
+                'pendente' if key.activates_at > time.time() else 'em sobreposição'
+            )
+            activates = time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime(key.activates_at))
+            self.stdout.write(f'  {key.kid}  {status}  (assina desde/a partir de {activates})')
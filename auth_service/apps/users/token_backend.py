@@ -0,0 +1,92 @@
+"""
+simplejwt token backend backed by the JWT keyring.
+
+Tokens are signed with the keyring's active key (RS256 or ES256, parsed
+once and cached) and carry its ``kid`` in the header; verification picks
+the public key and its algorithm by ``kid``, so tokens signed by a key that
+has since been rotated, or by the previous algorithm, keep working during
+the overlap window.
+"""
+import jwt
+from django.utils.translation import gettext_lazy as _
+from jwt import InvalidAlgorithmError, InvalidTokenError
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings
+
+from .keyring import SigningKey, get_keyring
+
+
+class KeyringTokenBackend(TokenBackend):
+
+    @classmethod
+    def from_settings(cls) -> 'KeyringTokenBackend':
+        return cls(
+            api_settings.ALGORITHM,
+            api_settings.SIGNING_KEY,
+            api_settings.VERIFYING_KEY,
+            api_settings.AUDIENCE,
+            api_settings.ISSUER,
+            api_settings.JWK_URL,
+            api_settings.LEEWAY,
+            api_settings.JSON_ENCODER,
+        )
+
+    def encode(self, payload):
+        """
+        Returns a token signed with the active key, with its kid in the header.
+        """
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+
+        key = get_keyring().active_key()
+        return jwt.encode(
+            jwt_payload,
+            key.private_key,
+            algorithm=key.alg,
+            headers={"kid": key.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def get_signing_key_for(self, token) -> SigningKey:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except InvalidTokenError as ex:
+            raise TokenBackendError(_("Token is invalid or expired")) from ex
+
+        keyring = get_keyring()
+        # Tokens issued before the keyring have no kid: use the active key
+        key = keyring.get(kid) if kid else keyring.active_key()
+        if key is None:
+            raise TokenBackendError(_("Token is invalid or expired"))
+        return key
+
+    def get_verifying_key(self, token):
+        return self.get_signing_key_for(token).public_key
+
+    def decode(self, token, verify=True):
+        """
+        Validates the token with the key named by its kid, accepting only
+        that key's algorithm.
+        """
+        key = self.get_signing_key_for(token)
+        try:
+            return jwt.decode(
+                token,
+                key.public_key,
+                algorithms=[key.alg],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    "verify_aud": self.audience is not None,
+                    "verify_signature": verify,
+                },
+            )
+        except InvalidAlgorithmError as ex:
+            raise TokenBackendError(_("Invalid algorithm specified")) from ex
+        except InvalidTokenError as ex:
+            raise TokenBackendError(_("Token is invalid or expired")) from ex
@@ -2,6 +2,7 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 from . import jwks
+from . import introspection
 
 app_name = 'users'
 
@@ -10,11 +11,14 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     path('login/', views.login, name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/introspect/batch/', introspection.introspect_batch, name='token_introspect_batch'),
     
     # Endpoints de usuário
     path('user/', views.user_info, name='user_info'),
     path('user/profile/', views.UserProfileView.as_view(), name='user_profile'),
     path('user/change-password/', views.ChangePasswordView.as_view(), name='change_password'),
+    path('users/import/', views.UserImportView.as_view(), name='user_import'),
+    path('users/import/<uuid:job_id>/', views.UserImportJobView.as_view(), name='user_import_job'),
     
     # Endpoints alternativos com classes
     path('auth/register/', views.UserRegistrationView.as_view(), name='auth_register'),
@@ -1,8 +1,12 @@
+import csv
+
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from .serializers import (
     UserRegistrationSerializer,
@@ -10,6 +14,8 @@ from .serializers import (
     UserSerializer,
     ChangePasswordSerializer
 )
+from .bulk_import import missing_columns, read_import_job, start_import_job
+from .events import send_user_event
 
 User = get_user_model()
 
@@ -49,6 +55,7 @@ class UserLoginView(TokenObtainPairView):
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        send_user_event(serializer.validated_data['user'].id, 'login')
         
         return Response({
             'message': 'Login realizado com sucesso!',
@@ -94,6 +101,66 @@ class ChangePasswordView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class UserImportView(APIView):
+    """
+    View para importação de usuários em massa (CSV) por administradores
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """
+        Recebe o arquivo CSV no campo "file" e inicia a importação em segundo
+        plano (até USER_IMPORT_MAX_ROWS_PER_REQUEST linhas). Responde 202 com o
+        ``job_id``; o resultado fica em GET /api/users/import/<job_id>/.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({
+                'error': 'Envie o arquivo CSV no campo "file"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        header = upload.file.readline()
+        upload.file.seek(0)
+        try:
+            fieldnames = next(csv.reader([header.decode('utf-8-sig')]), [])
+        except UnicodeDecodeError:
+            return Response({
+                'error': 'O arquivo CSV deve estar em UTF-8'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        missing = missing_columns(fieldname.strip() for fieldname in fieldnames)
+        if missing:
+            return Response({
+                'error': f"Colunas ausentes no CSV: {', '.join(missing)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        job_id = start_import_job(upload, max_rows=settings.USER_IMPORT_MAX_ROWS_PER_REQUEST)
+        return Response({
+            'message': 'Importação iniciada',
+            'job_id': job_id,
+            'status': 'queued',
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class UserImportJobView(APIView):
+    """
+    View para consultar o andamento de uma importação de usuários
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, job_id):
+        """
+        Status da importação: queued, running, done (com ``result``) ou
+        failed (com ``error``).
+        """
+        job = read_import_job(str(job_id))
+        if job is None:
+            return Response({
+                'error': 'Importação não encontrada'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response({'job_id': str(job_id), **job}, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def user_info(request):
@@ -130,6 +197,7 @@ def login(request):
     """
     serializer = UserLoginSerializer(data=request.data)
     if serializer.is_valid():
+        send_user_event(serializer.validated_data['user'].id, 'login')
         return Response({
             'message': 'Login realizado com sucesso!',
             'access': serializer.validated_data['access'],
@@ -0,0 +1,75 @@
+"""
+Token mint / verify throughput of RS256, ES256 and EdDSA.
+
+Minting uses PyJWT as auth_service does (simplejwt), with the parsed key
+object cached by the keyring and, for comparison, with the PEM string parsed
+for every token. Verification is measured with PyJWT (auth_service) and with
+python-jose (learning_service / recommendation_service; jose has no EdDSA).
+
+Usage (from auth_service/):
+    python -m benchmarks.bench_jwt_algorithms --tokens 2000
+"""
+import argparse
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from jose import jwk as jose_jwk
+from jose import jwt as jose_jwt
+
+from apps.users.keyring import generate_signing_key
+
+
+CLAIMS = {
+    'token_type': 'access', 'sub': '42', 'user_id': 42, 'username': 'aluno',
+    'email': 'aluno@ava.com', 'roles': ['student'],
+    'aud': 'ava-microservices', 'iss': 'ava-auth-service',
+}
+
+
+def private_pem(private_key) -> str:
+    return private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode('utf-8')
+
+
+def rate(fn, n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=2000)
+    args = parser.parse_args()
+    n = args.tokens
+    claims = dict(CLAIMS, exp=int(time.time()) + 3600)
+
+    keys = {}
+    for alg in ('RS256', 'ES256'):
+        key = generate_signing_key(time.time(), alg)
+        keys[alg] = (key.private_key, key.public_key, key.public_jwk())
+    ed_private = ed25519.Ed25519PrivateKey.generate()
+    keys['EdDSA'] = (ed_private, ed_private.public_key(), None)
+
+    print(f"{'alg':6s} {'mint/s':>9s} {'mint PEM/s':>11s} {'verify/s':>9s} {'jose/s':>9s} {'bytes':>6s}")
+    for alg, (private_key, public_key, public_jwk) in keys.items():
+        pem = private_pem(private_key)
+        token = jwt.encode(claims, private_key, algorithm=alg, headers={'kid': 'k'})
+        mint = rate(lambda: jwt.encode(claims, private_key, algorithm=alg, headers={'kid': 'k'}), n)
+        mint_pem = rate(lambda: jwt.encode(claims, pem, algorithm=alg, headers={'kid': 'k'}), max(n // 10, 1))
+        verify = rate(lambda: jwt.decode(token, public_key, algorithms=[alg],
+                                         audience='ava-microservices', issuer='ava-auth-service'), n)
+        if public_jwk is not None:
+            jose_key = jose_jwk.construct(public_jwk, alg)
+            jose_verify = f"{rate(lambda: jose_jwt.decode(token, jose_key, algorithms=[alg], audience='ava-microservices', issuer='ava-auth-service'), n):9.0f}"
+        else:
+            jose_verify = f"{'n/a':>9s}"
+        print(f"{alg:6s} {mint:9.0f} {mint_pem:11.0f} {verify:9.0f} {jose_verify} {len(token):6d}")
+
+
+if __name__ == "__main__":
+    main()
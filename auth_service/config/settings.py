@@ -2,6 +2,7 @@
 Django settings for auth_service project.
 """
 
+import json
 import os
 from pathlib import Path
 from datetime import timedelta
@@ -30,6 +31,7 @@ DJANGO_APPS = [
 THIRD_PARTY_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'drf_spectacular',
 ]
@@ -101,6 +103,45 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing: preferred hasher and parameters come from
+# PASSWORD_HASHING_FILE, written by `manage.py calibrate_password_hashers` for
+# a target login latency on this host (Django defaults if the file is absent).
+# Hashes made with another hasher or other parameters are upgraded
+# transparently on the next successful login.
+PASSWORD_HASHING_FILE = os.environ.get('PASSWORD_HASHING_FILE', str(BASE_DIR / 'password_hashing.json'))
+
+
+def load_password_hashing(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        print(f"Warning: Ignoring invalid password hashing config {path}: {e}")
+        return {}
+
+
+_password_hashing = load_password_hashing(PASSWORD_HASHING_FILE)
+PASSWORD_HASHER_PARAMS = _password_hashing.get('params', {})
+_calibrated_hashers = {
+    'pbkdf2_sha256': 'apps.users.hashers.CalibratedPBKDF2PasswordHasher',
+    'scrypt': 'apps.users.hashers.CalibratedScryptPasswordHasher',
+    'argon2': 'apps.users.hashers.CalibratedArgon2PasswordHasher',
+}
+_preferred_hasher = os.environ.get('PASSWORD_HASHER', _password_hashing.get('preferred', 'pbkdf2_sha256'))
+if not isinstance(_preferred_hasher, str) or _preferred_hasher not in _calibrated_hashers:
+    print(f"Warning: Unknown password hasher {_preferred_hasher!r} "
+          f"(expected one of: {', '.join(_calibrated_hashers)}); using pbkdf2_sha256")
+    _preferred_hasher = 'pbkdf2_sha256'
+PASSWORD_HASHERS = [_calibrated_hashers[_preferred_hasher]] + [
+    path for name, path in _calibrated_hashers.items() if name != _preferred_hasher
+] + [
+    # Legacy hashes still verify (and are upgraded on login)
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
 # Internationalization
 LANGUAGE_CODE = 'pt-br'
 TIME_ZONE = 'America/Sao_Paulo'
@@ -189,6 +230,9 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Recommendation service (login events refresh precomputed recommendations)
+RECOMMENDATION_SERVICE_URL = os.environ.get('RECOMMENDATION_SERVICE_URL', 'http://recommendation_service:8000')
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -265,14 +309,49 @@ LOGGING = {
     },
 }
 
+# JWT signing keyring (apps/users/keyring.py): keys shared by all workers on
+# disk, rotated every JWT_KEY_ROTATION_DAYS; a new key is published
+# JWT_KEY_PREPUBLISH_HOURS before it signs and an old one stays published for
+# JWT_KEY_OVERLAP_DAYS (longer than the refresh token lifetime).
+# JWT_PRIVATE_KEY/JWT_PUBLIC_KEY, if set, are used as a single static key.
+JWT_KEYRING_DIR = os.environ.get('JWT_KEYRING_DIR', str(BASE_DIR / 'keys'))
+JWT_KEY_ROTATION_DAYS = float(os.environ.get('JWT_KEY_ROTATION_DAYS', '30'))
+JWT_KEY_OVERLAP_DAYS = float(os.environ.get('JWT_KEY_OVERLAP_DAYS', '8'))
+JWT_KEY_PREPUBLISH_HOURS = float(os.environ.get('JWT_KEY_PREPUBLISH_HOURS', '24'))
+# Algorithm of new signing keys: RS256 or ES256 (signs ~8x faster with smaller
+# tokens, verifies ~2.5x slower; benchmarks/bench_jwt_algorithms.py).
+# Changing it rotates to a key of the new algorithm; old tokens keep verifying.
+JWT_SIGNING_ALGORITHM = os.environ.get('JWT_SIGNING_ALGORITHM', 'RS256')
+# Cache-Control max-age of the JWKS endpoint; clients revalidate with its ETag
+JWKS_MAX_AGE_SECONDS = int(os.environ.get('JWKS_MAX_AGE_SECONDS', '300'))
+# Maximum number of tokens per POST /api/token/introspect/batch/ request
+TOKEN_INTROSPECTION_MAX_BATCH = int(os.environ.get('TOKEN_INTROSPECTION_MAX_BATCH', '200'))
+# Shared secret internal callers send as X-Internal-Token to use the batch
+# introspection endpoint (unset: admin users only)
+TOKEN_INTROSPECTION_SECRET = os.environ.get('TOKEN_INTROSPECTION_SECRET', '')
+# Bulk user import (apps/users/bulk_import.py): users per bulk_create batch,
+# password hashing processes (0 = one per CPU), the row limit of files sent to
+# the HTTP endpoint (larger files go through ``manage.py import_users``) and
+# where that endpoint spools uploads and job status (its imports run in a
+# background ``import_users --job`` process, not in the web worker)
+USER_IMPORT_BATCH_SIZE = int(os.environ.get('USER_IMPORT_BATCH_SIZE', '1000'))
+USER_IMPORT_WORKERS = int(os.environ.get('USER_IMPORT_WORKERS', '0'))
+USER_IMPORT_MAX_ROWS_PER_REQUEST = int(os.environ.get('USER_IMPORT_MAX_ROWS_PER_REQUEST', '5000'))
+USER_IMPORT_DIR = os.environ.get('USER_IMPORT_DIR', str(BASE_DIR / 'imports'))
+
+
 # Dynamic JWT key configuration
 def configure_jwt_keys():
-    """Configure JWT keys dynamically."""
+    """Configure JWT keys from the keyring."""
     try:
-        from apps.users.jwks import get_or_create_jwt_keys
-        private_key, public_key = get_or_create_jwt_keys()
-        SIMPLE_JWT['SIGNING_KEY'] = private_key
-        SIMPLE_JWT['VERIFYING_KEY'] = public_key
+        from apps.users.keyring import load_keyring
+        key = load_keyring(
+            JWT_KEYRING_DIR, JWT_KEY_ROTATION_DAYS, JWT_KEY_OVERLAP_DAYS, JWT_KEY_PREPUBLISH_HOURS,
+            JWT_SIGNING_ALGORITHM
+        ).active_key()
+        SIMPLE_JWT['ALGORITHM'] = key.alg
+        SIMPLE_JWT['SIGNING_KEY'] = key.private_pem
+        SIMPLE_JWT['VERIFYING_KEY'] = key.public_pem
     except Exception as e:
         # Fallback to HS256 with SECRET_KEY
         SIMPLE_JWT['ALGORITHM'] = 'HS256'
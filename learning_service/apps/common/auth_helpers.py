@@ -11,12 +11,18 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.permissions import BasePermission
 from jose import jwt, JWTError
-import requests
 from functools import wraps
 
+from .jwks import SUPPORTED_ALGORITHMS, JWKSUnavailable, get_jwks_cache
+from .token_cache import get_token_cache
+
 logger = logging.getLogger(__name__)
 
 
+# Marks a request whose principal has not been resolved yet (None means anonymous)
+_UNRESOLVED = object()
+
+
 class AuthenticationError(Exception):
     """Custom exception for authentication errors."""
     pass
@@ -27,35 +33,14 @@ class AuthorizationError(Exception):
     pass
 
 
-def get_jwks_from_auth_service() -> Dict[str, Any]:
-    """
-    Fetch JWKS from auth service.
-    """
-    auth_service_url = getattr(settings, 'AUTH_SERVICE_URL', 'http://auth_service:8000')
-    jwks_url = f"{auth_service_url}/api/.well-known/jwks.json"
-    
-    try:
-        response = requests.get(jwks_url, timeout=5)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        logger.error(f"Failed to fetch JWKS from {jwks_url}: {e}")
-        raise AuthenticationError("Unable to verify token")
-
-
-def get_signing_key_from_jwks(jwks: Dict[str, Any], kid: str) -> str:
+def validate_jwt_token(token: str) -> Dict[str, Any]:
     """
-    Extract signing key from JWKS.
+    Validate JWT token, reusing the claims of tokens verified before.
     """
-    for key in jwks.get('keys', []):
-        if key.get('kid') == kid:
-            # Convert JWK to PEM format (simplified)
-            # In production, use a proper JWK to PEM converter
-            return key
-    raise AuthenticationError("Signing key not found")
+    return get_token_cache('auth_helpers').verify(token, _verify_jwt_token)
 
 
-def validate_jwt_token(token: str) -> Dict[str, Any]:
+def _verify_jwt_token(token: str) -> Dict[str, Any]:
     """
     Validate JWT token using JWKS from auth service.
     """
@@ -67,15 +52,19 @@ def validate_jwt_token(token: str) -> Dict[str, Any]:
         if not kid:
             raise AuthenticationError("Token missing key ID")
         
-        # Get JWKS and signing key
-        jwks = get_jwks_from_auth_service()
-        signing_key = get_signing_key_from_jwks(jwks, kid)
+        # Signing key from the process-wide JWKS cache (shared with JWTAuthentication)
+        try:
+            signing_key = get_jwks_cache().get_key(kid)
+        except KeyError:
+            raise AuthenticationError("Signing key not found")
+        except JWKSUnavailable:
+            raise AuthenticationError("Unable to verify token")
         
         # Validate token
         payload = jwt.decode(
             token,
             signing_key,
-            algorithms=['RS256'],
+            algorithms=SUPPORTED_ALGORITHMS,
             audience='ava-microservices',
             issuer='ava-auth-service',
             options={'verify_exp': True, 'verify_aud': True, 'verify_iss': True}
@@ -83,6 +72,8 @@ def validate_jwt_token(token: str) -> Dict[str, Any]:
         
         return payload
         
+    except AuthenticationError:
+        raise
     except JWTError as e:
         logger.error(f"JWT validation error: {e}")
         raise AuthenticationError(f"Invalid token: {str(e)}")
@@ -98,7 +89,7 @@ def extract_user_from_request(request: HttpRequest) -> Optional[Dict[str, Any]]:
     """
     # Check for trusted header from API Gateway (internal calls)
     user_id = request.META.get('HTTP_X_USER_ID')
-    if user_id:
+    if user_id and user_id.strip().isdigit():
         # This is a trusted internal call from API Gateway
         return {
             'user_id': int(user_id),
@@ -121,8 +112,8 @@ def extract_user_from_request(request: HttpRequest) -> Optional[Dict[str, Any]]:
                 'roles': payload.get('roles', ['student']),
                 'source': 'jwt_token'
             }
-        except AuthenticationError:
-            # JWT validation failed, but don't raise here
+        except (AuthenticationError, TypeError, ValueError):
+            # JWT validation failed (or has no numeric sub), but don't raise here
             # Let the permission classes handle it
             pass
     
@@ -133,8 +124,18 @@ def get_current_user(request: HttpRequest) -> Optional[Dict[str, Any]]:
     """
     Get current user from request.
     Returns None if no valid authentication found.
+
+    The user is resolved on the first call and stored on the request;
+    later calls from JWTAuthentication, permissions, views and logging
+    reuse it, and requests that never ask for the user pay nothing.
     """
-    return extract_user_from_request(request)
+    # DRF wraps the Django request; memoize on the underlying HttpRequest
+    http_request = getattr(request, '_request', request)
+    user = getattr(http_request, 'auth_principal', _UNRESOLVED)
+    if user is _UNRESOLVED:
+        user = extract_user_from_request(http_request)
+        http_request.auth_principal = user
+    return user
 
 
 def require_authentication(view_func):
@@ -1,12 +1,14 @@
 """
 Autenticação customizada para JWT via auth_service
 """
-import requests
 import logging
 from django.conf import settings
 from rest_framework import authentication, exceptions
 from jose import jwt, JWTError
-from jose.backends import RSAKey
+
+from .auth_helpers import get_current_user
+from .jwks import SUPPORTED_ALGORITHMS, get_jwks_cache
+from .token_cache import get_token_cache
 
 logger = logging.getLogger(__name__)
 
@@ -20,45 +22,28 @@ class JWTAuthentication(authentication.BaseAuthentication):
         """
         Autentica o usuário via JWT token
         """
-        # Se o API Gateway já validou o token e injetou o X-User-Id,
-        # confiamos nesse header e evitamos revalidar o JWT aqui.
-        gateway_user_id = request.META.get('HTTP_X_USER_ID')
-        if gateway_user_id:
-            try:
-                user = AnonymousUser(int(gateway_user_id))
-            except (TypeError, ValueError):
-                # Se vier inválido, seguimos com a validação via JWT
-                user = None
-            else:
-                token = request.META.get('HTTP_AUTHORIZATION', '')
-                return (user, token)
+        # Usuário já resolvido na requisição (X-User-Id do gateway ou JWT
+        # validado por get_current_user): não valida o token de novo
+        principal = get_current_user(request)
+        if principal:
+            return (AnonymousUser(principal['user_id']), request.META.get('HTTP_AUTHORIZATION', ''))
 
         auth_header = request.META.get('HTTP_AUTHORIZATION')
         if not auth_header or not auth_header.startswith('Bearer '):
             return None
         
+        # Só chega aqui o token recusado acima (ex.: HS256 legado)
         token = auth_header.split(' ')[1]
         
         try:
-            # Primeiro, tenta validar com a chave local (HS256)
-            payload = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=['HS256']
-            )
-            # Suporta tokens com 'sub' (padrão JWT) ou 'user_id' (legado)
-            user_id = payload.get('sub') or payload.get('user_id')
-
-        except JWTError:
-            try:
-                # Se falhar, tenta validar via auth_service (RS256)
-                payload = self._validate_token_via_auth_service(token)
-                # Suporta tokens com 'sub' (padrão) ou 'user_id' (legado)
-                user_id = payload.get('sub') or payload.get('user_id')
+            # Tokens já verificados saem do cache sem checar a assinatura de novo
+            payload = get_token_cache('authentication').verify(token, self._decode_token)
+        except Exception as e:
+            logger.error(f"JWT validation failed: {e}")
+            raise exceptions.AuthenticationFailed('Token inválido')
 
-            except Exception as e:
-                logger.error(f"JWT validation failed: {e}")
-                raise exceptions.AuthenticationFailed('Token inválido')
+        # Suporta tokens com 'sub' (padrão JWT) ou 'user_id' (legado)
+        user_id = payload.get('sub') or payload.get('user_id')
         
         if not user_id:
             raise exceptions.AuthenticationFailed('Token inválido')
@@ -67,37 +52,40 @@ class JWTAuthentication(authentication.BaseAuthentication):
         user = AnonymousUser(user_id)
         return (user, token)
     
+    def _decode_token(self, token):
+        """
+        Valida o token com a chave local (HS256) ou, se falhar, via auth_service (RS256)
+        """
+        try:
+            return jwt.decode(
+                token,
+                settings.SECRET_KEY,
+                algorithms=['HS256']
+            )
+        except JWTError:
+            return self._validate_token_via_auth_service(token)
+    
     def _validate_token_via_auth_service(self, token):
         """
-        Valida o token via auth_service
+        Valida o token com as chaves públicas do auth_service (JWKS em cache)
         """
         try:
-            # Busca as chaves públicas do auth_service
-            jwks_url = settings.AUTH_SERVICE_JWKS_URL
-            response = requests.get(jwks_url, timeout=5)
-            response.raise_for_status()
-            
-            jwks = response.json()
-            
             # Decodifica o header do token para obter o kid (pode estar ausente)
             unverified_header = jwt.get_unverified_header(token)
             kid = unverified_header.get('kid')
 
-            # Encontra a chave correspondente; se não houver kid, usa a primeira
-            key = None
-            for jwk in jwks.get('keys', []):
-                if not kid or jwk.get('kid') == kid:
-                    key = RSAKey(jwk, algorithm='RS256')
-                    break
-            
-            if not key:
+            # Chave do kid; sem kid, usa a primeira chave do JWKS
+            try:
+                key = get_jwks_cache().get_key(kid)
+            except KeyError:
                 raise JWTError('Chave não encontrada no JWKS')
             
             # Valida o token
             payload = jwt.decode(
                 token,
                 key,
-                algorithms=['RS256'],
+                # A chave do kid só verifica assinaturas do seu próprio tipo
+                algorithms=SUPPORTED_ALGORITHMS,
                 # Observação: a verificação de aud/iss já é feita no API Gateway.
                 # Para evitar falhas de "Invalid audience" aqui, desabilitamos
                 # explicitamente essas verificações neste serviço.
@@ -6,23 +6,17 @@ import logging
 from django.http import JsonResponse
 from django.conf import settings
 
+from . import utils
+
 logger = logging.getLogger(__name__)
 
 
 def extract_user_id(request):
     """
-    Extrai o user_id do JWT ou do header X-User-Id
+    Extrai o user_id do usuário já resolvido para a requisição
+    (header X-User-Id ou JWT, ver utils.extract_user_id)
     """
-    # Primeiro, tenta extrair do header X-User-Id (se o gateway validar)
-    user_id = request.META.get('HTTP_X_USER_ID')
-    if user_id:
-        return int(user_id)
-    
-    # Se não encontrar, tenta extrair do usuário autenticado
-    if hasattr(request, 'user') and request.user.is_authenticated:
-        return request.user.id
-    
-    return None
+    return utils.extract_user_id(request)
 
 
 def require_authentication(view_func):
@@ -0,0 +1,173 @@
+"""
+Cache de JWKS do auth_service com as chaves já convertidas em objetos.
+
+As chaves ficam indexadas por ``kid`` no processo. Depois do TTL, a próxima
+requisição dispara uma atualização em segundo plano e continua usando as
+chaves atuais. Um ``kid`` desconhecido (rotação de chave) provoca no máximo
+uma busca síncrona a cada ``JWKS_MISS_REFETCH_SECONDS``. Se o auth_service
+estiver indisponível, o último conjunto de chaves válido continua em uso.
+As novas buscas enviam o último ``ETag`` (If-None-Match): se o JWKS não
+mudou, o auth_service responde 304 sem corpo.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from django.conf import settings
+from jose import jwk
+from jose.backends.base import Key
+
+logger = logging.getLogger(__name__)
+
+# Algoritmos aceitos nas chaves do JWKS (RS256 e, durante a migração, ES256)
+SUPPORTED_ALGORITHMS = ['RS256', 'ES256']
+
+
+class JWKSUnavailable(Exception):
+    """Nenhum conjunto de chaves pôde ser obtido."""
+    pass
+
+
+class JWKSCache:
+    """
+    Chaves públicas (RS256/ES256) por kid, com TTL, atualização em segundo plano e
+    nova busca limitada em caso de kid desconhecido.
+    """
+
+    def __init__(self, url: str, ttl: float = 300, miss_refetch_interval: float = 30,
+                 timeout: float = 5):
+        self.url = url
+        self.ttl = ttl
+        self.miss_refetch_interval = miss_refetch_interval
+        self.timeout = timeout
+        self.fetched_at = 0.0
+        self.fetches = 0
+        self.failures = 0
+        self.not_modified = 0
+        self._etag: Optional[str] = None
+        self._keys: Dict[str, Key] = {}
+        # Chave usada por tokens sem kid (a primeira do JWKS, como antes)
+        self._default: Optional[Key] = None
+        self._last_miss_fetch = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        # Reaproveita a conexão HTTP entre buscas
+        self._session = requests.Session()
+
+    def get_key(self, kid: Optional[str]) -> Key:
+        """
+        Chave para o ``kid`` do token (ou a chave padrão se não houver kid).
+
+        Raises:
+            KeyError: o kid não existe no JWKS, mesmo após uma nova busca
+            JWKSUnavailable: nenhuma chave foi obtida ainda
+        """
+        if self._default is None:
+            # Primeira requisição do processo: não há o que servir enquanto busca
+            with self._lock:
+                if self._default is None:
+                    self._fetch()
+        elif time.monotonic() - self.fetched_at > self.ttl:
+            self._refresh_in_background()
+
+        key = self._lookup(kid)
+        if key is not None:
+            return key
+
+        # Kid desconhecido: talvez a chave tenha sido rotacionada
+        with self._lock:
+            key = self._lookup(kid)
+            if key is None and time.monotonic() - self._last_miss_fetch >= self.miss_refetch_interval:
+                self._last_miss_fetch = time.monotonic()
+                self._fetch()
+                key = self._lookup(kid)
+        if key is None:
+            raise KeyError(kid)
+        return key
+
+    def _lookup(self, kid: Optional[str]) -> Optional[Key]:
+        return self._keys.get(kid) if kid else self._default
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name='jwks-refresh', daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            with self._lock:
+                self._fetch()
+        finally:
+            self._refreshing = False
+
+    def _fetch(self):
+        """Busca e converte o JWKS (chamar com ``_lock``); mantém as chaves atuais em caso de falha."""
+        self.fetches += 1
+        # Revalida com o ETag: se nada mudou, a resposta é um 304 sem corpo
+        headers = {'If-None-Match': self._etag} if self._etag and self._default is not None else {}
+        try:
+            response = self._session.get(self.url, timeout=self.timeout, headers=headers)
+            if response.status_code == 304:
+                self.not_modified += 1
+                self.fetched_at = time.monotonic()
+                return
+            response.raise_for_status()
+            keys, default = {}, None
+            for key_data in response.json().get('keys', []):
+                alg = key_data.get('alg', 'RS256')
+                try:
+                    if alg not in SUPPORTED_ALGORITHMS:
+                        raise ValueError(f"unsupported alg {alg}")
+                    key = jwk.construct(key_data, alg)
+                except Exception as e:
+                    logger.error(f"Ignoring unusable JWK {key_data.get('kid')}: {e}")
+                    continue
+                default = default or key
+                if key_data.get('kid'):
+                    keys[key_data['kid']] = key
+        except (requests.RequestException, ValueError) as e:
+            self.failures += 1
+            if self._default is None:
+                raise JWKSUnavailable(f"Unable to fetch JWKS from {self.url}: {e}")
+            logger.error(f"Failed to refresh JWKS from {self.url}, serving last good keyset: {e}")
+            # Tenta de novo após o próximo TTL, não a cada requisição
+            self.fetched_at = time.monotonic()
+            return
+
+        if default is None and self._default is not None:
+            logger.error(f"JWKS from {self.url} has no usable keys, serving last good keyset")
+        else:
+            self._keys, self._default = keys, default
+            self._etag = response.headers.get('ETag')
+        self.fetched_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'keys': len(self._keys),
+            'age_seconds': round(time.monotonic() - self.fetched_at, 1) if self.fetched_at else None,
+            'fetches': self.fetches,
+            'not_modified': self.not_modified,
+            'failures': self.failures,
+        }
+
+
+_cache: Optional[JWKSCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_jwks_cache() -> JWKSCache:
+    """Cache do processo, configurado pelas settings AUTH_SERVICE_JWKS_URL e JWKS_*."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = JWKSCache(
+                    settings.AUTH_SERVICE_JWKS_URL,
+                    ttl=settings.JWKS_CACHE_TTL_SECONDS,
+                    miss_refetch_interval=settings.JWKS_MISS_REFETCH_SECONDS,
+                )
+    return _cache
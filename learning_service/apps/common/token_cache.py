@@ -0,0 +1,149 @@
+"""
+Cache LRU de tokens já verificados.
+
+A chave é o SHA-256 do token (o token em si nunca fica em memória) e o valor
+são as claims validadas, guardadas até o ``exp`` do token. Um acerto dispensa
+a verificação da assinatura; tokens sem ``exp`` e falhas de validação nunca
+são guardados. Cada entrada guarda o ``kid`` do token: se a chave sair do JWKS
+(revogada no auth_service), o acerto é descartado e o token volta a ser
+verificado, e recusado. As estatísticas incluem a taxa de acerto e o tempo de CPU
+economizado (acertos x custo médio de CPU de uma verificação).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from jose import JWTError, jwt
+
+from .jwks import JWKSUnavailable, get_jwks_cache
+
+
+def _token_kid(token: str) -> Optional[str]:
+    try:
+        return jwt.get_unverified_header(token).get('kid')
+    except JWTError:
+        return None
+
+
+def _signing_key_published(kid: Optional[str]) -> bool:
+    """O kid ainda está no JWKS (tokens sem kid não são conferidos)."""
+    if not kid:
+        return True
+    try:
+        get_jwks_cache().get_key(kid)
+    except (KeyError, JWKSUnavailable):
+        return False
+    return True
+
+
+class VerifiedTokenCache:
+    """
+    Claims verificadas por digest do token, com limite de entradas (LRU) e
+    expiração no ``exp`` de cada token.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.verifications = 0
+        self.verify_cpu_seconds = 0.0
+        self._entries: 'OrderedDict[bytes, Tuple[float, Optional[str], Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, token: str, verifier: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Claims do token: do cache ou de ``verifier(token)``, que deve levantar
+        exceção se o token for inválido (a exceção é repassada).
+        """
+        digest = hashlib.sha256(token.encode()).digest()
+        claims = self._get(digest)
+        if claims is not None:
+            return claims
+
+        started = time.thread_time()
+        claims = verifier(token)
+        elapsed = time.thread_time() - started
+        with self._lock:
+            self.verifications += 1
+            self.verify_cpu_seconds += elapsed
+        self._put(digest, _token_kid(token), claims)
+        return claims
+
+    def _get(self, digest: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                expires_at, kid, claims = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(digest)
+                else:
+                    del self._entries[digest]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+        # Fora do lock: pode buscar o JWKS se o kid sumiu
+        if not _signing_key_published(kid):
+            with self._lock:
+                self._entries.pop(digest, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return claims
+
+    def _put(self, digest: bytes, kid: Optional[str], claims: Dict[str, Any]):
+        exp = claims.get('exp')
+        if not isinstance(exp, (int, float)) or exp <= time.time() or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = (float(exp), kid, claims)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            mean_verify = self.verify_cpu_seconds / self.verifications if self.verifications else 0.0
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'mean_verify_cpu_ms': round(mean_verify * 1000, 3),
+                'cpu_seconds_saved': round(self.hits * mean_verify, 3),
+            }
+
+
+_caches: Dict[str, VerifiedTokenCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_token_cache(name: str) -> VerifiedTokenCache:
+    """
+    Cache do processo para um validador. Cada validador tem o seu, pois as
+    regras de validação (aud/iss) não são as mesmas.
+    """
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                cache = _caches[name] = VerifiedTokenCache(settings.VERIFIED_TOKEN_CACHE_SIZE)
+    return cache
+
+
+def token_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.stats() for name, cache in _caches.items()}
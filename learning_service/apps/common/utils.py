@@ -4,9 +4,12 @@ Utilitários comuns para o learning_service
 import json
 import logging
 from typing import Any, Dict, List, Optional
+from django.conf import settings
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import QuerySet
 
+from .auth_helpers import get_current_user
+
 logger = logging.getLogger(__name__)
 
 
@@ -140,7 +143,8 @@ def can_user_access_course(user_id: int, course_id: int) -> bool:
     return is_user_enrolled_in_course(user_id, course_id)
 
 
-def send_interaction_event(user_id: int, lesson_id: int, interaction_type: str, payload: Dict):
+def send_interaction_event(user_id: int, lesson_id: int, interaction_type: str, payload: Dict,
+                           course_id: Optional[int] = None, tags: Optional[List[str]] = None):
     """
     Envia evento de interação para o recommendation service
     """
@@ -150,8 +154,10 @@ def send_interaction_event(user_id: int, lesson_id: int, interaction_type: str,
         event_data = {
             'user_id': user_id,
             'lesson_id': lesson_id,
+            'course_id': course_id,
             'interaction_type': interaction_type,
             'payload': payload,
+            'tags': tags or [],
             'timestamp': None  # Será preenchido pelo recommendation service
         }
         
@@ -163,7 +169,7 @@ def send_interaction_event(user_id: int, lesson_id: int, interaction_type: str,
             events_url,
             json=event_data,
             timeout=5,
-            headers={'Content-Type': 'application/json'}
+            headers={'Content-Type': 'application/json', 'X-User-Id': str(user_id)}
         )
         
         if response.status_code not in [200, 201]:
@@ -173,6 +179,29 @@ def send_interaction_event(user_id: int, lesson_id: int, interaction_type: str,
         logger.error(f"Error sending interaction event: {e}")
 
 
+def send_user_event(user_id: int, event_type: str, course_id: Optional[int] = None):
+    """
+    Envia evento de ciclo de vida (ex.: matrícula) para o recommendation service,
+    que recalcula as recomendações materializadas do usuário
+    """
+    try:
+        import requests
+
+        recommendation_url = getattr(settings, 'RECOMMENDATION_SERVICE_URL', 'http://recommendation_service:8000')
+        response = requests.post(
+            f"{recommendation_url}/events/user",
+            json={'user_id': user_id, 'event_type': event_type, 'course_id': course_id},
+            timeout=5,
+            headers={'Content-Type': 'application/json', 'X-User-Id': str(user_id)}
+        )
+
+        if response.status_code not in [200, 201]:
+            logger.warning(f"Failed to send user event: {response.status_code}")
+
+    except Exception as e:
+        logger.error(f"Error sending user event: {e}")
+
+
 def format_lesson_content(content: str, content_type: str = 'markdown') -> str:
     """
     Formata o conteúdo da lição baseado no tipo
@@ -192,42 +221,20 @@ def extract_user_id(request) -> Optional[int]:
     """
     Extrai o ID do usuário da requisição.
     Ordem de precedência:
-    1) Header confiável X-User-Id (injetado pelo API Gateway)
-    2) Campo "sub" do JWT (padrão)
-    3) Campo legado "user_id" do JWT
-    """
-    # 1) Preferir header confiável repassado pelo gateway
-    user_id_header = request.META.get('HTTP_X_USER_ID')
-    if user_id_header:
+    1) Usuário resolvido uma vez por requisição (X-User-Id do gateway ou JWT
+       validado, ver auth_helpers.get_current_user)
+    2) Usuário autenticado pelo DRF (JWTAuthentication, que também aceita
+       tokens HS256 legados e o campo "user_id")
+    """
+    user = get_current_user(request)
+    if user:
+        return user['user_id']
+
+    # 2) O token já foi validado pelo DRF; não é preciso decodificá-lo de novo
+    drf_user = getattr(request, 'user', None)
+    if drf_user is not None and drf_user.is_authenticated:
         try:
-            return int(user_id_header)
+            return int(drf_user.id)
         except (TypeError, ValueError):
-            pass
-
-    # 2/3) Tentar extrair do JWT sem verificação (apenas para leitura de claims)
-    try:
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if not auth_header.startswith('Bearer '):
-            return None
-
-        token = auth_header[7:]
-
-        import base64
-        import json
-
-        parts = token.split('.')
-        if len(parts) != 3:
-            return None
-
-        payload = parts[1]
-        padding = '=' * (-len(payload) % 4)
-        decoded_payload = base64.urlsafe_b64decode(payload + padding)
-        payload_data = json.loads(decoded_payload)
-
-        # Prioriza "sub" (padrão RS256) e mantém compat com "user_id" (legado)
-        uid = payload_data.get('sub') or payload_data.get('user_id')
-        return int(uid) if uid is not None else None
-
-    except Exception as e:
-        logger.warning(f"Error extracting user ID from request: {e}")
-        return None
\ No newline at end of file
+            logger.warning(f"Non-numeric user ID on authenticated request: {drf_user.id!r}")
+    return None
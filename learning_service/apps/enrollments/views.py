@@ -12,6 +12,7 @@ from .serializers import (
 )
 from apps.common.decorators import require_authentication
 from apps.common.auth_helpers import get_user_id_from_request, IsAuthenticatedOrTrustedHeader
+from apps.common.utils import send_user_event
 
 
 class EnrollmentViewSet(viewsets.ModelViewSet):
@@ -62,6 +63,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
             raise permissions.PermissionDenied("Usuário já está matriculado neste curso")
 
         serializer.save(user_id=user_id)
+        send_user_event(user_id, 'enroll', course_id=course.id)
 
     def perform_update(self, serializer):
         """Verifica permissões ao atualizar"""
@@ -135,6 +137,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
                         existing_enrollment.role = new_role
                     existing_enrollment.status = 'active'
                     existing_enrollment.save()
+                    send_user_event(user_id, 'enroll', course_id=course.id)
                     response_serializer = EnrollmentSerializer(existing_enrollment)
                     return Response(response_serializer.data, status=status.HTTP_200_OK)
                 # Já está ativa: tornar idempotente e retornar 200 com a matrícula
@@ -143,6 +146,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
 
             # Cria a matrícula
             enrollment = serializer.save(user_id=user_id)
+            send_user_event(user_id, 'enroll', course_id=course.id)
             response_serializer = EnrollmentSerializer(enrollment)
             return Response(response_serializer.data, status=status.HTTP_201_CREATED)
         
@@ -238,6 +238,12 @@ AUTH_SERVICE_JWKS_URL = os.environ.get(
     'AUTH_SERVICE_JWKS_URL',
     'http://api-gateway/auth/.well-known/jwks.json'
 )
+# Cache do JWKS por processo: atualização em segundo plano após o TTL e no
+# máximo uma nova busca por intervalo quando chega um kid desconhecido
+JWKS_CACHE_TTL_SECONDS = int(os.environ.get('JWKS_CACHE_TTL_SECONDS', '300'))
+JWKS_MISS_REFETCH_SECONDS = int(os.environ.get('JWKS_MISS_REFETCH_SECONDS', '30'))
+# Tokens já verificados ficam em cache (LRU) até o exp; 0 desativa
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get('VERIFIED_TOKEN_CACHE_SIZE', '10000'))
 
 # Logging
 LOGGING = {
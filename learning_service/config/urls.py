@@ -8,13 +8,16 @@ from django.conf.urls.static import static
 from django.http import JsonResponse
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
+from apps.common.token_cache import token_cache_stats
+
 def health_check(request):
     """Health check endpoint for the learning service."""
     return JsonResponse({
         'status': 'healthy',
         'service': 'learning-service',
         'version': '1.0.0',
-        'timestamp': '2024-01-01T12:00:00Z'
+        'timestamp': '2024-01-01T12:00:00Z',
+        'token_cache': token_cache_stats(),
     })
 
 urlpatterns = [
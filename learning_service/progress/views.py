@@ -118,7 +118,9 @@ class ProgressViewSet(viewsets.ModelViewSet):
                 payload={
                     'score': score,
                     'time_spent': time_spent
-                }
+                },
+                course_id=progress.lesson.module.course_id,
+                tags=progress.lesson.module.course.tags
             )
             
             response_serializer = ProgressSerializer(progress)
@@ -232,7 +234,9 @@ class InteractionViewSet(viewsets.ModelViewSet):
                 user_id=user_id,
                 lesson_id=interaction.lesson.id,
                 interaction_type=interaction.interaction_type,
-                payload=interaction.payload
+                payload=interaction.payload,
+                course_id=interaction.lesson.module.course_id,
+                tags=interaction.lesson.module.course.tags
             )
     
     def perform_update(self, serializer):
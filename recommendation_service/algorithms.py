@@ -0,0 +1,195 @@
+"""
+Algorithm registry and shadow-mode evaluation.
+
+Every ranking algorithm is registered under a name and a kind ("courses" or
+"lessons") and returns ranked ``(item_id, score)`` pairs. One algorithm per
+kind serves responses; the algorithms listed in ``REC_SHADOW_ALGORITHMS`` run
+on a sampled fraction of requests in a small thread pool, after the response
+has been built, and their output, latency and overlap with the served list
+are logged as ``shadow_run`` algorithm events. Latencies of every run
+(served or shadow) are accounted per algorithm.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from logging_config import get_logger, log_algorithm_event
+
+
+SERVING_ALGORITHM = os.getenv('REC_ALGORITHM', 'personalized_pagerank')
+SHADOW_ALGORITHMS = [name.strip() for name in os.getenv('REC_SHADOW_ALGORITHMS', '').split(',') if name.strip()]
+SHADOW_SAMPLE_RATE = float(os.getenv('REC_SHADOW_SAMPLE_RATE', '0.1'))
+SHADOW_WORKERS = int(os.getenv('REC_SHADOW_WORKERS', '2'))
+# Shadow requests beyond this backlog are dropped instead of queueing
+SHADOW_MAX_PENDING = int(os.getenv('REC_SHADOW_MAX_PENDING', '100'))
+
+_LATENCY_SAMPLES = 1024
+
+Ranker = Callable[[int, int], List[Tuple[int, float]]]
+
+logger = get_logger('recommendation_service.algorithms')
+
+
+class LatencyStats:
+    """
+    Run count, error count and a ring of the last latency samples of one algorithm.
+    """
+
+    def __init__(self, samples: int = _LATENCY_SAMPLES):
+        self._samples = np.zeros(samples, dtype=np.float32)
+        self.count = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, latency_ms: float, error: bool = False):
+        with self._lock:
+            self._samples[self.count % len(self._samples)] = latency_ms
+            self.count += 1
+            self.errors += int(error)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = self._samples[:min(self.count, len(self._samples))].copy()
+        if not len(samples):
+            return {'count': 0, 'errors': self.errors}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]).tolist()
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'p50_ms': round(p50, 2),
+            'p95_ms': round(p95, 2),
+            'p99_ms': round(p99, 2),
+            'max_ms': round(float(samples.max()), 2),
+        }
+
+
+class AlgorithmRegistry:
+    """
+    Named rankers grouped by the kind of item they return.
+    """
+
+    def __init__(self):
+        self._rankers: Dict[str, Tuple[str, Ranker]] = {}
+        self._stats: Dict[str, LatencyStats] = {}
+
+    def register(self, name: str, kind: str, ranker: Ranker):
+        self._rankers[name] = (kind, ranker)
+        self._stats[name] = LatencyStats()
+
+    def kind(self, name: str) -> Optional[str]:
+        entry = self._rankers.get(name)
+        return entry[0] if entry else None
+
+    def names(self, kind: Optional[str] = None) -> List[str]:
+        return [name for name, (item_kind, _) in self._rankers.items() if kind in (None, item_kind)]
+
+    def run(self, name: str, user_id: int, limit: int) -> Tuple[List[Tuple[int, float]], float]:
+        """
+        Run one algorithm and account its latency.
+
+        Returns:
+            Tuple[List[Tuple[int, float]], float]: ranked (item_id, score)
+            pairs and the latency in milliseconds
+        """
+        _, ranker = self._rankers[name]
+        started = time.perf_counter()
+        try:
+            ranked = ranker(user_id, limit)
+        except Exception:
+            self._stats[name].add((time.perf_counter() - started) * 1000, error=True)
+            raise
+        latency_ms = (time.perf_counter() - started) * 1000
+        self._stats[name].add(latency_ms)
+        return ranked, latency_ms
+
+    def record(self, name: str, latency_ms: float):
+        """Account the latency of a run made outside ``run`` (e.g. a composite path)."""
+        self._stats.setdefault(name, LatencyStats()).add(latency_ms)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.summary() for name, stats in self._stats.items()}
+
+
+def overlap_at_k(served: Sequence[int], shadow: Sequence[int]) -> float:
+    """Share of the served items that the shadow algorithm also returned."""
+    if not served:
+        return 1.0 if not shadow else 0.0
+    return len(set(served) & set(shadow)) / len(served)
+
+
+class ShadowRunner:
+    """
+    Runs the shadow algorithms of a kind on sampled requests, off the response path.
+    """
+
+    def __init__(self, registry: AlgorithmRegistry, shadows: Sequence[str] = SHADOW_ALGORITHMS,
+                 sample_rate: float = SHADOW_SAMPLE_RATE, workers: int = SHADOW_WORKERS,
+                 max_pending: int = SHADOW_MAX_PENDING):
+        self.registry = registry
+        self.shadows = [name for name in shadows if registry.kind(name)]
+        for name in set(shadows) - set(self.shadows):
+            logger.error(f"Unknown shadow algorithm {name!r} ignored")
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shadow') if self.shadows else None
+
+    def submit(self, kind: str, user_id: int, limit: int, served_algorithm: str,
+               served: Sequence[int], served_latency_ms: Optional[float] = None) -> bool:
+        """
+        Maybe schedule the shadows of ``kind`` for this request; never blocks.
+        ``served`` are the item ids of the response.
+        """
+        names = [name for name in self.shadows
+                 if name != served_algorithm and self.registry.kind(name) == kind]
+        if not names or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending += 1
+        self._executor.submit(self._run, names, user_id, limit, served_algorithm,
+                              list(served), served_latency_ms)
+        return True
+
+    def _run(self, names: List[str], user_id: int, limit: int, served_algorithm: str,
+             served: List[int], served_latency_ms: Optional[float]):
+        try:
+            for name in names:
+                try:
+                    ranked, latency_ms = self.registry.run(name, user_id, limit)
+                except Exception as e:
+                    logger.error(f"Shadow algorithm {name} failed for user {user_id}: {e}")
+                    continue
+                items = [item_id for item_id, _ in ranked[:limit]]
+                log_algorithm_event(
+                    event_type="shadow_run",
+                    algorithm=name,
+                    performance_data={
+                        'latency_ms': round(latency_ms, 2),
+                        'served_latency_ms': round(served_latency_ms, 2) if served_latency_ms is not None else None,
+                        'overlap_at_k': round(overlap_at_k(served[:limit], items), 4),
+                        'count': len(items),
+                    },
+                    details={
+                        'user_id': user_id,
+                        'served_algorithm': served_algorithm,
+                        'served': served[:limit],
+                        'items': items,
+                    }
+                )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -4,13 +4,16 @@ Supports both JWT validation and trusted X-User-Id headers from API Gateway.
 """
 import os
 import logging
+import time
 from typing import Optional, Dict, Any, List
 from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-import requests
 import json
 
+from jwks_cache import jwks_cache, JWKSUnavailable, SUPPORTED_ALGORITHMS
+from token_cache import token_cache, token_digest
+
 logger = logging.getLogger(__name__)
 
 # Security scheme
@@ -27,35 +30,22 @@ class AuthorizationError(Exception):
     pass
 
 
-def get_jwks_from_auth_service() -> Dict[str, Any]:
+async def validate_jwt_token(token: str) -> Dict[str, Any]:
     """
-    Fetch JWKS from auth service. Prefer the API Gateway as proxy to avoid invalid Host issues.
+    Validate JWT token using the cached JWKS from auth service.
+    Claims of tokens verified before are served from the token cache.
     """
-    jwks_url = os.getenv('AUTH_SERVICE_JWKS_URL', 'http://api-gateway/auth/.well-known/jwks.json')
-    
-    try:
-        response = requests.get(jwks_url, timeout=5)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        logger.error(f"Failed to fetch JWKS from {jwks_url}: {e}")
-        raise AuthenticationError("Unable to verify token")
+    digest = token_digest(token)
+    cached = token_cache.get(digest)
+    if cached is not None:
+        kid, claims = cached
+        try:
+            # A revoked key leaves the JWKS: its tokens are verified (and refused) again
+            await jwks_cache.get_key(kid)
+            return claims
+        except (KeyError, JWKSUnavailable):
+            token_cache.discard(digest)
 
-
-def get_signing_key_from_jwks(jwks: Dict[str, Any], kid: str) -> str:
-    """
-    Extract signing key from JWKS.
-    """
-    for key in jwks.get('keys', []):
-        if key.get('kid') == kid:
-            return key
-    raise AuthenticationError("Signing key not found")
-
-
-def validate_jwt_token(token: str) -> Dict[str, Any]:
-    """
-    Validate JWT token using JWKS from auth service.
-    """
     try:
         # Decode header to get key ID
         header = jwt.get_unverified_header(token)
@@ -64,22 +54,31 @@ def validate_jwt_token(token: str) -> Dict[str, Any]:
         if not kid:
             raise AuthenticationError("Token missing key ID")
         
-        # Get JWKS and signing key
-        jwks = get_jwks_from_auth_service()
-        signing_key = get_signing_key_from_jwks(jwks, kid)
+        # Parsed signing key; fetched without blocking the event loop
+        try:
+            signing_key = await jwks_cache.get_key(kid)
+        except KeyError:
+            raise AuthenticationError("Signing key not found")
+        except JWKSUnavailable as e:
+            logger.error(str(e))
+            raise AuthenticationError("Unable to verify token")
         
         # Validate token
+        started = time.thread_time()
         payload = jwt.decode(
             token,
             signing_key,
-            algorithms=['RS256'],
+            algorithms=SUPPORTED_ALGORITHMS,
             audience='ava-microservices',
             issuer='ava-auth-service',
             options={'verify_exp': True, 'verify_aud': True, 'verify_iss': True}
         )
+        token_cache.put(digest, kid, payload, time.thread_time() - started)
         
         return payload
         
+    except AuthenticationError:
+        raise
     except JWTError as e:
         logger.error(f"JWT validation error: {e}")
         raise AuthenticationError(f"Invalid token: {str(e)}")
@@ -108,7 +107,7 @@ def extract_user_from_request(request: Request) -> Optional[Dict[str, Any]]:
     return None
 
 
-def extract_user_from_token(credentials: Optional[HTTPAuthorizationCredentials]) -> Optional[Dict[str, Any]]:
+async def extract_user_from_token(credentials: Optional[HTTPAuthorizationCredentials]) -> Optional[Dict[str, Any]]:
     """
     Extract user information from JWT token.
     """
@@ -116,7 +115,7 @@ def extract_user_from_token(credentials: Optional[HTTPAuthorizationCredentials])
         return None
     
     try:
-        payload = validate_jwt_token(credentials.credentials)
+        payload = await validate_jwt_token(credentials.credentials)
         return {
             'user_id': int(payload.get('sub')),
             'email': payload.get('email', ''),
@@ -128,7 +127,7 @@ def extract_user_from_token(credentials: Optional[HTTPAuthorizationCredentials])
         return None
 
 
-def get_current_user(
+async def get_current_user(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Optional[Dict[str, Any]]:
@@ -142,14 +141,14 @@ def get_current_user(
         return user
     
     # Try JWT token
-    user = extract_user_from_token(credentials)
+    user = await extract_user_from_token(credentials)
     if user:
         return user
     
     return None
 
 
-def require_authentication(
+async def require_authentication(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Dict[str, Any]:
@@ -157,7 +156,7 @@ def require_authentication(
     Dependency that requires authentication.
     Raises HTTPException if no valid authentication found.
     """
-    user = get_current_user(request, credentials)
+    user = await get_current_user(request, credentials)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -177,11 +176,11 @@ def require_role(required_roles: List[str]):
     """
     Dependency factory for role-based access control.
     """
-    def role_checker(
+    async def role_checker(
         request: Request,
         credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
     ) -> Dict[str, Any]:
-        user = get_current_user(request, credentials)
+        user = await get_current_user(request, credentials)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -216,12 +215,12 @@ def require_role(required_roles: List[str]):
     return role_checker
 
 
-def get_user_id_from_request(request: Request) -> Optional[int]:
+async def get_user_id_from_request(request: Request) -> Optional[int]:
     """
     Extract user ID from request.
     Returns None if no valid authentication found.
     """
-    user = get_current_user(request)
+    user = await get_current_user(request, await security(request))
     return user['user_id'] if user else None
 
 
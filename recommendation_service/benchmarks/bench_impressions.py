@@ -0,0 +1,44 @@
+"""
+Ingestion cost and memory of the impression ring buffers.
+
+Usage (from recommendation_service/):
+    python -m benchmarks.bench_impressions --users 100000 --responses 200000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from impression_store import ImpressionStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--responses', type=int, default=200_000)
+    parser.add_argument('--items', type=int, default=10, help="items per response")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    store = ImpressionStore(initial_capacity=args.users)
+    users = rng.integers(0, args.users, args.responses).tolist()
+    responses = [row.tolist() for row in rng.integers(1, 5_000, (args.responses, args.items), dtype=np.int32)]
+
+    started = time.perf_counter()
+    for user_id, keys in zip(users, responses):
+        store.record(user_id, keys)
+    elapsed = time.perf_counter() - started
+    print(f"record: {elapsed / args.responses * 1e6:.2f} us/response, "
+          f"{elapsed / (args.responses * args.items) * 1e6:.3f} us/item")
+    print(f"memory: {store.memory_bytes() / len(store):.0f} bytes/user over {len(store)} users")
+
+    candidates = [{"lesson_id": key, "score": 1.0} for key in responses[0] * 2]
+    started = time.perf_counter()
+    for user_id in users[:10_000]:
+        store.demote(user_id, candidates)
+    print(f"demote({len(candidates)} candidates): {(time.perf_counter() - started) / 10_000 * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Per-request overhead of the correlation/timing middleware.
+
+Compares a bare Starlette app, the previous ``@app.middleware("http")``
+(BaseHTTPMiddleware) implementation and the raw ASGI CorrelationIdMiddleware,
+calling the ASGI app directly so only the middleware cost is measured.
+
+Usage (from recommendation_service/):
+    python -m benchmarks.bench_middleware --requests 20000
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from logging_config import log_request
+from middleware import CorrelationIdMiddleware
+
+
+async def endpoint(request: Request):
+    return PlainTextResponse("ok")
+
+
+async def add_correlation_id(request: Request, call_next):
+    """The decorator-style middleware this benchmark replaces."""
+    correlation_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
+    request.state.correlation_id = correlation_id
+    start_time = time.time()
+    response = await call_next(request)
+    log_request(
+        method=request.method,
+        path=str(request.url.path),
+        status_code=response.status_code,
+        response_time=time.time() - start_time,
+        user_id=request.headers.get("X-User-Id"),
+        correlation_id=correlation_id
+    )
+    response.headers["X-Request-ID"] = correlation_id
+    return response
+
+
+def build_apps():
+    routes = [Route("/ping", endpoint)]
+    bare = Starlette(routes=routes)
+    decorator = Starlette(routes=routes)
+    decorator.add_middleware(BaseHTTPMiddleware, dispatch=add_correlation_id)
+    raw = Starlette(routes=routes)
+    raw.add_middleware(CorrelationIdMiddleware)
+    return {"bare": bare, "base_http_middleware": decorator, "raw_asgi": raw}
+
+
+async def run(app, requests: int) -> np.ndarray:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/ping", "raw_path": b"/ping",
+        "query_string": b"", "root_path": "", "server": ("test", 80), "client": ("test", 1),
+        "headers": [(b"host", b"test"), (b"x-user-id", b"7")],
+    }
+
+    async def send(message):
+        pass
+
+    latencies = np.empty(requests)
+    for i in range(requests):
+        messages = [{"type": "http.disconnect"}, {"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            return messages.pop() if len(messages) > 1 else messages[0]
+
+        started = time.perf_counter()
+        await app(dict(scope), receive, send)
+        latencies[i] = time.perf_counter() - started
+    return latencies * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--with-logging', action='store_true',
+                        help="keep the JSON request log on (adds the same file I/O to both variants)")
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.disable(logging.CRITICAL)
+
+    apps = build_apps()
+    results = {}
+    for name, app in apps.items():
+        asyncio.run(run(app, 1_000))  # warm up
+        results[name] = asyncio.run(run(app, args.requests))
+
+    bare = np.median(results["bare"])
+    for name, latencies in results.items():
+        print(f"{name:22s} p50 {np.median(latencies):7.1f} us  p99 {np.percentile(latencies, 99):7.1f} us  "
+              f"overhead {np.median(latencies) - bare:+7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Resident memory and lookup latency of per-course lesson neighbour partitions.
+
+Builds a synthetic neighbour table, splits it by course and replays
+Zipf-distributed lesson lookups against an LRU budget, next to the
+monolithic table.
+
+Usage (from recommendation_service/):
+    python -m benchmarks.bench_partitions --courses 2000 --lessons-per-course 100 --budget-mb 16
+"""
+import argparse
+import logging
+import tempfile
+import time
+
+import numpy as np
+
+from model_partitions import PartitionedNeighbours, write_partitions
+from neighbour_table import NeighbourTable, NEIGHBOURS_PER_ITEM
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', type=int, default=2_000)
+    parser.add_argument('--lessons-per-course', type=int, default=100)
+    parser.add_argument('--budget-mb', type=float, default=16)
+    parser.add_argument('--lookups', type=int, default=200_000)
+    parser.add_argument('--zipf', type=float, default=1.2, help="skew of course popularity")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rng = np.random.default_rng(args.seed)
+    n_lessons = args.courses * args.lessons_per_course
+    k = NEIGHBOURS_PER_ITEM
+    table = NeighbourTable(
+        np.arange(1, n_lessons + 1, dtype=np.int64),
+        np.arange(0, (n_lessons + 1) * k, k, dtype=np.int64),
+        rng.integers(1, n_lessons + 1, n_lessons * k),
+        rng.random(n_lessons * k, dtype=np.float32),
+    )
+    lesson_courses = {lesson_id: (lesson_id - 1) // args.lessons_per_course + 1
+                      for lesson_id in range(1, n_lessons + 1)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        path = write_partitions(table, lesson_courses, directory)
+        print(f"write: {time.perf_counter() - started:.2f} s for {args.courses} partitions")
+        partitioned = PartitionedNeighbours(path, budget_bytes=int(args.budget_mb * 1024 * 1024))
+
+        courses = np.minimum(rng.zipf(args.zipf, args.lookups), args.courses)
+        lessons = ((courses - 1) * args.lessons_per_course
+                   + rng.integers(1, args.lessons_per_course + 1, args.lookups)).tolist()
+        latencies = np.empty(args.lookups)
+        for i, lesson_id in enumerate(lessons):
+            started = time.perf_counter()
+            partitioned.lookup(lesson_id, 10)
+            latencies[i] = time.perf_counter() - started
+        latencies *= 1e6
+
+        stats = partitioned.stats()
+        monolithic = table.nbytes + table.item_ids.nbytes * 2  # table + lesson->course map
+        print(f"monolithic: {monolithic / 2**20:.1f} MB resident")
+        print(f"partitioned: {stats['resident_bytes'] / 2**20:.1f} MB resident in "
+              f"{stats['resident_partitions']} partitions (+{partitioned.lesson_ids.nbytes * 2 / 2**20:.1f} MB index), "
+              f"hit rate {stats['hits'] / args.lookups:.1%}, {stats['evictions']} evictions")
+        hits = latencies[latencies < np.percentile(latencies, 50) * 5]
+        print(f"lookup p50 {np.median(latencies):.1f} us  p99 {np.percentile(latencies, 99):.1f} us  "
+              f"max {latencies.max():.0f} us (miss); hit-only mean {hits.mean():.1f} us")
+        started = time.perf_counter()
+        for lesson_id in lessons[:20_000]:
+            table.lookup(lesson_id, 10)
+        print(f"monolithic lookup mean {(time.perf_counter() - started) / 20_000 * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
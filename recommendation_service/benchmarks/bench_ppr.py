@@ -0,0 +1,46 @@
+"""
+Latency of personalized PageRank on a synthetic user-course graph.
+
+Usage (from recommendation_service/):
+    python -m benchmarks.bench_ppr --edges 1000000 --users 100000 --courses 5000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from graph_recommender import BipartiteGraph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--edges', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--courses', type=int, default=5_000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    users = rng.integers(0, args.users, args.edges)
+    # Zipf-distributed course popularity: a few hub courses, long tail
+    courses = rng.zipf(1.3, args.edges) % args.courses
+
+    started = time.perf_counter()
+    graph = BipartiteGraph(users, courses)
+    print(f"graph: {graph.n_edges} edges, {len(graph.user_ids)} users, "
+          f"{len(graph.course_ids)} courses, built in {time.perf_counter() - started:.2f}s")
+
+    latencies = []
+    for user_id in rng.choice(graph.user_ids, args.queries):
+        started = time.perf_counter()
+        graph.recommend(int(user_id), limit=10)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies = np.array(latencies)
+    print(f"recommend(limit=10): p50 {np.percentile(latencies, 50):.1f} ms, "
+          f"p95 {np.percentile(latencies, 95):.1f} ms, max {latencies.max():.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
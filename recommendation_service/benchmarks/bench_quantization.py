@@ -0,0 +1,84 @@
+"""
+Recall loss vs memory saved by float16 / int8 model storage.
+
+Item factor matrix: exact float32 top-k against users' factor vectors is
+compared with the top-k scored on the quantized matrix (dequantized on the
+fly). Neighbour table: rankings of ``recommend_from_neighbours`` over users'
+item sets are compared with the float32 table.
+
+Usage (from recommendation_service/):
+    python -m benchmarks.bench_quantization --items 100000 --dims 64 --queries 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from neighbour_table import NeighbourTable, recommend_from_neighbours
+from quantization import PRECISIONS, QuantizedMatrix
+
+
+def recall(exact, approximate) -> float:
+    return len(set(exact) & set(approximate)) / max(len(exact), 1)
+
+
+def bench_factors(args, rng):
+    # Clustered low-rank factors, like a trained ALS / two-tower model
+    centers = rng.normal(0, 1, (64, args.dims)).astype(np.float32)
+    items = (centers[rng.integers(0, 64, args.items)]
+             + rng.normal(0, 0.5, (args.items, args.dims))).astype(np.float32)
+    users = (centers[rng.integers(0, 64, args.queries)]
+             + rng.normal(0, 0.5, (args.queries, args.dims))).astype(np.float32)
+    exact = QuantizedMatrix.from_float(items, 'float32')
+    truth = [exact.top_k(user, args.k)[0] for user in users]
+
+    print(f"item factors {args.items} x {args.dims}, recall@{args.k} over {args.queries} users")
+    for precision in PRECISIONS:
+        matrix = QuantizedMatrix.from_float(items, precision)
+        started = time.perf_counter()
+        found = [matrix.top_k(user, args.k)[0] for user in users]
+        elapsed = (time.perf_counter() - started) / args.queries * 1000
+        mean_recall = np.mean([recall(t.tolist(), f.tolist()) for t, f in zip(truth, found)])
+        print(f"  {precision:8s} {matrix.nbytes / 2**20:7.1f} MB ({exact.nbytes / matrix.nbytes:.1f}x smaller)  "
+              f"recall {mean_recall:.4f}  {elapsed:.2f} ms/query")
+
+
+def bench_neighbours(args, rng):
+    n = args.items
+    rows = []
+    for item_id in range(1, n + 1):
+        candidates = rng.integers(1, n + 1, 50)
+        rows.append((item_id, candidates, rng.pareto(2.0, 50).astype(np.float32)))
+    tables = {precision: NeighbourTable.from_rows(rows, precision=precision) for precision in PRECISIONS}
+    # The previous layout: int64 neighbour ids, float32 scores
+    base = tables['float32']
+    previous_bytes = base.nbytes + base.neighbour_ids.nbytes
+
+    histories = [rng.integers(1, n + 1, 5).tolist() for _ in range(args.queries)]
+    truth = [[item for item, _ in recommend_from_neighbours(base, history, args.k)] for history in histories]
+    print(f"lesson neighbour table {n} items x {base.indptr[-1] // n} neighbours, "
+          f"recall@{args.k} of recommend_from_neighbours")
+    print(f"  {'int64/f32':8s} {previous_bytes / 2**20:7.1f} MB (previous layout)")
+    for precision, table in tables.items():
+        found = [[item for item, _ in recommend_from_neighbours(table, history, args.k)] for history in histories]
+        mean_recall = np.mean([recall(t, f) for t, f in zip(truth, found)])
+        print(f"  {precision:8s} {table.nbytes / 2**20:7.1f} MB ({previous_bytes / table.nbytes:.1f}x smaller)  "
+              f"recall {mean_recall:.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--dims', type=int, default=64)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    bench_factors(args, rng)
+    bench_neighbours(args, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Per-request overhead of the token-bucket rate limiter.
+
+Measures ``acquire`` on its own (in-process store, optionally the shared
+PostgreSQL store) and the RateLimitMiddleware on a bare Starlette app,
+calling the ASGI app directly so only the limiter cost is measured.
+
+Usage (from recommendation_service/):
+    python -m benchmarks.bench_rate_limit --users 100000 --checks 500000
+    DB_HOST=localhost DB_PORT=5435 python -m benchmarks.bench_rate_limit --postgres
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from middleware import RateLimitMiddleware
+from rate_limit import PostgresTokenBucketLimiter, TokenBucketLimiter
+
+
+async def endpoint(request: Request):
+    return PlainTextResponse("ok")
+
+
+def bench_acquire(limiter: TokenBucketLimiter, keys) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        limiter.acquire(key)
+    return (time.perf_counter() - started) / len(keys) * 1e6
+
+
+async def run(app, user_ids) -> np.ndarray:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/recommendations/me", "raw_path": b"/recommendations/me",
+        "query_string": b"", "root_path": "", "server": ("test", 80), "client": ("test", 1),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    latencies = np.empty(len(user_ids))
+    for i, user_id in enumerate(user_ids):
+        request_scope = dict(scope, headers=[(b"host", b"test"), (b"x-user-id", user_id)])
+        started = time.perf_counter()
+        await app(request_scope, receive, send)
+        latencies[i] = time.perf_counter() - started
+    return latencies * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--checks', type=int, default=500_000)
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--postgres', action='store_true',
+                        help="also measure the shared store (needs a reachable recommendation_db)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rng = np.random.default_rng(args.seed)
+    keys = [f"user:{user_id}" for user_id in rng.integers(0, args.users, args.checks).tolist()]
+
+    limiter = TokenBucketLimiter(per_minute=120, burst=30)
+    print(f"memory acquire: {bench_acquire(limiter, keys):.2f} us/check "
+          f"({limiter.limited_total} limited, {len(limiter._buckets)} buckets)")
+    started = time.perf_counter()
+    limiter.prune()
+    print(f"memory prune: {(time.perf_counter() - started) * 1000:.1f} ms over {args.users} buckets")
+
+    if args.postgres:
+        from database import ensure_schema
+
+        ensure_schema()
+        shared = PostgresTokenBucketLimiter(per_minute=120, burst=30)
+        sample = keys[:5_000]
+        print(f"postgres acquire: {bench_acquire(shared, sample):.1f} us/check "
+              f"({shared.fallback_total} fell back to memory)")
+
+    user_ids = [str(user_id).encode() for user_id in rng.integers(0, args.users, args.requests).tolist()]
+    routes = [Route("/recommendations/me", endpoint)]
+    bare = Starlette(routes=routes)
+    limited = Starlette(routes=routes)
+    limited.add_middleware(RateLimitMiddleware, limiter=TokenBucketLimiter(per_minute=1e9, burst=1e9))
+    results = {}
+    for name, app in {"bare": bare, "rate_limited": limited}.items():
+        asyncio.run(run(app, user_ids[:1_000]))  # warm up
+        results[name] = asyncio.run(run(app, user_ids))
+
+    base = np.median(results["bare"])
+    for name, latencies in results.items():
+        print(f"{name:14s} p50 {np.median(latencies):7.1f} us  p99 {np.percentile(latencies, 99):7.1f} us  "
+              f"overhead {np.median(latencies) - base:+7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
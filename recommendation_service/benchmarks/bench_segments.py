@@ -0,0 +1,68 @@
+"""
+Write and scan throughput of the columnar event segments.
+
+Usage (from recommendation_service/):
+    python -m benchmarks.bench_segments --events 20000000 --days 30
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from event_segments import SegmentWriter, iter_segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=20_000_000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--lessons', type=int, default=20_000)
+    parser.add_argument('--single', type=int, default=200_000,
+                        help="events written one by one through SegmentWriter.append")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        writer = SegmentWriter(directory)
+        start = 1_700_000_000 - 1_700_000_000 % 86400
+
+        timestamps = start + rng.integers(0, 86400, args.single)
+        started = time.perf_counter()
+        for user_id, lesson_id, timestamp in zip(rng.integers(0, args.users, args.single).tolist(),
+                                                 rng.integers(0, args.lessons, args.single).tolist(),
+                                                 np.sort(timestamps).tolist()):
+            writer.append(user_id, lesson_id, 0, timestamp)
+        writer.flush()
+        print(f"append: {(time.perf_counter() - started) / args.single * 1e6:.2f} us/event")
+
+        started = time.perf_counter()
+        per_day = args.events // args.days
+        for day in range(args.days):
+            writer.append_many(
+                rng.integers(0, args.users, per_day),
+                rng.zipf(1.2, per_day) % args.lessons,
+                rng.integers(0, 9, per_day),
+                start + day * 86400 + rng.integers(0, 86400, per_day),
+            )
+        print(f"append_many: {per_day * args.days} events in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        events = 0
+        popularity = np.zeros(args.lessons, dtype=np.int64)
+        activity = np.zeros(args.users, dtype=np.int64)
+        types = np.zeros(256, dtype=np.int64)
+        for _, columns in iter_segments(directory):
+            popularity += np.bincount(columns['item_idx'], minlength=args.lessons)
+            activity += np.bincount(columns['user_idx'], minlength=args.users)
+            types += np.bincount(columns['type'], minlength=256)
+            events += len(columns['ts'])
+        elapsed = time.perf_counter() - started
+        print(f"scan (3 bincounts): {events} events in {elapsed:.2f}s "
+              f"({events / elapsed / 1e6:.0f}M events/s)")
+
+
+if __name__ == "__main__":
+    main()
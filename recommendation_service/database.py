@@ -0,0 +1,114 @@
+"""
+PostgreSQL access for the recommendation service (recommendation_db).
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+DB_MIN_CONNECTIONS = int(os.getenv('DB_MIN_CONNECTIONS', '1'))
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', '10'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    lesson_id INTEGER NOT NULL,
+    interaction_type VARCHAR(20) NOT NULL,
+    score REAL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+ALTER TABLE interactions ADD COLUMN IF NOT EXISTS course_id INTEGER;
+CREATE INDEX IF NOT EXISTS interactions_user_created_idx ON interactions (user_id, created_at);
+CREATE INDEX IF NOT EXISTS interactions_created_idx ON interactions (created_at);
+
+CREATE TABLE IF NOT EXISTS enrollments (
+    user_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    enrolled_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, course_id)
+);
+
+CREATE TABLE IF NOT EXISTS precomputed_recommendations (
+    user_id INTEGER PRIMARY KEY,
+    recommendations JSONB NOT NULL,
+    algorithm VARCHAR(50) NOT NULL,
+    computed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Shared token buckets (REC_RATE_LIMIT_STORE=postgres); losing them on a crash is harmless
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    key VARCHAR(64) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    allowed BOOLEAN NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL
+);
+"""
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_dsn() -> str:
+    """Build the connection string from the standard DB_* variables."""
+    return (
+        f"host={os.getenv('DB_HOST', 'recommendation_db')} "
+        f"port={os.getenv('DB_PORT', '5432')} "
+        f"dbname={os.getenv('DB_NAME', 'recommendation_service')} "
+        f"user={os.getenv('DB_USER', 'postgres')} "
+        f"password={os.getenv('DB_PASSWORD', 'postgres')} "
+        f"connect_timeout={os.getenv('DB_CONNECT_TIMEOUT', '3')}"
+    )
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """Lazily create the process-wide connection pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(DB_MIN_CONNECTIONS, DB_MAX_CONNECTIONS, get_dsn())
+    return _pool
+
+
+@contextmanager
+def get_connection():
+    """
+    Borrow a pooled connection; commits on success and rolls back on error.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def ensure_schema():
+    """Create the service tables if they do not exist yet."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SCHEMA)
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+DatabaseError = psycopg2.Error
+# The server or the pool cannot be reached (as opposed to a failing statement)
+DatabaseUnavailable = (psycopg2.OperationalError, psycopg2.InterfaceError, psycopg2.pool.PoolError)
@@ -0,0 +1,154 @@
+"""
+Append-only columnar event segments for training and evaluation scans.
+
+Next to the ``interactions`` table, every event is appended to one ``.npy``
+file per column under a directory per UTC day:
+
+    segments/2026-10-19/user_idx.npy   int32  user id
+    segments/2026-10-19/item_idx.npy   int32  lesson id
+    segments/2026-10-19/type.npy       uint8  feature_store.interaction_type_code
+    segments/2026-10-19/ts.npy         int64  epoch seconds
+
+Events are buffered in memory and appended in blocks; after each block the
+fixed-size ``.npy`` header is rewritten with the new length, so a file is a
+valid array at any moment and readers can ``np.load(mmap_mode='r')`` it while
+it grows. The header length is the committed length: readers trim the columns
+of a segment to their common length and writers append at that point, so a
+crash mid-block never misaligns the columns.
+"""
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+SEGMENT_DIR = os.getenv('REC_SEGMENT_DIR', os.path.join('state', 'segments'))
+SEGMENT_FLUSH_EVENTS = int(os.getenv('REC_SEGMENT_FLUSH_EVENTS', '4096'))
+SEGMENT_FLUSH_SECONDS = int(os.getenv('REC_SEGMENT_FLUSH_SECONDS', '5'))
+
+COLUMNS: Tuple[Tuple[str, np.dtype], ...] = (
+    ('user_idx', np.dtype('<i4')),
+    ('item_idx', np.dtype('<i4')),
+    ('type', np.dtype('u1')),
+    ('ts', np.dtype('<i8')),
+)
+
+# Large enough for any shape, so the header can be rewritten in place
+_HEADER_SIZE = 128
+
+
+def _npy_header(dtype: np.dtype, length: int) -> bytes:
+    header = repr({'descr': dtype.str, 'fortran_order': False, 'shape': (length,)})
+    prefix = np.lib.format.magic(1, 0) + (_HEADER_SIZE - 10).to_bytes(2, 'little')
+    return prefix + header.ljust(_HEADER_SIZE - 10 - 1).encode('latin-1') + b'\n'
+
+
+def segment_day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class SegmentWriter:
+    """
+    Buffers events and appends them to the current day's column files.
+    """
+
+    def __init__(self, directory: str = SEGMENT_DIR, flush_events: int = SEGMENT_FLUSH_EVENTS):
+        self.directory = directory
+        self.flush_events = flush_events
+        self._buffer: List[Tuple[int, int, int, int]] = []
+        self._day: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def append(self, user_id: int, lesson_id: int, type_code: int, timestamp: float):
+        timestamp = int(timestamp)
+        day = timestamp // 86400
+        with self._lock:
+            if day != self._day:
+                self._flush_locked()
+                self._day = day
+            self._buffer.append((user_id, lesson_id, type_code, timestamp))
+            if len(self._buffer) >= self.flush_events:
+                self._flush_locked()
+
+    def append_many(self, user_ids: np.ndarray, lesson_ids: np.ndarray,
+                    type_codes: np.ndarray, timestamps: np.ndarray):
+        """Append a batch of events (e.g. a backfill) straight to the column files."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        columns = (user_ids, lesson_ids, type_codes, timestamps)
+        days = timestamps // 86400
+        with self._lock:
+            self._flush_locked()
+            for day in np.unique(days).tolist():
+                selected = days == day
+                self._write(day, [np.asarray(values)[selected] for values in columns])
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        rows = np.array(self._buffer, dtype=np.int64)
+        self._buffer = []
+        self._write(self._day, rows.T)
+
+    def _write(self, day: int, columns):
+        path = os.path.join(self.directory, segment_day(day * 86400))
+        os.makedirs(path, exist_ok=True)
+        paths = [os.path.join(path, f'{name}.npy') for name, _ in COLUMNS]
+        # Rows past the shortest committed column are from an interrupted block
+        base = min(_committed_length(column_path) for column_path in paths)
+        for column_path, (_, dtype), values in zip(paths, COLUMNS, columns):
+            _write_column(column_path, np.asarray(values).astype(dtype), base)
+
+
+def _committed_length(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb') as f:
+        np.lib.format.read_magic(f)
+        shape, _, _ = np.lib.format.read_array_header_1_0(f)
+    return shape[0]
+
+
+def _write_column(path: str, values: np.ndarray, offset: int):
+    """Write ``values`` from row ``offset`` on, then publish the new length in the header."""
+    with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+        f.seek(_HEADER_SIZE + offset * values.dtype.itemsize)
+        f.write(values.tobytes())
+        f.truncate()
+        f.flush()
+        f.seek(0)
+        f.write(_npy_header(values.dtype, offset + len(values)))
+
+
+def list_segments(directory: str = SEGMENT_DIR, start: Optional[str] = None,
+                  end: Optional[str] = None) -> List[str]:
+    """Days (YYYY-MM-DD) with a segment, oldest first, optionally within [start, end]."""
+    if not os.path.isdir(directory):
+        return []
+    days = sorted(
+        name for name in os.listdir(directory)
+        if os.path.exists(os.path.join(directory, name, f'{COLUMNS[0][0]}.npy'))
+    )
+    return [day for day in days if (start is None or day >= start) and (end is None or day <= end)]
+
+
+def open_segment(day: str, directory: str = SEGMENT_DIR) -> Dict[str, np.ndarray]:
+    """Read-only memory maps of one day's columns, trimmed to a common length."""
+    columns = {
+        name: np.load(os.path.join(directory, day, f'{name}.npy'), mmap_mode='r')
+        for name, _ in COLUMNS
+    }
+    length = min(len(column) for column in columns.values())
+    return {name: column[:length] for name, column in columns.items()}
+
+
+def iter_segments(directory: str = SEGMENT_DIR, start: Optional[str] = None,
+                  end: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+    """(day, columns) for every segment in range; nothing is copied into memory."""
+    for day in list_segments(directory, start, end):
+        yield day, open_segment(day, directory)
@@ -0,0 +1,182 @@
+"""
+Incremental per-user features shared by every ranker.
+
+Each user owns one fixed-width float32 row (plus a uint32 last-activity
+timestamp) in matrices indexed by a user slot map, updated in O(1) per
+interaction. Rankers read the derived vector with ``FeatureStore.vector``
+instead of re-aggregating raw history.
+
+Raw row layout:
+    interaction type counts | tag counts (hashed buckets) | score sum, score count | hour-of-day counts
+"""
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from session_store import _resize_rows
+
+
+INTERACTION_TYPES = (
+    'view', 'like', 'note', 'answer', 'download', 'share', 'bookmark', 'complete', 'other'
+)
+# Tags are hashed into a fixed number of buckets so rows stay fixed-width
+TAG_BUCKETS = 32
+# Hour-of-day features use the platform's local time (Brasília by default)
+ACTIVITY_UTC_OFFSET_HOURS = int(os.getenv('REC_ACTIVITY_UTC_OFFSET_HOURS', '-3'))
+
+_TYPE_OFFSET = 0
+_TAG_OFFSET = _TYPE_OFFSET + len(INTERACTION_TYPES)
+_SCORE_SUM = _TAG_OFFSET + TAG_BUCKETS
+_SCORE_COUNT = _SCORE_SUM + 1
+_HOUR_OFFSET = _SCORE_COUNT + 1
+RAW_WIDTH = _HOUR_OFFSET + 24
+
+FEATURE_NAMES: List[str] = (
+    [f'count_{name}' for name in INTERACTION_TYPES]
+    + [f'tag_affinity_{bucket}' for bucket in range(TAG_BUCKETS)]
+    + ['average_score', 'scored_interactions']
+    + [f'hour_share_{hour}' for hour in range(24)]
+    + ['days_since_last_activity']
+)
+
+# Columns of FEATURE_NAMES holding the share of the user's interactions per tag bucket
+TAG_AFFINITY = slice(_TAG_OFFSET, _SCORE_SUM)
+
+_TYPE_CODES = {name: code for code, name in enumerate(INTERACTION_TYPES)}
+_INITIAL_CAPACITY = 1024
+
+
+def interaction_type_code(interaction_type: str) -> int:
+    return _TYPE_CODES.get(interaction_type, _TYPE_CODES['other'])
+
+
+def tag_mask(tags: Iterable[str]) -> int:
+    """Bit mask of the hash buckets of ``tags`` (fits in a uint32)."""
+    mask = 0
+    for tag in tags:
+        mask |= 1 << (zlib.crc32(str(tag).strip().lower().encode('utf-8')) % TAG_BUCKETS)
+    return mask
+
+
+class FeatureStore:
+    """
+    Fixed-width per-user feature rows stored in compact arrays.
+    """
+
+    def __init__(self, initial_capacity: int = _INITIAL_CAPACITY):
+        self._slots: Dict[int, int] = {}
+        self._rows = np.zeros((initial_capacity, RAW_WIDTH), dtype=np.float32)
+        self._last_seen = np.zeros(initial_capacity, dtype=np.uint32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _slot_for(self, user_id: int) -> int:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = len(self._slots)
+            if slot >= self._rows.shape[0]:
+                capacity = self._rows.shape[0] * 2
+                self._rows = _resize_rows(self._rows, capacity)
+                self._last_seen = _resize_rows(self._last_seen, capacity)
+            self._slots[user_id] = slot
+        return slot
+
+    def update(self, user_id: int, type_code: int, timestamp: float,
+               score: Optional[float] = None, tags: int = 0):
+        """
+        Fold one interaction into the user's row. ``tags`` is a ``tag_mask``.
+        """
+        hour = int((timestamp + ACTIVITY_UTC_OFFSET_HOURS * 3600) // 3600) % 24
+        with self._lock:
+            slot = self._slot_for(user_id)
+            row = self._rows[slot]
+            row[_TYPE_OFFSET + type_code] += 1
+            row[_HOUR_OFFSET + hour] += 1
+            if score is not None and score == score:  # NaN marks a missing score
+                row[_SCORE_SUM] += score
+                row[_SCORE_COUNT] += 1
+            bucket = 0
+            while tags:
+                if tags & 1:
+                    row[_TAG_OFFSET + bucket] += 1
+                tags >>= 1
+                bucket += 1
+            self._last_seen[slot] = max(int(self._last_seen[slot]), int(timestamp))
+
+    def vector(self, user_id: int, now: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Derived features of a user, laid out as ``FEATURE_NAMES``, or None for
+        unknown users.
+        """
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                return None
+            row = self._rows[slot].copy()
+            last_seen = float(self._last_seen[slot])
+        return _derive(row[np.newaxis], np.array([last_seen]), now)[0]
+
+    def matrix(self, user_ids: Iterable[int], now: Optional[float] = None) -> np.ndarray:
+        """Derived features of several users at once (zero rows for unknown users)."""
+        user_ids = list(user_ids)
+        rows = np.zeros((len(user_ids), RAW_WIDTH), dtype=np.float32)
+        last_seen = np.zeros(len(user_ids))
+        with self._lock:
+            slots = [self._slots.get(user_id, -1) for user_id in user_ids]
+            known = np.array([slot >= 0 for slot in slots], dtype=bool)
+            if known.any():
+                taken = np.array(slots)[known]
+                rows[known] = self._rows[taken]
+                last_seen[known] = self._last_seen[taken]
+        features = _derive(rows, last_seen, now)
+        features[~known] = 0.0
+        return features
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            count = len(self._slots)
+            slots = np.fromiter(self._slots.values(), dtype=np.int64, count=count)
+            return {
+                'user_ids': np.fromiter(self._slots.keys(), dtype=np.int64, count=count),
+                'rows': self._rows[slots],
+                'last_seen': self._last_seen[slots],
+            }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'FeatureStore':
+        count = len(arrays['user_ids'])
+        store = cls(initial_capacity=max(count, _INITIAL_CAPACITY))
+        store._slots = dict(zip(arrays['user_ids'].tolist(), range(count)))
+        store._rows[:count] = arrays['rows']
+        store._last_seen[:count] = arrays['last_seen']
+        return store
+
+    def memory_bytes(self) -> int:
+        return (self._rows.itemsize * RAW_WIDTH + self._last_seen.itemsize) * len(self._slots)
+
+
+def _derive(rows: np.ndarray, last_seen: np.ndarray, now: Optional[float]) -> np.ndarray:
+    now = time.time() if now is None else now
+    out = np.zeros((len(rows), len(FEATURE_NAMES)), dtype=np.float32)
+    out[:, :_TAG_OFFSET] = rows[:, _TYPE_OFFSET:_TAG_OFFSET]
+
+    tags = rows[:, _TAG_OFFSET:_SCORE_SUM]
+    tag_total = tags.sum(axis=1, keepdims=True)
+    np.divide(tags, tag_total, out=out[:, _TAG_OFFSET:_SCORE_SUM], where=tag_total > 0)
+
+    score_count = rows[:, _SCORE_COUNT]
+    np.divide(rows[:, _SCORE_SUM], score_count, out=out[:, _SCORE_SUM], where=score_count > 0)
+    out[:, _SCORE_COUNT] = score_count
+
+    hours = rows[:, _HOUR_OFFSET:]
+    hour_total = hours.sum(axis=1, keepdims=True)
+    np.divide(hours, hour_total, out=out[:, _HOUR_OFFSET:RAW_WIDTH], where=hour_total > 0)
+
+    out[:, RAW_WIDTH] = np.maximum(now - last_seen, 0.0) / 86400
+    return out
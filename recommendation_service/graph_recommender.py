@@ -0,0 +1,223 @@
+"""
+Personalized PageRank over the user-course bipartite graph.
+
+The graph is built from enrollments and course-level interactions and kept as
+two CSR adjacency structures (user -> courses and course -> users) whose edge
+values are the transition probabilities of a random walk. Scores are obtained
+by power iteration with restart to the target user, using vectorized gathers
+and segment sums; while the walk is still concentrated on a few nodes only the
+edges of those nodes are touched.
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from database import get_connection
+
+
+PPR_RESTART = float(os.getenv('REC_PPR_RESTART', '0.3'))
+PPR_MAX_ITERATIONS = int(os.getenv('REC_PPR_MAX_ITERATIONS', '30'))
+PPR_TOLERANCE = float(os.getenv('REC_PPR_TOLERANCE', '1e-4'))
+# Stop once the top-k ranking has not changed for this many iterations
+PPR_TOPK_PATIENCE = int(os.getenv('REC_PPR_TOPK_PATIENCE', '1'))
+# Enrollments always count; interactions only inside this window
+GRAPH_WINDOW_DAYS = int(os.getenv('REC_GRAPH_WINDOW_DAYS', '90'))
+GRAPH_REFRESH_SECONDS = int(os.getenv('REC_GRAPH_REFRESH_SECONDS', '600'))
+
+# Below this share of active nodes a half-step pushes from the active rows only
+_SPARSE_FRONTIER_RATIO = 0.05
+
+
+class CSRAdjacency:
+    """
+    Row-compressed adjacency of one side of the bipartite graph.
+
+    Rows are the nodes of this side and ``indices`` the nodes of the other
+    side. Every edge stores two transition probabilities: ``data_out`` for
+    leaving the row node (row-normalized) and ``data_in`` for arriving at it
+    from the column node (normalized over the column's degree).
+    """
+
+    def __init__(self, rows: np.ndarray, cols: np.ndarray, weights: np.ndarray,
+                 row_totals: np.ndarray, col_totals: np.ndarray):
+        order = np.lexsort((cols, rows))
+        rows, cols, weights = rows[order], cols[order], weights[order]
+        n_rows = len(row_totals)
+        self.indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=self.indptr[1:])
+        self.indices = cols.astype(np.int32)
+        self.data_out = (weights / row_totals[rows]).astype(np.float32)
+        self.data_in = (weights / col_totals[cols]).astype(np.float32)
+        self.n_rows = n_rows
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def row(self, index: int) -> np.ndarray:
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def edges_of(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Edge positions of the given rows (concatenated) and each row's
+        edge count, without a Python loop.
+        """
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        edges = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return edges, lengths
+
+    def push(self, vector: np.ndarray, active: np.ndarray, n_cols: int) -> np.ndarray:
+        """
+        Spread the mass of the few ``active`` rows to their neighbours.
+        """
+        edges, lengths = self.edges_of(active)
+        if not len(edges):
+            return np.zeros(n_cols, dtype=np.float32)
+        mass = self.data_out[edges] * np.repeat(vector[active], lengths)
+        return np.bincount(self.indices[edges], weights=mass, minlength=n_cols).astype(np.float32)
+
+    def pull(self, vector: np.ndarray) -> np.ndarray:
+        """
+        Mass arriving at every row from a dense vector over the columns:
+        one gather plus a segment sum per row.
+        """
+        # Every node has at least one edge, so no segment is empty
+        return np.add.reduceat(np.take(vector, self.indices) * self.data_in, self.indptr[:-1])
+
+
+class BipartiteGraph:
+    """
+    User-course interaction graph with id <-> index mappings.
+    """
+
+    def __init__(self, user_ids: np.ndarray, course_ids: np.ndarray,
+                 weights: Optional[np.ndarray] = None):
+        if weights is None:
+            weights = np.ones(len(user_ids), dtype=np.float64)
+        self.user_ids, user_index = np.unique(user_ids, return_inverse=True)
+        self.course_ids, course_index = np.unique(course_ids, return_inverse=True)
+        weights = np.asarray(weights, dtype=np.float64)
+        user_totals = np.bincount(user_index, weights=weights, minlength=len(self.user_ids))
+        course_totals = np.bincount(course_index, weights=weights, minlength=len(self.course_ids))
+        self.user_courses = CSRAdjacency(user_index, course_index, weights, user_totals, course_totals)
+        self.course_users = CSRAdjacency(course_index, user_index, weights, course_totals, user_totals)
+        self.built_at = time.time()
+
+    @property
+    def n_edges(self) -> int:
+        return self.user_courses.nnz
+
+    def user_index(self, user_id: int) -> Optional[int]:
+        index = int(np.searchsorted(self.user_ids, user_id))
+        if index < len(self.user_ids) and self.user_ids[index] == user_id:
+            return index
+        return None
+
+    def _users_to_courses(self, users: np.ndarray) -> np.ndarray:
+        active = np.flatnonzero(users)
+        if len(active) < _SPARSE_FRONTIER_RATIO * len(users):
+            return self.user_courses.push(users, active, len(self.course_ids))
+        return self.course_users.pull(users)
+
+    def _courses_to_users(self, courses: np.ndarray) -> np.ndarray:
+        active = np.flatnonzero(courses)
+        if len(active) < _SPARSE_FRONTIER_RATIO * len(courses):
+            return self.course_users.push(courses, active, len(self.user_ids))
+        return self.user_courses.pull(courses)
+
+    def personalized_pagerank(self, user_id: int, restart: float = PPR_RESTART,
+                              max_iterations: int = PPR_MAX_ITERATIONS,
+                              tolerance: float = PPR_TOLERANCE,
+                              top_k: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        Course scores of a random walk that restarts at ``user_id``.
+
+        Iterates until the L1 change drops below ``tolerance`` or, when
+        ``top_k`` is given, until the top-k courses stop changing.
+
+        Returns:
+            Optional[np.ndarray]: float32 score per course index, or None when
+            the user is not in the graph
+        """
+        source = self.user_index(user_id)
+        if source is None:
+            return None
+
+        users = np.zeros(len(self.user_ids), dtype=np.float32)
+        users[source] = 1.0
+        courses = np.zeros(len(self.course_ids), dtype=np.float32)
+        walk = np.float32(1.0 - restart)
+        previous_top, stable = None, 0
+
+        for _ in range(max_iterations):
+            # Gauss-Seidel order: users are refreshed from the new course scores
+            next_courses = walk * self._users_to_courses(users)
+            next_users = walk * self._courses_to_users(next_courses)
+            next_users[source] += restart
+            delta = np.abs(next_courses - courses).sum() + np.abs(next_users - users).sum()
+            users, courses = next_users, next_courses
+            if delta < tolerance:
+                break
+            if top_k and len(courses) > top_k:
+                top = np.sort(np.argpartition(courses, -top_k)[-top_k:])
+                stable = stable + 1 if previous_top is not None and np.array_equal(top, previous_top) else 0
+                if stable >= PPR_TOPK_PATIENCE:
+                    break
+                previous_top = top
+        return courses
+
+    def recommend(self, user_id: int, limit: int = 10,
+                  exclude_known: bool = True) -> List[Tuple[int, float]]:
+        """
+        Top courses for a user by personalized PageRank, excluding the
+        courses the user is already connected to.
+        """
+        index = self.user_index(user_id)
+        if index is None:
+            return []
+        known = self.user_courses.row(index) if exclude_known else np.zeros(0, dtype=np.int32)
+        scores = self.personalized_pagerank(user_id, top_k=limit + len(known))
+        scores[known] = 0.0
+
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            return []
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(scores[candidates], -limit)[-limit:]]
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+        return [(int(self.course_ids[i]), float(scores[i])) for i in candidates]
+
+
+def load_graph(days: int = GRAPH_WINDOW_DAYS) -> Optional[BipartiteGraph]:
+    """
+    Build the graph from recommendation_db: every enrollment is an edge and
+    course-level interactions of the last ``days`` add weight to it.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT user_id, course_id, SUM(weight) FROM ("
+                "  SELECT user_id, course_id, 1.0 AS weight FROM enrollments"
+                "  UNION ALL"
+                "  SELECT user_id, course_id, 0.25 FROM interactions"
+                "  WHERE course_id IS NOT NULL AND created_at >= %s"
+                ") edges GROUP BY user_id, course_id",
+                (since,)
+            )
+            rows = cursor.fetchall()
+
+    if not rows:
+        return None
+    edges = np.array(rows, dtype=np.float64)
+    # Diminishing returns for repeated interactions with the same course
+    return BipartiteGraph(
+        edges[:, 0].astype(np.int64),
+        edges[:, 1].astype(np.int64),
+        np.log1p(edges[:, 2]),
+    )
@@ -0,0 +1,164 @@
+"""
+Impressions: which items the recommendation routes showed to each user.
+
+Every user has a ring buffer with the keys of the last N items shown, stored
+as one int32 row of a shared matrix indexed by a user slot map (~1 KB per user
+with the default N=255). Recording a response is a couple of slice writes;
+an interaction with an item clears its impressions, so what remains in the
+buffer is "shown since the last click" and repeatedly ignored items can be
+demoted at ranking time.
+
+Lessons and courses share the buffer: a lesson is stored as ``+lesson_id``
+and a course as ``-course_id``; 0 marks an empty (or cleared) position.
+"""
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from session_store import _resize_rows
+
+
+IMPRESSION_BUFFER_SIZE = int(os.getenv('REC_IMPRESSION_BUFFER_SIZE', '255'))
+# Shows without a click that are free; every further one multiplies the score
+IMPRESSION_FREE_SHOWS = int(os.getenv('REC_IMPRESSION_FREE_SHOWS', '3'))
+IMPRESSION_DEMOTION = float(os.getenv('REC_IMPRESSION_DEMOTION', '0.5'))
+
+_INITIAL_CAPACITY = 1024
+
+
+def lesson_key(lesson_id: int) -> int:
+    return lesson_id
+
+
+def course_key(course_id: int) -> int:
+    return -course_id
+
+
+def item_key(item: Dict[str, Any]) -> int:
+    """Key of a recommendation item (lesson items win over their course id)."""
+    if item.get('lesson_id') is not None:
+        return lesson_key(int(item['lesson_id']))
+    if item.get('course_id') is not None:
+        return course_key(int(item['course_id']))
+    return 0
+
+
+class ImpressionStore:
+    """
+    Per-user ring buffers of shown item keys.
+    """
+
+    def __init__(self, buffer_size: int = IMPRESSION_BUFFER_SIZE,
+                 initial_capacity: int = _INITIAL_CAPACITY):
+        if not 0 < buffer_size <= 256:
+            raise ValueError("buffer_size must be between 1 and 256")
+        self.buffer_size = buffer_size
+        self._slots: Dict[int, int] = {}
+        self._items = np.zeros((initial_capacity, buffer_size), dtype=np.int32)
+        self._head = np.zeros(initial_capacity, dtype=np.uint8)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _slot_for(self, user_id: int) -> int:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = len(self._slots)
+            if slot >= self._items.shape[0]:
+                capacity = self._items.shape[0] * 2
+                self._items = _resize_rows(self._items, capacity)
+                self._head = _resize_rows(self._head, capacity)
+            self._slots[user_id] = slot
+        return slot
+
+    def record(self, user_id: int, keys: Iterable[int]):
+        """Append the keys of the items of one response, oldest overwritten first."""
+        keys = np.asarray(keys, dtype=np.int32)
+        if not len(keys):
+            return
+        size = self.buffer_size
+        if len(keys) > size:
+            keys = keys[-size:]
+        with self._lock:
+            slot = self._slot_for(user_id)
+            row = self._items[slot]
+            head = int(self._head[slot])
+            end = head + len(keys)
+            if end <= size:
+                row[head:end] = keys
+            else:
+                split = size - head
+                row[head:] = keys[:split]
+                row[:end - size] = keys[split:]
+            self._head[slot] = end % size
+
+    def click(self, user_id: int, *keys: int):
+        """The user interacted with these items: forget their impressions."""
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                return
+            row = self._items[slot]
+            for key in keys:
+                row[row == key] = 0
+
+    def shown_counts(self, user_id: int, keys: np.ndarray) -> np.ndarray:
+        """How many times each key was shown since it was last clicked."""
+        keys = np.asarray(keys, dtype=np.int32)
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                return np.zeros(len(keys), dtype=np.int64)
+            row = self._items[slot].copy()
+        shown, counts = np.unique(row[row != 0], return_counts=True)
+        if not len(shown):
+            return np.zeros(len(keys), dtype=np.int64)
+        index = np.minimum(np.searchsorted(shown, keys), len(shown) - 1)
+        return np.where(shown[index] == keys, counts[index], 0)
+
+    def demote(self, user_id: int, recommendations: List[Dict[str, Any]],
+               free_shows: int = IMPRESSION_FREE_SHOWS,
+               factor: float = IMPRESSION_DEMOTION) -> List[Dict[str, Any]]:
+        """
+        Scale down the score of items shown more than ``free_shows`` times
+        without a click and re-sort; other items keep their order.
+        """
+        if not recommendations or user_id not in self._slots:
+            return recommendations
+        counts = self.shown_counts(user_id, [item_key(item) for item in recommendations])
+        penalties = np.power(factor, np.maximum(counts - free_shows, 0))
+        if (penalties == 1.0).all():
+            return recommendations
+
+        demoted = []
+        for item, penalty in zip(recommendations, penalties.tolist()):
+            if penalty < 1.0:
+                item = dict(item, score=round(item.get('score', 0.0) * penalty, 6), demoted=True)
+            demoted.append(item)
+        return sorted(demoted, key=lambda item: item.get('score', 0.0), reverse=True)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            count = len(self._slots)
+            slots = np.fromiter(self._slots.values(), dtype=np.int64, count=count)
+            return {
+                'user_ids': np.fromiter(self._slots.keys(), dtype=np.int64, count=count),
+                'items': self._items[slots],
+                'head': self._head[slots],
+            }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'ImpressionStore':
+        count, buffer_size = arrays['items'].shape
+        store = cls(buffer_size=buffer_size, initial_capacity=max(count, _INITIAL_CAPACITY))
+        store._slots = dict(zip(arrays['user_ids'].tolist(), range(count)))
+        store._items[:count] = arrays['items']
+        store._head[:count] = arrays['head']
+        return store
+
+    def memory_bytes(self) -> int:
+        """Bytes used by the buffers of the users currently tracked."""
+        return (self._items.itemsize * self.buffer_size + self._head.itemsize) * len(self._slots)
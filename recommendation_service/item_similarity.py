@@ -0,0 +1,99 @@
+"""
+Online item-item similarity learned from co-occurrence inside study sessions.
+"""
+import math
+import threading
+from itertools import chain
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+class CooccurrenceIndex:
+    """
+    Counts how often two lessons are studied in the same session and exposes a
+    cosine-normalized similarity between them.
+    """
+
+    def __init__(self):
+        self._pair_counts: Dict[int, Dict[int, float]] = {}
+        self._item_counts: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._item_counts)
+
+    def item_ids(self) -> List[int]:
+        """Ids of every lesson seen so far."""
+        with self._lock:
+            return list(self._item_counts)
+
+    def add(self, lesson_id: int, session_lessons: Iterable[int], weights: Iterable[float]):
+        """
+        Register an interaction with ``lesson_id`` given the lessons already in
+        the user's session and their recency weights.
+        """
+        with self._lock:
+            self._item_counts[lesson_id] = self._item_counts.get(lesson_id, 0.0) + 1.0
+            row = self._pair_counts.setdefault(lesson_id, {})
+            for other, weight in zip(session_lessons, weights):
+                other = int(other)
+                if other == lesson_id:
+                    continue
+                row[other] = row.get(other, 0.0) + weight
+                other_row = self._pair_counts.setdefault(other, {})
+                other_row[lesson_id] = other_row.get(lesson_id, 0.0) + weight
+
+    def similarity(self, a: int, b: int) -> float:
+        count = self._pair_counts.get(a, {}).get(b, 0.0)
+        if not count:
+            return 0.0
+        return count / math.sqrt(self._item_counts.get(a, 1.0) * self._item_counts.get(b, 1.0))
+
+    def neighbours(self, lesson_id: int) -> Dict[int, float]:
+        """Similarity of ``lesson_id`` to every lesson it co-occurred with."""
+        row = self._pair_counts.get(lesson_id)
+        if not row:
+            return {}
+        base = self._item_counts.get(lesson_id, 1.0)
+        return {
+            other: count / math.sqrt(base * self._item_counts.get(other, 1.0))
+            for other, count in list(row.items())
+        }
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Copy of the counters as flat arrays: per-item counts plus one
+        (row, col, count) triple per stored pair (see ``from_arrays``).
+        """
+        with self._lock:
+            items = len(self._item_counts)
+            rows = list(self._pair_counts.items())
+            lengths = np.fromiter((len(row) for _, row in rows), dtype=np.int64, count=len(rows))
+            pairs = int(lengths.sum())
+            return {
+                'item_ids': np.fromiter(self._item_counts.keys(), dtype=np.int64, count=items),
+                'item_counts': np.fromiter(self._item_counts.values(), dtype=np.float64, count=items),
+                'pair_rows': np.repeat(np.fromiter((a for a, _ in rows), dtype=np.int64, count=len(rows)), lengths),
+                'pair_cols': np.fromiter(chain.from_iterable(row.keys() for _, row in rows),
+                                         dtype=np.int64, count=pairs),
+                'pair_counts': np.fromiter(chain.from_iterable(row.values() for _, row in rows),
+                                           dtype=np.float64, count=pairs),
+            }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'CooccurrenceIndex':
+        """Rebuild an index from the output of ``to_arrays``."""
+        index = cls()
+        index._item_counts = dict(zip(arrays['item_ids'].tolist(), arrays['item_counts'].tolist()))
+        rows = arrays['pair_rows']
+        if len(rows):
+            # to_arrays emits each row's pairs contiguously
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            bounds = np.r_[starts, len(rows)].tolist()
+            cols, counts = arrays['pair_cols'].tolist(), arrays['pair_counts'].tolist()
+            index._pair_counts = {
+                int(rows[start]): dict(zip(cols[start:end], counts[start:end]))
+                for start, end in zip(bounds[:-1], bounds[1:])
+            }
+        return index
@@ -0,0 +1,161 @@
+"""
+Non-blocking JWKS cache for Bearer-token verification.
+
+Keys are fetched with one shared ``httpx.AsyncClient`` (pooled keep-alive
+connections) and kept parsed, indexed by kid. A keyset younger than
+``REC_JWKS_TTL_SECONDS`` is served as is; an older one is still served for up
+to ``REC_JWKS_STALE_SECONDS`` more while a single background task revalidates
+it (stale-while-revalidate); past that, requests await the refresh. Concurrent
+requests share one in-flight fetch, an unknown kid triggers at most one
+refetch per ``REC_JWKS_MISS_REFETCH_SECONDS``, and a failed fetch keeps the
+last good keyset. Refetches send the last ``ETag`` (If-None-Match), so an
+unchanged keyset costs a bodiless 304.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import jwk
+
+from logging_config import get_logger
+
+
+JWKS_URL = os.getenv('AUTH_SERVICE_JWKS_URL', 'http://api-gateway/auth/.well-known/jwks.json')
+JWKS_TTL_SECONDS = float(os.getenv('REC_JWKS_TTL_SECONDS', '300'))
+JWKS_STALE_SECONDS = float(os.getenv('REC_JWKS_STALE_SECONDS', '3600'))
+JWKS_MISS_REFETCH_SECONDS = float(os.getenv('REC_JWKS_MISS_REFETCH_SECONDS', '30'))
+JWKS_TIMEOUT_SECONDS = float(os.getenv('REC_JWKS_TIMEOUT_SECONDS', '5'))
+# Token algorithms accepted; each kid's key only verifies its own key type
+SUPPORTED_ALGORITHMS = ['RS256', 'ES256']
+
+logger = get_logger('recommendation_service.jwks_cache')
+
+
+class JWKSUnavailable(Exception):
+    """No keyset could be fetched yet."""
+    pass
+
+
+class JWKSCache:
+    """
+    Parsed signing keys by kid with TTL, stale-while-revalidate and
+    single-flight refetches.
+    """
+
+    def __init__(self, url: str = JWKS_URL, ttl: float = JWKS_TTL_SECONDS,
+                 stale: float = JWKS_STALE_SECONDS,
+                 miss_refetch_interval: float = JWKS_MISS_REFETCH_SECONDS,
+                 timeout: float = JWKS_TIMEOUT_SECONDS):
+        self.url = url
+        self.ttl = ttl
+        self.stale = stale
+        self.miss_refetch_interval = miss_refetch_interval
+        self.timeout = timeout
+        self.fetched_at = 0.0
+        self.fetches = 0
+        self.failures = 0
+        self.not_modified = 0
+        self._etag: Optional[str] = None
+        self._keys: Dict[str, Any] = {}
+        self._loaded = False
+        self._last_miss_fetch = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def get_key(self, kid: str):
+        """
+        Parsed key for ``kid``.
+
+        Raises:
+            KeyError: the kid is not in the keyset, even after a refetch
+            JWKSUnavailable: no keyset has been fetched yet
+        """
+        age = time.monotonic() - self.fetched_at
+        if not self._loaded or age > self.ttl + self.stale:
+            await self._refresh()
+        elif age > self.ttl:
+            self._start_refresh()
+
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._last_miss_fetch >= self.miss_refetch_interval:
+            # Unknown kid: the signing key may have been rotated
+            self._last_miss_fetch = time.monotonic()
+            await self._refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise KeyError(kid)
+        return key
+
+    def _start_refresh(self) -> asyncio.Task:
+        """The in-flight fetch, or a new one; every caller shares it."""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.get_running_loop().create_task(self._fetch())
+        return self._inflight
+
+    async def _refresh(self):
+        # shield: a cancelled request must not cancel the fetch others wait on
+        await asyncio.shield(self._start_refresh())
+        if not self._loaded:
+            raise JWKSUnavailable(f"Unable to fetch JWKS from {self.url}")
+
+    async def _fetch(self):
+        self.fetches += 1
+        # Revalidate with the ETag: an unchanged keyset is a bodiless 304
+        headers = {'If-None-Match': self._etag} if self._etag and self._loaded else {}
+        try:
+            response = await self._http().get(self.url, headers=headers)
+            if response.status_code == 304:
+                self.not_modified += 1
+                self.fetched_at = self._last_miss_fetch = time.monotonic()
+                return
+            response.raise_for_status()
+            keys = {}
+            for key_data in response.json().get('keys', []):
+                kid = key_data.get('kid')
+                alg = key_data.get('alg', 'RS256')
+                if not kid or alg not in SUPPORTED_ALGORITHMS:
+                    continue
+                try:
+                    keys[kid] = jwk.construct(key_data, alg)
+                except Exception as e:
+                    logger.error(f"Ignoring unusable JWK {kid}: {e}")
+        except (httpx.HTTPError, ValueError) as e:
+            self.failures += 1
+            logger.error(f"Failed to fetch JWKS from {self.url}"
+                         f"{', serving last good keyset' if self._loaded else ''}: {e}")
+            if self._loaded:
+                # Retry after the next TTL rather than on every request
+                self.fetched_at = time.monotonic()
+            return
+
+        if keys or not self._loaded:
+            self._keys = keys
+            self._loaded = True
+            self._etag = response.headers.get('ETag')
+        else:
+            logger.error(f"JWKS from {self.url} has no usable keys, serving last good keyset")
+        self.fetched_at = self._last_miss_fetch = time.monotonic()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'keys': len(self._keys),
+            'age_seconds': round(time.monotonic() - self.fetched_at, 1) if self._loaded else None,
+            'fetches': self.fetches,
+            'not_modified': self.not_modified,
+            'failures': self.failures,
+        }
+
+
+jwks_cache = JWKSCache()
@@ -0,0 +1,184 @@
+"""
+Overload protection for the recommendation routes.
+
+``LoadShedder`` tracks in-flight requests and event-loop lag and classifies
+the current load as normal, degraded or shed. Under degraded load handlers
+answer from cheaper tiers instead of computing (the user's cached result,
+then trending items, then a static list); under shed load requests are
+rejected right away with 503 + Retry-After so they fail fast instead of
+queueing past the gateway timeout.
+"""
+import asyncio
+import heapq
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+MAX_IN_FLIGHT = int(os.getenv('REC_MAX_IN_FLIGHT', '64'))
+DEGRADE_IN_FLIGHT = int(os.getenv('REC_DEGRADE_IN_FLIGHT', '32'))
+SHED_LOOP_LAG_MS = float(os.getenv('REC_SHED_LOOP_LAG_MS', '500'))
+DEGRADE_LOOP_LAG_MS = float(os.getenv('REC_DEGRADE_LOOP_LAG_MS', '100'))
+RETRY_AFTER_SECONDS = int(os.getenv('REC_RETRY_AFTER_SECONDS', '2'))
+RESULT_CACHE_SIZE = int(os.getenv('REC_RESULT_CACHE_SIZE', '100000'))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv('REC_RESULT_CACHE_TTL_SECONDS', '3600'))
+TRENDING_HALF_LIFE_SECONDS = float(os.getenv('REC_TRENDING_HALF_LIFE_SECONDS', '3600'))
+
+_LAG_SAMPLE_SECONDS = 0.05
+# Top lists are recomputed at most this often so the trending tier stays O(k)
+_TRENDING_TOP_TTL_SECONDS = 5.0
+_TRENDING_TOP_SIZE = 50
+# Events stamped further ahead count as happening at now + this; one far
+# future event would otherwise rebase the origin and flush every count
+_TRENDING_MAX_SKEW_SECONDS = 300.0
+
+LOAD_NORMAL = "normal"
+LOAD_DEGRADED = "degraded"
+LOAD_SHED = "shed"
+
+TIER_FULL = "full"
+TIER_CACHED = "cached"
+TIER_TRENDING = "trending"
+TIER_STATIC = "static"
+
+
+class LoadShedder:
+    """
+    In-flight counter plus an event-loop lag probe.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT,
+                 degrade_in_flight: int = DEGRADE_IN_FLIGHT,
+                 shed_lag_ms: float = SHED_LOOP_LAG_MS,
+                 degrade_lag_ms: float = DEGRADE_LOOP_LAG_MS):
+        self.max_in_flight = max_in_flight
+        self.degrade_in_flight = degrade_in_flight
+        self.shed_lag = shed_lag_ms / 1000
+        self.degrade_lag = degrade_lag_ms / 1000
+        self.in_flight = 0
+        self.loop_lag = 0.0
+        self.shed_total = 0
+        self.degraded_total = 0
+
+    async def monitor_loop_lag(self, interval: float = _LAG_SAMPLE_SECONDS):
+        """
+        Measure how late a short sleep wakes up. Spikes are taken at once and
+        decay by half per sample, so a single slow tick does not flap the level.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - started - interval, 0.0)
+            self.loop_lag = max(lag, self.loop_lag / 2)
+
+    def level(self) -> str:
+        if self.in_flight > self.max_in_flight or self.loop_lag > self.shed_lag:
+            return LOAD_SHED
+        if self.in_flight > self.degrade_in_flight or self.loop_lag > self.degrade_lag:
+            return LOAD_DEGRADED
+        return LOAD_NORMAL
+
+    def degraded(self) -> bool:
+        """True when handlers should skip computation and serve a cheaper tier."""
+        if self.level() == LOAD_NORMAL:
+            return False
+        self.degraded_total += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'level': self.level(),
+            'in_flight': self.in_flight,
+            'loop_lag_ms': round(self.loop_lag * 1000, 1),
+            'shed_total': self.shed_total,
+            'degraded_total': self.degraded_total,
+        }
+
+
+class ResultCache:
+    """
+    Bounded LRU of the last fully computed answer per key, with a TTL.
+    """
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE,
+                 ttl_seconds: int = RESULT_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class TrendingCounter:
+    """
+    Exponentially decayed popularity counts.
+
+    Uses forward decay: an event at time t adds ``2 ** ((t - origin) / half_life)``,
+    so older counts never have to be touched; the origin is moved forward
+    (rescaling every count once) before the weights can overflow.
+    """
+
+    def __init__(self, half_life: float = TRENDING_HALF_LIFE_SECONDS):
+        self.half_life = half_life
+        self._origin = time.time()
+        self._counts: Dict[int, float] = {}
+        self._top: List[Tuple[int, float]] = []
+        self._top_at = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, item_id: int, timestamp: Optional[float] = None, weight: float = 1.0):
+        now = time.time()
+        timestamp = now if timestamp is None else min(timestamp, now + _TRENDING_MAX_SKEW_SECONDS)
+        with self._lock:
+            exponent = (timestamp - self._origin) / self.half_life
+            if exponent > 64:
+                self._rebase(timestamp)
+                exponent = 0.0
+            self._counts[item_id] = self._counts.get(item_id, 0.0) + weight * math.pow(2.0, exponent)
+
+    def _rebase(self, origin: float):
+        scale = math.pow(2.0, (self._origin - origin) / self.half_life)
+        self._counts = {
+            item_id: count * scale
+            for item_id, count in self._counts.items()
+            if count * scale > 1e-6
+        }
+        self._origin = origin
+
+    def top(self, limit: int) -> List[Tuple[int, float]]:
+        """Most popular items, best first; refreshed at most every few seconds."""
+        now = time.time()
+        with self._lock:
+            if now - self._top_at > _TRENDING_TOP_TTL_SECONDS or limit > len(self._top) < len(self._counts):
+                ranked = heapq.nlargest(max(limit, _TRENDING_TOP_SIZE), self._counts.items(),
+                                        key=lambda item: item[1])
+                # Report counts decayed to now, in events-per-half-life units
+                scale = math.pow(2.0, (self._origin - now) / self.half_life)
+                self._top = [(item_id, count * scale) for item_id, count in ranked]
+                self._top_at = now
+            return self._top[:limit]
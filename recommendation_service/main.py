@@ -1,17 +1,48 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, BackgroundTasks, status
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Union
+import asyncio
 import os
 import time
-import uuid
+from datetime import datetime
 from auth_helpers import (
     require_authentication, get_current_user, get_user_id_from_request,
     CurrentUser, CurrentUserOptional, log_auth_info
 )
 from logging_config import (
-    get_logger, log_request, log_recommendation_event, 
+    get_logger, log_recommendation_event, 
     log_interaction_event, log_algorithm_event
 )
+from event_segments import SegmentWriter, SEGMENT_FLUSH_SECONDS
+from feature_store import interaction_type_code, tag_mask
+from impression_store import course_key, item_key
+from mastery_store import MASTERY_THRESHOLD
+from online_models import (
+    OnlineModels, SESSION_REASON, HISTORY_REASON, format_recommendations
+)
+from algorithms import AlgorithmRegistry, ShadowRunner, SERVING_ALGORITHM
+from database import DatabaseError, ensure_schema, get_connection
+from jwks_cache import jwks_cache
+from token_cache import token_cache
+from graph_recommender import BipartiteGraph, GRAPH_REFRESH_SECONDS, load_graph
+from neighbour_table import (
+    NeighbourTable, NEIGHBOURS_REFRESH_SECONDS,
+    build_course_neighbours, build_lesson_neighbours, recommend_from_neighbours
+)
+from load_shedding import (
+    LoadShedder, ResultCache, TrendingCounter,
+    TIER_FULL, TIER_CACHED, TIER_TRENDING, TIER_STATIC
+)
+from middleware import CorrelationIdMiddleware, LoadSheddingMiddleware, RateLimitMiddleware
+from rate_limit import create_limiter, RATE_LIMIT_PRUNE_SECONDS
+from model_partitions import PartitionedNeighbours, current_generation, write_partitions
+from persistence import ModelPersistence, SNAPSHOT_INTERVAL_SECONDS
+from precompute import (
+    PRECOMPUTE_LIMIT, fetch_precomputed, is_fresh, precompute_user, save_recommendations
+)
+
+logger = get_logger('recommendation_service')
 
 app = FastAPI(
     title="AVA Recommendation Service",
@@ -48,40 +79,30 @@ app = FastAPI(
     ],
 )
 
-# Add correlation ID middleware
-@app.middleware("http")
-async def add_correlation_id(request: Request, call_next):
-    # Get or generate correlation ID
-    correlation_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-    
-    # Add to request state
-    request.state.correlation_id = correlation_id
-    
-    # Process request
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    
-    # Log request
-    log_request(
-        method=request.method,
-        path=str(request.url.path),
-        status_code=response.status_code,
-        response_time=process_time,
-        user_id=request.headers.get("X-User-Id"),
-        correlation_id=correlation_id
-    )
-    
-    # Add correlation ID to response headers
-    response.headers["X-Request-ID"] = correlation_id
-    
-    return response
+# Overload protection for the recommendation routes (see load_shedding.py)
+shedder = LoadShedder()
+# Per-user token buckets for the recommendation routes (see rate_limit.py)
+limiter = create_limiter()
+
+# Raw ASGI middlewares; the last one added is the outermost
+app.add_middleware(LoadSheddingMiddleware, shedder=shedder)
+if limiter is not None:
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+app.add_middleware(CorrelationIdMiddleware)
 
 class InteractionEvent(BaseModel):
     user_id: int
     lesson_id: int
+    course_id: Optional[int] = None
     interaction_type: str
     payload: dict
+    tags: List[str] = []
+    timestamp: Optional[str] = None
+
+class UserEvent(BaseModel):
+    user_id: int
+    event_type: str
+    course_id: Optional[int] = None
     timestamp: Optional[str] = None
 
 class RecommendationRequest(BaseModel):
@@ -94,6 +115,298 @@ class RecommendationResponse(BaseModel):
     recommendations: List[dict]
     metadata: dict
 
+# Online models, updated on every interaction event and persisted as snapshot + WAL
+models = OnlineModels()
+persistence = ModelPersistence(models)
+
+# Columnar copy of the interaction stream for training scans (see event_segments.py)
+segments = SegmentWriter()
+
+# User-course graph, rebuilt periodically from recommendation_db
+course_graph: Optional[BipartiteGraph] = None
+
+# Precomputed item-item neighbours served by the /recommendations/similar routes;
+# lesson neighbours are split by course and loaded on demand (see model_partitions.py)
+course_neighbours: Optional[NeighbourTable] = None
+lesson_neighbours: Optional[PartitionedNeighbours] = None
+# Course of every lesson seen in an event, used to partition lesson models
+lesson_courses: Dict[int, int] = {}
+# Periodic refresh / maintenance loops started on startup
+background_tasks: Set[asyncio.Task] = set()
+
+# Cheaper answers served under load, best first: the user's last computed
+# result, trending items, then a static list
+result_cache = ResultCache()
+trending_lessons = TrendingCounter()
+trending_courses = TrendingCounter()
+
+TRENDING_REASON = "Em alta entre os alunos"
+STATIC_RECOMMENDATIONS = [
+    {
+        "course_id": 1,
+        "title": "Python para Iniciantes",
+        "score": 0.95,
+        "reason": "Baseado no seu interesse em programação"
+    },
+    {
+        "course_id": 2,
+        "title": "Django Web Development",
+        "score": 0.87,
+        "reason": "Recomendado para quem gosta de Python"
+    }
+]
+
+def _rank_personalized_pagerank(user_id: int, limit: int):
+    graph = course_graph
+    return graph.recommend(user_id, limit) if graph is not None else []
+
+
+def _rank_course_knn(user_id: int, limit: int):
+    """Courses most similar to the ones the user is already connected to."""
+    graph, table = course_graph, course_neighbours
+    index = graph.user_index(user_id) if graph is not None and table is not None else None
+    if index is None:
+        return []
+    return recommend_from_neighbours(table, graph.course_ids[graph.user_courses.row(index)].tolist(), limit)
+
+
+# Ranking algorithms by name; REC_ALGORITHM picks the one serving course
+# recommendations and REC_SHADOW_ALGORITHMS the ones evaluated in shadow
+algorithms = AlgorithmRegistry()
+algorithms.register("personalized_pagerank", "courses", _rank_personalized_pagerank)
+algorithms.register("course_knn", "courses", _rank_course_knn)
+algorithms.register("trending_courses", "courses", lambda user_id, limit: trending_courses.top(limit))
+algorithms.register("session_knn", "lessons", lambda user_id, limit: models.recommend_session(user_id, limit)[0])
+algorithms.register("session_knn_history", "lessons", lambda user_id, limit: models.recommend_history(user_id, limit))
+algorithms.register("trending_lessons", "lessons", lambda user_id, limit: trending_lessons.top(limit))
+algorithms.register("mastery_gaps", "lessons", lambda user_id, limit: models.recommend_weak_skills(user_id, limit))
+algorithms.register("session_knn_features", "lessons",
+                    lambda user_id, limit: models.recommend_with_features(user_id, limit))
+shadow_runner = ShadowRunner(algorithms)
+
+serving_algorithm = SERVING_ALGORITHM
+if algorithms.kind(serving_algorithm) != "courses":
+    logger.error(f"REC_ALGORITHM={serving_algorithm!r} is not a course algorithm; using personalized_pagerank")
+    serving_algorithm = "personalized_pagerank"
+
+ALGORITHM_REASONS = {
+    "personalized_pagerank": "Alunos com trajetória parecida com a sua fizeram este curso",
+    "course_knn": "Parecido com cursos que você já faz",
+    "trending_courses": TRENDING_REASON,
+    "mastery_gaps": "Reforça temas que você ainda não domina",
+}
+
+# Lifecycle events that refresh the user's precomputed recommendations
+USER_EVENT_TYPES = {"login", "enroll"}
+# How far ahead of the server clock a client event timestamp may be
+EVENT_CLOCK_SKEW_SECONDS = float(os.getenv('REC_EVENT_CLOCK_SKEW_SECONDS', '300'))
+
+
+def _event_timestamp(event) -> float:
+    """
+    Epoch seconds of an event, defaulting to now when absent, invalid or
+    before the epoch; clamped to now + EVENT_CLOCK_SKEW_SECONDS.
+    """
+    now = time.time()
+    if event.timestamp:
+        try:
+            timestamp = datetime.fromisoformat(event.timestamp.replace('Z', '+00:00')).timestamp()
+        except (ValueError, OverflowError, OSError):
+            return now
+        if timestamp >= 0:
+            return min(timestamp, now + EVENT_CLOCK_SKEW_SECONDS)
+    return now
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _event_score(event) -> Optional[float]:
+    """
+    Score of an event as a percentage (0-100). ``score`` is read as a
+    percentage unless the payload sends its scale in ``max_score`` (e.g. 1
+    for a fraction, 10 for a grade out of ten); answers may send ``correct``
+    instead (100 or 0).
+    """
+    payload = event.payload if isinstance(event.payload, dict) else {}
+    score = payload.get('score')
+    if _is_number(score):
+        max_score = payload.get('max_score')
+        if _is_number(max_score) and max_score > 0:
+            return float(score) * 100 / max_score
+        return float(score)
+    if event.interaction_type == 'answer' and isinstance(payload.get('correct'), bool):
+        return 100.0 if payload['correct'] else 0.0
+    return None
+
+
+def _store_interaction(event: InteractionEvent, timestamp: float):
+    """Persist an interaction in recommendation_db (runs as a background task)."""
+    score = _event_score(event)
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO interactions (user_id, lesson_id, course_id, interaction_type, score, created_at) "
+                    "VALUES (%s, %s, %s, %s, %s, to_timestamp(%s))",
+                    (event.user_id, event.lesson_id, event.course_id, event.interaction_type, score, timestamp)
+                )
+    except DatabaseError as e:
+        logger.error(f"Failed to store interaction for user {event.user_id}: {e}")
+
+
+def _store_enrollment(user_id: int, course_id: int):
+    """Persist an enrollment edge of the user-course graph (runs as a background task)."""
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO enrollments (user_id, course_id) VALUES (%s, %s) "
+                    "ON CONFLICT (user_id, course_id) DO NOTHING",
+                    (user_id, course_id)
+                )
+    except DatabaseError as e:
+        logger.error(f"Failed to store enrollment for user {user_id}: {e}")
+
+
+def _refresh_precomputed(user_id: int):
+    """Recompute a user's materialized row (runs as a background task)."""
+    try:
+        precompute_user(models, user_id)
+    except DatabaseError as e:
+        logger.error(f"Failed to precompute recommendations for user {user_id}: {e}")
+
+
+def _save_online_result(user_id: int, recommendations: List[dict], algorithm: str):
+    try:
+        save_recommendations([(user_id, recommendations)], algorithm)
+    except DatabaseError as e:
+        logger.error(f"Failed to store recommendations for user {user_id}: {e}")
+
+
+async def _refresh_course_graph():
+    """Rebuild the user-course graph (and course neighbours) every GRAPH_REFRESH_SECONDS."""
+    global course_graph, course_neighbours
+    while True:
+        started = time.perf_counter()
+        try:
+            graph = await run_in_threadpool(load_graph)
+            if graph is not None:
+                neighbours = await run_in_threadpool(build_course_neighbours, graph)
+                course_graph, course_neighbours = graph, neighbours
+                log_algorithm_event(
+                    event_type="graph_rebuilt",
+                    algorithm="personalized_pagerank",
+                    performance_data={
+                        'duration_seconds': round(time.perf_counter() - started, 3),
+                        'edges': graph.n_edges,
+                        'users': len(graph.user_ids),
+                        'courses': len(graph.course_ids),
+                    }
+                )
+        except DatabaseError as e:
+            logger.error(f"Failed to load user-course graph: {e}")
+        except Exception:
+            # Keep serving the previous graph; the next iteration retries
+            logger.exception("Failed to rebuild user-course graph")
+        await asyncio.sleep(GRAPH_REFRESH_SECONDS)
+
+
+def _publish_lesson_neighbours(previous: Optional[PartitionedNeighbours]) -> PartitionedNeighbours:
+    """
+    Rebuild the lesson neighbours and publish them as a new partition
+    generation; only changed courses are written, and the previous hot set
+    is made resident (unchanged partitions are reused from memory).
+    """
+    table = build_lesson_neighbours(models.similarity)
+    partitioned = PartitionedNeighbours(write_partitions(table, lesson_courses, previous=previous))
+    if previous is not None:
+        partitioned.take_over(previous)
+    return partitioned
+
+
+async def _refresh_lesson_neighbours():
+    """Snapshot the online lesson similarity every NEIGHBOURS_REFRESH_SECONDS."""
+    global lesson_neighbours
+    while True:
+        try:
+            lesson_neighbours = await run_in_threadpool(_publish_lesson_neighbours, lesson_neighbours)
+        except OSError as e:
+            logger.error(f"Failed to write lesson neighbour partitions: {e}")
+        except Exception:
+            # Keep serving the previous generation; the next iteration retries
+            logger.exception("Failed to rebuild lesson neighbours")
+        await asyncio.sleep(NEIGHBOURS_REFRESH_SECONDS)
+
+
+async def _snapshot_models():
+    """Persist the online models every SNAPSHOT_INTERVAL_SECONDS."""
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(persistence.snapshot)
+        except OSError as e:
+            logger.error(f"Failed to snapshot online models: {e}")
+
+
+async def _flush_segments():
+    """Append buffered events to the segment files every SEGMENT_FLUSH_SECONDS."""
+    while True:
+        await asyncio.sleep(SEGMENT_FLUSH_SECONDS)
+        try:
+            await run_in_threadpool(segments.flush)
+        except OSError as e:
+            logger.error(f"Failed to flush event segments: {e}")
+
+
+async def _prune_rate_limits():
+    """Drop refilled token buckets every RATE_LIMIT_PRUNE_SECONDS."""
+    while True:
+        await asyncio.sleep(RATE_LIMIT_PRUNE_SECONDS)
+        await run_in_threadpool(limiter.prune)
+
+
+@app.on_event("startup")
+async def create_schema():
+    global lesson_neighbours
+    # Serve nothing until the online models are back to their pre-restart state
+    await run_in_threadpool(persistence.restore)
+    # Serve the last published partitions until the first rebuild, and keep their course assignments
+    generation = current_generation()
+    if generation is not None:
+        try:
+            lesson_neighbours = PartitionedNeighbours(generation)
+            lesson_courses.update(lesson_neighbours.lesson_courses())
+        except (OSError, KeyError, ValueError) as e:
+            logger.error(f"Ignoring unreadable lesson neighbour partitions {generation}: {e}")
+    try:
+        await run_in_threadpool(ensure_schema)
+    except DatabaseError as e:
+        logger.error(f"Could not ensure recommendation_db schema: {e}")
+    loops = [_refresh_course_graph(), _refresh_lesson_neighbours(), _snapshot_models(),
+             shedder.monitor_loop_lag(), _flush_segments()]
+    if limiter is not None:
+        loops.append(_prune_rate_limits())
+    # The event loop only keeps weak references to tasks
+    background_tasks.update(asyncio.create_task(loop) for loop in loops)
+
+
+@app.on_event("shutdown")
+async def save_models():
+    try:
+        await run_in_threadpool(segments.flush)
+    except OSError as e:
+        logger.error(f"Failed to flush event segments on shutdown: {e}")
+    try:
+        await run_in_threadpool(persistence.snapshot)
+    except OSError as e:
+        logger.error(f"Failed to snapshot online models on shutdown: {e}")
+    persistence.close()
+    shadow_runner.shutdown()
+    await jwks_cache.close()
+
+
 @app.get("/", tags=["health"])
 async def root():
     """Root endpoint - verifica se o serviço está rodando."""
@@ -102,7 +415,15 @@ async def root():
 @app.get("/health/", tags=["health"])
 async def health_check():
     """Health check endpoint - verifica a saúde do serviço."""
-    return {"status": "healthy", "service": "recommendation"}
+    return {
+        "status": "healthy",
+        "service": "recommendation",
+        "load": shedder.stats(),
+        "rate_limit": limiter.stats() if limiter is not None else None,
+        "lesson_partitions": lesson_neighbours.stats() if lesson_neighbours is not None else None,
+        "jwks": jwks_cache.stats(),
+        "token_cache": token_cache.stats(),
+    }
 
 @app.get("/healthz/", tags=["health"])
 async def health_check_z():
@@ -113,6 +434,7 @@ async def health_check_z():
 async def receive_interaction_event(
     event: InteractionEvent,
     request: Request,
+    background_tasks: BackgroundTasks,
     current_user: Dict[str, Any] = CurrentUser
 ):
     """
@@ -124,6 +446,30 @@ async def receive_interaction_event(
     correlation_id = getattr(request.state, 'correlation_id', None)
     
     log_auth_info(current_user, "interaction_event")
+
+    timestamp = _event_timestamp(event)
+    type_code = interaction_type_code(event.interaction_type)
+    try:
+        persistence.apply_interaction(
+            event.user_id, event.lesson_id, timestamp, type_code, _event_score(event), tag_mask(event.tags)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                'error': 'Invalid interaction',
+                'message': str(e),
+                'code': 'INVALID_INTERACTION'
+            }
+        )
+    segments.append(event.user_id, event.lesson_id, type_code, timestamp)
+    trending_lessons.add(event.lesson_id, timestamp)
+    if event.course_id is not None:
+        lesson_courses[event.lesson_id] = event.course_id
+        trending_courses.add(event.course_id, timestamp)
+        models.impressions.click(event.user_id, course_key(event.course_id))
+    background_tasks.add_task(_store_interaction, event, timestamp)
+
     log_interaction_event(
         event_type="interaction_received",
         user_id=str(current_user['user_id']),
@@ -142,6 +488,86 @@ async def receive_interaction_event(
         "processed_by": current_user['user_id']
     }
 
+@app.post("/events/user", tags=["interactions"])
+async def receive_user_event(
+    event: UserEvent,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: Dict[str, Any] = CurrentUser
+):
+    """
+    Recebe eventos de ciclo de vida do usuário (login, matrícula).
+
+    Cada evento agenda o recálculo das recomendações materializadas do usuário,
+    para que a próxima chamada a /recommendations/me seja atendida pela tabela.
+    """
+    if event.event_type not in USER_EVENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                'error': 'Invalid event type',
+                'message': f'Supported event types: {sorted(USER_EVENT_TYPES)}',
+                'code': 'INVALID_EVENT_TYPE'
+            }
+        )
+
+    log_auth_info(current_user, f"user_event_{event.event_type}")
+    log_interaction_event(
+        event_type=f"user_{event.event_type}",
+        user_id=str(event.user_id),
+        details={"course_id": event.course_id},
+        correlation_id=getattr(request.state, 'correlation_id', None)
+    )
+    if event.event_type == "enroll" and event.course_id is not None:
+        trending_courses.add(event.course_id)
+        models.impressions.click(event.user_id, course_key(event.course_id))
+        background_tasks.add_task(_store_enrollment, event.user_id, event.course_id)
+    background_tasks.add_task(_refresh_precomputed, event.user_id)
+
+    return {
+        "message": "User event received",
+        "event_type": event.event_type,
+        "precompute_scheduled": True
+    }
+
+def _show(user_id: int, recommendations: List[dict], limit: int) -> List[dict]:
+    """
+    Demote the items the user keeps ignoring, keep the first ``limit`` and
+    record them as impressions.
+    """
+    shown = models.impressions.demote(user_id, recommendations)[:limit]
+    models.impressions.record(user_id, [item_key(item) for item in shown])
+    return shown
+
+def _degraded_recommendations(kind: str, user_id: int, limit: int) -> RecommendationResponse:
+    """
+    Answer without computing anything: the user's cached result, then the
+    trending items of ``kind`` ("courses" or "lessons"), then the static list.
+    """
+    cached = result_cache.get((kind, user_id))
+    if cached:
+        recommendations, algorithm, tier = cached["recommendations"], cached["algorithm"], TIER_CACHED
+    else:
+        counter, key = (trending_courses, "course_id") if kind == "courses" else (trending_lessons, "lesson_id")
+        recommendations = [
+            {key: item_id, "score": round(score, 4), "reason": TRENDING_REASON}
+            for item_id, score in counter.top(limit)
+        ]
+        algorithm, tier = "trending", TIER_TRENDING
+        if not recommendations:
+            recommendations, algorithm, tier = STATIC_RECOMMENDATIONS, "static", TIER_STATIC
+
+    return RecommendationResponse(
+        user_id=user_id,
+        recommendations=_show(user_id, recommendations, limit),
+        metadata={
+            "total_recommendations": len(recommendations),
+            "algorithm": algorithm,
+            "tier": tier,
+            "timestamp": datetime.utcnow().isoformat() + 'Z'
+        }
+    )
+
 @app.post("/recommendations/", response_model=RecommendationResponse)
 async def get_recommendations(
     request: RecommendationRequest,
@@ -151,28 +577,53 @@ async def get_recommendations(
     Gera recomendações para um usuário
     """
     log_auth_info(current_user, "get_recommendations")
-    # Implementação básica - retorna recomendações mockadas
-    mock_recommendations = [
-        {
-            "course_id": 1,
-            "title": "Python para Iniciantes",
-            "score": 0.95,
-            "reason": "Baseado no seu interesse em programação"
-        },
-        {
-            "course_id": 2,
-            "title": "Django Web Development",
-            "score": 0.87,
-            "reason": "Recomendado para quem gosta de Python"
-        }
-    ]
-    
+
+    if shedder.degraded():
+        return _degraded_recommendations("courses", request.user_id, request.limit)
+
+    # Algoritmo de produção (REC_ALGORITHM; por padrão PageRank personalizado no grafo usuário-curso)
+    algorithm = serving_algorithm
+    graph = course_graph
+    if graph is not None and graph.user_index(request.user_id) is not None:
+        # Extra candidates so demoted courses can be replaced
+        ranked, latency_ms = await run_in_threadpool(
+            algorithms.run, algorithm, request.user_id, request.limit * 2
+        )
+        if ranked:
+            recommendations = [
+                {
+                    "course_id": course_id,
+                    "score": round(score, 6),
+                    "reason": ALGORITHM_REASONS.get(algorithm, "")
+                }
+                for course_id, score in ranked
+            ]
+            result_cache.put(("courses", request.user_id),
+                             {"recommendations": recommendations, "algorithm": algorithm})
+            shown = _show(request.user_id, recommendations, request.limit)
+            shadow_runner.submit("courses", request.user_id, request.limit, algorithm,
+                                 [item["course_id"] for item in shown], latency_ms)
+            return RecommendationResponse(
+                user_id=request.user_id,
+                recommendations=shown,
+                metadata={
+                    "total_recommendations": len(ranked),
+                    "algorithm": algorithm,
+                    "tier": TIER_FULL,
+                    "latency_ms": round(latency_ms, 2),
+                    "graph_built_at": datetime.utcfromtimestamp(graph.built_at).isoformat() + 'Z',
+                    "timestamp": datetime.utcnow().isoformat() + 'Z'
+                }
+            )
+
+    # Sem dados suficientes - retorna recomendações padrão
     return RecommendationResponse(
         user_id=request.user_id,
-        recommendations=mock_recommendations[:request.limit],
+        recommendations=_show(request.user_id, STATIC_RECOMMENDATIONS, request.limit),
         metadata={
-            "total_recommendations": len(mock_recommendations),
+            "total_recommendations": len(STATIC_RECOMMENDATIONS),
             "algorithm": "collaborative_filtering",
+            "tier": TIER_STATIC,
             "timestamp": "2024-01-01T12:00:00Z"
         }
     )
@@ -194,6 +645,7 @@ async def get_user_recommendations(
 
 @app.get("/recommendations/me")
 async def get_my_recommendations(
+    background_tasks: BackgroundTasks,
     limit: int = 10,
     current_user: Dict[str, Any] = CurrentUser
 ):
@@ -201,10 +653,191 @@ async def get_my_recommendations(
     Obtém recomendações para o usuário atual
     """
     log_auth_info(current_user, "get_my_recommendations")
-    
-    request = RecommendationRequest(user_id=current_user['user_id'], limit=limit)
+
+    user_id = current_user['user_id']
+
+    # Sob carga: resposta em cache, tendências ou lista estática, sem tocar no banco
+    if shedder.degraded():
+        return _degraded_recommendations("lessons", user_id, limit)
+
+    # Linha materializada: uma busca por chave primária
+    try:
+        row = await run_in_threadpool(fetch_precomputed, user_id)
+    except DatabaseError as e:
+        logger.error(f"Failed to read precomputed recommendations for user {user_id}: {e}")
+        row = None
+
+    if row and row['recommendations'] and is_fresh(row, models.last_activity(user_id)):
+        result_cache.put(("lessons", user_id),
+                         {"recommendations": row['recommendations'], "algorithm": row['algorithm']})
+        shown = _show(user_id, row['recommendations'], limit)
+        shadow_runner.submit("lessons", user_id, limit, row['algorithm'],
+                             [item.get("lesson_id") for item in shown])
+        return RecommendationResponse(
+            user_id=user_id,
+            recommendations=shown,
+            metadata={
+                "total_recommendations": len(row['recommendations']),
+                "algorithm": row['algorithm'],
+                "source": "precomputed",
+                "tier": TIER_FULL,
+                "computed_at": datetime.utcfromtimestamp(row['computed_at']).isoformat() + 'Z',
+                "timestamp": datetime.utcnow().isoformat() + 'Z'
+            }
+        )
+
+    # Linha ausente ou desatualizada: calcula online, priorizando a sessão atual
+    started = time.perf_counter()
+    ranked, session_length = models.recommend_session(user_id, limit=PRECOMPUTE_LIMIT)
+    algorithm, reason = "session_knn", SESSION_REASON
+    if not ranked:
+        ranked = models.recommend_history(user_id, limit=PRECOMPUTE_LIMIT)
+        algorithm, reason = "session_knn_history", HISTORY_REASON
+    latency_ms = (time.perf_counter() - started) * 1000
+    algorithms.record(algorithm, latency_ms)
+
+    if ranked:
+        recommendations = format_recommendations(ranked, reason)
+        result_cache.put(("lessons", user_id), {"recommendations": recommendations, "algorithm": algorithm})
+        background_tasks.add_task(_save_online_result, user_id, recommendations, algorithm)
+        log_recommendation_event(
+            event_type="online_recommendations_served",
+            user_id=str(user_id),
+            algorithm=algorithm,
+            details={"session_length": session_length, "count": len(ranked)}
+        )
+        shown = _show(user_id, recommendations, limit)
+        shadow_runner.submit("lessons", user_id, limit, algorithm,
+                             [item["lesson_id"] for item in shown], latency_ms)
+        return RecommendationResponse(
+            user_id=user_id,
+            recommendations=shown,
+            metadata={
+                "total_recommendations": len(recommendations),
+                "algorithm": algorithm,
+                "source": "online",
+                "tier": TIER_FULL,
+                "session_length": session_length,
+                "timestamp": datetime.utcnow().isoformat() + 'Z'
+            }
+        )
+
+    request = RecommendationRequest(user_id=user_id, limit=limit)
     return await get_recommendations(request, current_user)
 
+@app.get("/recommendations/algorithms", tags=["recommendations"])
+async def get_algorithms(current_user: Optional[Dict[str, Any]] = CurrentUserOptional):
+    """
+    Algoritmos registrados, algoritmo em produção, algoritmos em modo sombra
+    e latência por algoritmo (p50/p95/p99 das últimas execuções).
+    """
+    return {
+        "serving": {"courses": serving_algorithm, "lessons": "session_knn"},
+        "registered": {kind: algorithms.names(kind) for kind in ("courses", "lessons")},
+        "shadow": {
+            "algorithms": shadow_runner.shadows,
+            "sample_rate": shadow_runner.sample_rate,
+            "dropped": shadow_runner.dropped,
+        },
+        "latency": algorithms.stats(),
+        "metadata": {
+            "tier": TIER_FULL,
+            "timestamp": datetime.utcnow().isoformat() + 'Z'
+        },
+    }
+
+@app.get("/recommendations/mastery/me", tags=["recommendations"])
+async def get_my_mastery(
+    limit: int = 10,
+    current_user: Dict[str, Any] = CurrentUser
+):
+    """
+    Domínio estimado (BKT) do usuário atual por tema e lições que reforçam
+    os temas menos dominados.
+    """
+    log_auth_info(current_user, "get_my_mastery")
+
+    user_id = current_user['user_id']
+    ranked, latency_ms = await run_in_threadpool(algorithms.run, "mastery_gaps", user_id, limit * 2)
+    mastery, counts = models.mastery.skill_mastery(user_id)
+    # Temas são os buckets de tags (feature_store.tag_mask); só os já observados
+    skills = sorted(
+        (
+            {"skill": bucket, "mastery": round(value, 4), "observations": count, "mastered": value >= MASTERY_THRESHOLD}
+            for bucket, (value, count) in enumerate(zip(mastery.tolist(), counts.tolist()))
+            if count > 0
+        ),
+        key=lambda skill: skill["mastery"]
+    )
+    shown = _show(user_id, format_recommendations(ranked, ALGORITHM_REASONS["mastery_gaps"]), limit)
+    return {
+        "user_id": user_id,
+        "skills": skills,
+        "recommendations": shown,
+        "metadata": {
+            "algorithm": "mastery_gaps",
+            "tier": TIER_FULL,
+            "mastery_threshold": MASTERY_THRESHOLD,
+            "latency_ms": round(latency_ms, 2),
+            "timestamp": datetime.utcnow().isoformat() + 'Z'
+        }
+    }
+
+def _similar_response(key: str, item_id: int, table: Union[NeighbourTable, PartitionedNeighbours, None],
+                      limit: int, algorithm: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+    neighbours = table.lookup(item_id, limit) if table is not None else []
+    similar = [
+        {key: neighbour_id, "score": round(score, 4)}
+        for neighbour_id, score in neighbours
+    ]
+    if user_id is not None:
+        models.impressions.record(user_id, [item_key(item) for item in similar])
+    return {
+        key: item_id,
+        "similar": similar,
+        "metadata": {
+            "total": len(neighbours),
+            "algorithm": algorithm,
+            # No table published yet: the answer is an empty static fallback
+            "tier": TIER_FULL if table is not None else TIER_STATIC,
+            "built_at": datetime.utcfromtimestamp(table.built_at).isoformat() + 'Z' if table else None,
+        }
+    }
+
+@app.get("/recommendations/similar/lesson/{lesson_id}", tags=["recommendations"])
+async def get_similar_lessons(
+    lesson_id: int,
+    limit: int = 10,
+    current_user: Optional[Dict[str, Any]] = CurrentUserOptional
+):
+    """
+    Lições estudadas junto com a lição informada.
+
+    Responde a partir da tabela de vizinhos pré-calculada, sem cálculo por requisição.
+    """
+    table = lesson_neighbours
+    user_id = current_user['user_id'] if current_user else None
+    if table is not None and not table.is_resident(lesson_id):
+        # Partition not in memory: load it off the event loop
+        return await run_in_threadpool(_similar_response, "lesson_id", lesson_id, table, limit,
+                                       "session_cooccurrence", user_id)
+    return _similar_response("lesson_id", lesson_id, table, limit, "session_cooccurrence", user_id)
+
+@app.get("/recommendations/similar/{course_id}", tags=["recommendations"])
+async def get_similar_courses(
+    course_id: int,
+    limit: int = 10,
+    current_user: Optional[Dict[str, Any]] = CurrentUserOptional
+):
+    """
+    Cursos feitos por alunos que também fizeram o curso informado
+    ("alunos também cursaram").
+
+    Responde a partir da tabela de vizinhos pré-calculada, sem cálculo por requisição.
+    """
+    return _similar_response("course_id", course_id, course_neighbours, limit, "co_enrollment_cosine",
+                             current_user['user_id'] if current_user else None)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
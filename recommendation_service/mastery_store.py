@@ -0,0 +1,286 @@
+"""
+Incremental mastery estimates (Bayesian knowledge tracing).
+
+Every graded interaction (``complete`` with a score, ``answer``) is one
+observation of a lesson and of its skills, the tag buckets of its course
+(see ``feature_store.tag_mask``). Each observation applies one BKT step to
+P(known) of the (user, lesson) pair and of every (user, skill) pair:
+
+    posterior = P(L | evidence)           slip / guess likelihoods
+    P(L)'     = posterior + (1 - posterior) * learn
+
+Scores are percentages (0-100, see ``main._event_score``) used as soft
+evidence: a score of 70 weighs the "correct" posterior by 0.7 and the
+"incorrect" one by 0.3. Skill estimates are one float32 row per
+user (TAG_BUCKETS wide) in matrices indexed by a user slot map; lesson
+estimates are float32 entries of a flat array indexed by (user, lesson)
+slots. Updates are O(1) (O(tags) for skills), so recommendations can target
+weak skills straight from the online state.
+"""
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from feature_store import TAG_BUCKETS, interaction_type_code
+from session_store import _resize_rows
+
+
+BKT_PRIOR = float(os.getenv('REC_BKT_PRIOR', '0.3'))
+BKT_LEARN = float(os.getenv('REC_BKT_LEARN', '0.1'))
+BKT_SLIP = float(os.getenv('REC_BKT_SLIP', '0.1'))
+BKT_GUESS = float(os.getenv('REC_BKT_GUESS', '0.2'))
+# P(known) from which a lesson or skill counts as mastered
+MASTERY_THRESHOLD = float(os.getenv('REC_MASTERY_THRESHOLD', '0.95'))
+
+GRADED_TYPES = (interaction_type_code('complete'), interaction_type_code('answer'))
+
+_BITS = np.arange(TAG_BUCKETS, dtype=np.uint32)
+_INITIAL_CAPACITY = 1024
+
+
+def check_bkt_params(prior: float, learn: float, slip: float, guess: float):
+    """
+    Raise ValueError unless 0 < slip, guess < 1, 0 <= learn < 1 and
+    0 <= prior <= 1; outside them P(correct) can reach 0 or 1 and a BKT step
+    divides by zero (NaN in the float32 estimates).
+    """
+    if not (0 < slip < 1 and 0 < guess < 1):
+        raise ValueError(f"BKT slip and guess must be in (0, 1), got slip={slip}, guess={guess}")
+    if not 0 <= learn < 1:
+        raise ValueError(f"BKT learn must be in [0, 1), got {learn}")
+    if not 0 <= prior <= 1:
+        raise ValueError(f"BKT prior must be in [0, 1], got {prior}")
+
+
+# Invalid REC_BKT_* values fail at startup rather than as NaN estimates
+check_bkt_params(BKT_PRIOR, BKT_LEARN, BKT_SLIP, BKT_GUESS)
+
+
+def bkt_update(mastery, evidence, learn: float = BKT_LEARN,
+               slip: float = BKT_SLIP, guess: float = BKT_GUESS):
+    """
+    One BKT step on P(known) (scalar or array) given the probability that
+    the observed answer was correct.
+    """
+    known_correct = mastery * (1 - slip)
+    p_correct = known_correct + (1 - mastery) * guess
+    posterior = (evidence * known_correct / p_correct
+                 + (1 - evidence) * mastery * slip / (1 - p_correct))
+    return posterior + (1 - posterior) * learn
+
+
+def score_evidence(score: Optional[float]) -> Optional[float]:
+    """Probability of a correct answer from a 0-100 score; None if missing."""
+    if score is None or score != score:  # NaN marks a missing score
+        return None
+    return min(max(float(score) / 100, 0.0), 1.0)
+
+
+class MasteryStore:
+    """
+    P(known) per (user, skill) and per (user, lesson), plus the skills of
+    every lesson seen in an event.
+    """
+
+    def __init__(self, prior: float = BKT_PRIOR, learn: float = BKT_LEARN,
+                 slip: float = BKT_SLIP, guess: float = BKT_GUESS,
+                 initial_capacity: int = _INITIAL_CAPACITY):
+        check_bkt_params(prior, learn, slip, guess)
+        self.prior = prior
+        self.learn = learn
+        self.slip = slip
+        self.guess = guess
+        # Skills: one row per user
+        self._slots: Dict[int, int] = {}
+        self._skills = np.full((initial_capacity, TAG_BUCKETS), prior, dtype=np.float32)
+        self._skill_counts = np.zeros((initial_capacity, TAG_BUCKETS), dtype=np.uint16)
+        # Lessons: user -> {lesson_id: pair slot}
+        self._pairs: Dict[int, Dict[int, int]] = {}
+        self._pair_count = 0
+        self._lessons = np.full(initial_capacity, prior, dtype=np.float32)
+        self._lesson_counts = np.zeros(initial_capacity, dtype=np.uint16)
+        # Catalogue: lesson_id -> tag mask
+        self._catalogue: Dict[int, int] = {}
+        self._catalogue_ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._catalogue_tags = np.zeros(initial_capacity, dtype=np.uint32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _slot_for(self, user_id: int) -> int:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = len(self._slots)
+            if slot >= self._skills.shape[0]:
+                capacity = self._skills.shape[0] * 2
+                self._skills = _resize_rows(self._skills, capacity)
+                self._skills[slot:] = self.prior
+                self._skill_counts = _resize_rows(self._skill_counts, capacity)
+            self._slots[user_id] = slot
+        return slot
+
+    def _pair_for(self, user_id: int, lesson_id: int) -> int:
+        lessons = self._pairs.setdefault(user_id, {})
+        slot = lessons.get(lesson_id)
+        if slot is None:
+            slot = self._pair_count
+            if slot >= len(self._lessons):
+                capacity = len(self._lessons) * 2
+                self._lessons = _resize_rows(self._lessons, capacity)
+                self._lessons[slot:] = self.prior
+                self._lesson_counts = _resize_rows(self._lesson_counts, capacity)
+            lessons[lesson_id] = slot
+            self._pair_count += 1
+        return slot
+
+    def _catalogue_lesson(self, lesson_id: int, tags: int):
+        index = self._catalogue.get(lesson_id)
+        if index is None:
+            index = len(self._catalogue)
+            if index >= len(self._catalogue_ids):
+                capacity = len(self._catalogue_ids) * 2
+                self._catalogue_ids = _resize_rows(self._catalogue_ids, capacity)
+                self._catalogue_tags = _resize_rows(self._catalogue_tags, capacity)
+            self._catalogue[lesson_id] = index
+            self._catalogue_ids[index] = lesson_id
+        self._catalogue_tags[index] |= tags
+
+    def update(self, user_id: int, lesson_id: int, type_code: int,
+               score: Optional[float] = None, tags: int = 0):
+        """
+        Fold one interaction in: any event with tags records the lesson's
+        skills; graded events with a score are also a BKT observation.
+        """
+        evidence = score_evidence(score) if type_code in GRADED_TYPES else None
+        with self._lock:
+            if tags:
+                self._catalogue_lesson(lesson_id, tags)
+            if evidence is None:
+                return
+            # Plain float arithmetic: cheaper than array ops for a few elements
+            params = (self.learn, self.slip, self.guess)
+            pair = self._pair_for(user_id, lesson_id)
+            self._lessons[pair] = bkt_update(self._lessons.item(pair), evidence, *params)
+            self._lesson_counts[pair] = min(self._lesson_counts.item(pair) + 1, 0xFFFF)
+            if not tags:
+                return
+            slot = self._slot_for(user_id)
+            row, counts = self._skills[slot], self._skill_counts[slot]
+            bucket = 0
+            while tags:
+                if tags & 1:
+                    row[bucket] = bkt_update(row.item(bucket), evidence, *params)
+                    counts[bucket] = min(counts.item(bucket) + 1, 0xFFFF)
+                tags >>= 1
+                bucket += 1
+
+    def lesson_tags(self, lesson_ids: Sequence[int]) -> np.ndarray:
+        """Tag masks of ``lesson_ids`` (0 for lessons never seen with tags)."""
+        with self._lock:
+            indices = [self._catalogue.get(lesson_id, -1) for lesson_id in lesson_ids]
+            tags = np.zeros(len(indices), dtype=np.uint32)
+            known = np.array(indices, dtype=np.int64) >= 0
+            if known.any():
+                tags[known] = self._catalogue_tags[np.array(indices)[known]]
+        return tags
+
+    def lesson_mastery(self, user_id: int, lesson_id: int) -> Optional[float]:
+        """P(known) of a lesson, or None if the user has no graded attempt."""
+        with self._lock:
+            slot = self._pairs.get(user_id, {}).get(lesson_id)
+            return float(self._lessons[slot]) if slot is not None else None
+
+    def skill_mastery(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        P(known) and observation counts of every skill bucket (the prior and
+        zero counts for skills never observed).
+        """
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                return (np.full(TAG_BUCKETS, self.prior, dtype=np.float32),
+                        np.zeros(TAG_BUCKETS, dtype=np.uint16))
+            return self._skills[slot].copy(), self._skill_counts[slot].copy()
+
+    def weak_lessons(self, user_id: int, limit: int,
+                     threshold: float = MASTERY_THRESHOLD) -> List[Tuple[int, float]]:
+        """
+        Rank lessons by how much they would exercise the user's weak skills:
+        the mean gap (1 - P(known)) over the lesson's observed, unmastered
+        skills, or the lesson's own gap if attempted and not yet mastered.
+        Mastered lessons are left out.
+        """
+        mastery, counts = self.skill_mastery(user_id)
+        gaps = np.where((counts > 0) & (mastery < threshold), 1 - mastery, 0).astype(np.float32)
+        with self._lock:
+            size = len(self._catalogue)
+            ids = self._catalogue_ids[:size]
+            tags = self._catalogue_tags[:size]
+            attempted = self._pairs.get(user_id, {})
+            attempted_ids = np.fromiter(attempted.keys(), dtype=np.int64, count=len(attempted))
+            attempted_mastery = self._lessons[np.fromiter(attempted.values(), dtype=np.int64,
+                                                          count=len(attempted))]
+        if not size and not len(attempted_ids):
+            return []
+
+        bits = ((tags[:, np.newaxis] >> _BITS) & 1).astype(np.float32)
+        skill_count = bits.sum(axis=1)
+        scores = np.zeros(size, dtype=np.float32)
+        np.divide(bits @ gaps, skill_count, out=scores, where=skill_count > 0)
+
+        candidates = dict(zip(ids.tolist(), scores.tolist()))
+        for lesson_id, lesson_mastery in zip(attempted_ids.tolist(), attempted_mastery.tolist()):
+            if lesson_mastery >= threshold:
+                candidates.pop(lesson_id, None)
+            else:
+                candidates[lesson_id] = max(candidates.get(lesson_id, 0.0), 1 - lesson_mastery)
+        ranked = sorted(((lesson_id, score) for lesson_id, score in candidates.items() if score > 0),
+                        key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            count = len(self._slots)
+            slots = np.fromiter(self._slots.values(), dtype=np.int64, count=count)
+            pair_users = [user_id for user_id, lessons in self._pairs.items() for _ in lessons]
+            pair_lessons = [lesson_id for lessons in self._pairs.values() for lesson_id in lessons]
+            pair_slots = [slot for lessons in self._pairs.values() for slot in lessons.values()]
+            size = len(self._catalogue)
+            return {
+                'user_ids': np.fromiter(self._slots.keys(), dtype=np.int64, count=count),
+                'skills': self._skills[slots],
+                'skill_counts': self._skill_counts[slots],
+                'pair_users': np.array(pair_users, dtype=np.int64),
+                'pair_lessons': np.array(pair_lessons, dtype=np.int64),
+                'lessons': self._lessons[np.array(pair_slots, dtype=np.int64)],
+                'lesson_counts': self._lesson_counts[np.array(pair_slots, dtype=np.int64)],
+                'catalogue_ids': self._catalogue_ids[:size].copy(),
+                'catalogue_tags': self._catalogue_tags[:size].copy(),
+            }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'MasteryStore':
+        count = len(arrays['user_ids'])
+        pairs = len(arrays['pair_users'])
+        size = len(arrays['catalogue_ids'])
+        store = cls(initial_capacity=max(count, pairs, size, _INITIAL_CAPACITY))
+        store._slots = dict(zip(arrays['user_ids'].tolist(), range(count)))
+        store._skills[:count] = arrays['skills']
+        store._skill_counts[:count] = arrays['skill_counts']
+        for slot, (user_id, lesson_id) in enumerate(zip(arrays['pair_users'].tolist(),
+                                                        arrays['pair_lessons'].tolist())):
+            store._pairs.setdefault(user_id, {})[lesson_id] = slot
+        store._pair_count = pairs
+        store._lessons[:pairs] = arrays['lessons']
+        store._lesson_counts[:pairs] = arrays['lesson_counts']
+        store._catalogue = dict(zip(arrays['catalogue_ids'].tolist(), range(size)))
+        store._catalogue_ids[:size] = arrays['catalogue_ids']
+        store._catalogue_tags[:size] = arrays['catalogue_tags']
+        return store
+
+    def memory_bytes(self) -> int:
+        return ((self._skills.itemsize + self._skill_counts.itemsize) * TAG_BUCKETS * len(self._slots)
+                + (self._lessons.itemsize + self._lesson_counts.itemsize) * self._pair_count)
@@ -0,0 +1,160 @@
+"""
+Raw ASGI middlewares for the recommendation service.
+
+Unlike ``@app.middleware("http")`` (Starlette's ``BaseHTTPMiddleware``), these
+wrap the ``send`` callable directly: no extra task or memory stream per
+request, and streaming responses pass through untouched.
+"""
+import math
+import time
+import uuid
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from load_shedding import LoadShedder, LOAD_SHED, RETRY_AFTER_SECONDS
+from logging_config import log_request
+from rate_limit import TokenBucketLimiter
+
+
+def _header(scope: Scope, name: bytes):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _user_id(value: Optional[str]) -> Optional[int]:
+    """The X-User-Id as a positive bigint, or None if missing or malformed."""
+    if value is None or not value.strip().isdigit():
+        return None
+    user_id = int(value)
+    return user_id if 0 < user_id < 2 ** 63 else None
+
+
+class CorrelationIdMiddleware:
+    """
+    Propagate (or create) the X-Request-ID of every request, expose it as
+    ``request.state.correlation_id`` and log method, path, status and timing
+    once the response has been fully sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        correlation_id = _header(scope, b"x-request-id") or str(uuid.uuid4())
+        scope.setdefault("state", {})["correlation_id"] = correlation_id
+        status_code = 500
+        start_time = time.time()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", correlation_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            log_request(
+                method=scope["method"],
+                path=scope["path"],
+                status_code=status_code,
+                response_time=time.time() - start_time,
+                user_id=_header(scope, b"x-user-id"),
+                correlation_id=correlation_id
+            )
+
+
+class LoadSheddingMiddleware:
+    """
+    Count in-flight requests under ``path_prefix`` and reject them with
+    503 + Retry-After while ``shedder`` reports shed load.
+    """
+
+    def __init__(self, app: ASGIApp, shedder: LoadShedder, path_prefix: str = "/recommendations"):
+        self.app = app
+        self.shedder = shedder
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        shedder = self.shedder
+        shedder.in_flight += 1
+        try:
+            if shedder.level() == LOAD_SHED:
+                shedder.shed_total += 1
+                response = JSONResponse(
+                    status_code=503,
+                    content={
+                        "detail": {
+                            "error": "Serviço sobrecarregado, tente novamente em instantes",
+                            "code": "OVERLOADED"
+                        }
+                    },
+                    headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+                )
+                await response(scope, receive, send)
+                return
+            await self.app(scope, receive, send)
+        finally:
+            shedder.in_flight -= 1
+
+
+class RateLimitMiddleware:
+    """
+    Take a token from the caller's bucket for every request under
+    ``path_prefix`` and reject it with 429 + Retry-After when it is empty.
+    Callers are keyed by the trusted X-User-Id (the id ``get_current_user``
+    resolves first), or by client address when the header is missing or
+    is not a valid bigint id (keeping keys short for the shared store).
+    """
+
+    def __init__(self, app: ASGIApp, limiter: TokenBucketLimiter, path_prefix: str = "/recommendations"):
+        self.app = app
+        self.limiter = limiter
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        user_id = _user_id(_header(scope, b"x-user-id"))
+        if user_id is not None:
+            key = f"user:{user_id}"
+        else:
+            client = scope.get("client")
+            key = f"ip:{client[0] if client else 'unknown'}"
+
+        if self.limiter.blocking:
+            retry_after = await run_in_threadpool(self.limiter.acquire, key)
+        else:
+            retry_after = self.limiter.acquire(key)
+        if retry_after > 0:
+            response = JSONResponse(
+                status_code=429,
+                content={
+                    "detail": {
+                        "error": "Limite de requisições excedido, tente novamente em instantes",
+                        "code": "RATE_LIMITED"
+                    }
+                },
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,283 @@
+"""
+Per-course partitions of the lesson neighbour table, loaded on demand.
+
+The lesson neighbour table grows with the catalogue, while traffic mostly
+touches a small hot set of courses. After each rebuild the table is split by
+course into one ``.npz`` per partition inside a new generation directory:
+
+    partitions/CURRENT                      name of the live generation
+    partitions/gen-00000007/index.npz       lesson id -> course id (always resident)
+    partitions/gen-00000007/course-42.npz   neighbour rows of the lessons of course 42
+    partitions/gen-00000007/course-0.npz    lessons whose course is not known yet
+
+``PartitionedNeighbours`` answers lookups like a ``NeighbourTable`` but only
+keeps the partitions that lookups touch, evicting the least recently used
+ones once the resident arrays exceed ``REC_PARTITION_BUDGET_MB``.
+
+The index records a digest of every partition. A rebuild hard-links the
+files of partitions whose content did not change from the previous
+generation instead of writing them again, and the new generation takes over
+the previous one's resident tables for those partitions, so only courses
+whose lessons changed are written and reloaded.
+"""
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from logging_config import get_logger
+from neighbour_table import NeighbourTable, NEIGHBOURS_PER_ITEM
+
+
+PARTITION_DIR = os.getenv('REC_PARTITION_DIR', os.path.join('state', 'partitions'))
+PARTITION_BUDGET_BYTES = int(float(os.getenv('REC_PARTITION_BUDGET_MB', '64')) * 1024 * 1024)
+
+UNASSIGNED_COURSE = 0
+
+_CURRENT_FILE = 'CURRENT'
+_INDEX_FILE = 'index.npz'
+# Generations kept on disk: the live one and the one readers may still use
+_KEEP_GENERATIONS = 2
+
+logger = get_logger('recommendation_service.model_partitions')
+
+
+def _partition_file(course_id: int) -> str:
+    return f'course-{course_id}.npz'
+
+
+def _take_rows(indptr: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR offsets of a subset of rows and the positions of their entries."""
+    lengths = indptr[rows + 1] - indptr[rows]
+    sub_indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=sub_indptr[1:])
+    positions = np.repeat(indptr[rows] - sub_indptr[:-1], lengths) + np.arange(sub_indptr[-1])
+    return sub_indptr, positions
+
+
+def _digest(arrays: Dict[str, np.ndarray]) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.digest()
+
+
+def _link_or_write(previous_file: Optional[str], path: str, arrays: Dict[str, np.ndarray]):
+    if previous_file is not None:
+        try:
+            os.link(previous_file, path)
+            return
+        except OSError:
+            pass
+    np.savez(path, **arrays)
+
+
+def write_partitions(table: NeighbourTable, lesson_courses: Mapping[int, int],
+                     directory: str = PARTITION_DIR,
+                     previous: Optional['PartitionedNeighbours'] = None) -> str:
+    """
+    Split ``table`` by course into a new generation directory, publish it as
+    CURRENT and drop generations older than the previous one. Partitions
+    identical to the ones of ``previous`` are hard-linked, not rewritten.
+
+    Returns:
+        str: path of the new generation
+    """
+    os.makedirs(directory, exist_ok=True)
+    generations = _generations(directory)
+    sequence = generations[-1][0] + 1 if generations else 1
+    name = f'gen-{sequence:08d}'
+    path = os.path.join(directory, name)
+    os.makedirs(path)
+
+    courses = np.fromiter(
+        (lesson_courses.get(lesson_id, UNASSIGNED_COURSE) for lesson_id in table.item_ids.tolist()),
+        dtype=np.int64, count=len(table)
+    )
+    partition_ids = np.unique(courses)
+    digests = []
+    for course_id in partition_ids.tolist():
+        rows = np.flatnonzero(courses == course_id)
+        indptr, positions = _take_rows(table.indptr, rows)
+        arrays = {
+            'item_ids': table.item_ids[rows],
+            'indptr': indptr,
+            'neighbour_ids': table.neighbour_ids[positions],
+            'scores': table.scores[positions],
+        }
+        if table.score_scales is not None:
+            arrays['score_scales'] = table.score_scales[rows]
+        digest = _digest(arrays)
+        digests.append(digest)
+        unchanged = previous is not None and previous.digest(course_id) == digest
+        _link_or_write(os.path.join(previous.path, _partition_file(course_id)) if unchanged else None,
+                       os.path.join(path, _partition_file(course_id)), arrays)
+    # item_ids are sorted, so the index can be searched as is
+    np.savez(os.path.join(path, _INDEX_FILE), lesson_ids=table.item_ids, courses=courses,
+             built_at=np.array(table.built_at), partition_ids=partition_ids,
+             digests=np.frombuffer(b''.join(digests), dtype=np.uint8).reshape(len(digests), 16))
+
+    temporary = os.path.join(directory, _CURRENT_FILE + '.tmp')
+    with open(temporary, 'w') as f:
+        f.write(name)
+    os.replace(temporary, os.path.join(directory, _CURRENT_FILE))
+
+    for _, old in _generations(directory)[:-_KEEP_GENERATIONS]:
+        shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def _generations(directory: str) -> List[Tuple[int, str]]:
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith('gen-') and name[4:].isdigit():
+            found.append((int(name[4:]), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def current_generation(directory: str = PARTITION_DIR) -> Optional[str]:
+    """Path of the live generation, if one was ever published."""
+    try:
+        with open(os.path.join(directory, _CURRENT_FILE)) as f:
+            path = os.path.join(directory, f.read().strip())
+    except OSError:
+        return None
+    return path if os.path.exists(os.path.join(path, _INDEX_FILE)) else None
+
+
+class PartitionedNeighbours:
+    """
+    Lesson neighbour lookups over one generation of per-course partitions,
+    with an LRU of resident partitions bounded by ``budget_bytes``.
+    """
+
+    def __init__(self, path: str, budget_bytes: int = PARTITION_BUDGET_BYTES):
+        self.path = path
+        self.budget_bytes = budget_bytes
+        with np.load(os.path.join(path, _INDEX_FILE)) as index:
+            self.lesson_ids = index['lesson_ids']
+            self.courses = index['courses']
+            self.built_at = float(index['built_at'])
+            # Generations written before digests were recorded have none
+            self._digests = (dict(zip(index['partition_ids'].tolist(), map(bytes, index['digests'])))
+                             if 'digests' in index.files else {})
+        self.partition_ids = np.unique(self.courses)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resident_bytes = 0
+        self._resident: 'OrderedDict[int, NeighbourTable]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lesson_ids)
+
+    def course_of(self, lesson_id: int) -> Optional[int]:
+        index = int(np.searchsorted(self.lesson_ids, lesson_id))
+        if index >= len(self.lesson_ids) or self.lesson_ids[index] != lesson_id:
+            return None
+        return int(self.courses[index])
+
+    def lesson_courses(self) -> Dict[int, int]:
+        """Lesson -> course assignments of this generation (unassigned lessons left out)."""
+        assigned = self.courses != UNASSIGNED_COURSE
+        return dict(zip(self.lesson_ids[assigned].tolist(), self.courses[assigned].tolist()))
+
+    def digest(self, course_id: int) -> Optional[bytes]:
+        """Content digest of a partition (None if unknown)."""
+        return self._digests.get(course_id)
+
+    def is_resident(self, item_id: int) -> bool:
+        """Whether a lookup of ``item_id`` needs no disk read."""
+        course_id = self.course_of(item_id)
+        return course_id is None or course_id in self._resident
+
+    def partition(self, course_id: int) -> NeighbourTable:
+        with self._lock:
+            table = self._resident.get(course_id)
+            if table is not None:
+                self._resident.move_to_end(course_id)
+                self.hits += 1
+                return table
+            self.misses += 1
+            table = self._load(course_id)
+            self._admit(course_id, table)
+            return table
+
+    def _admit(self, course_id: int, table: NeighbourTable):
+        self._resident[course_id] = table
+        self.resident_bytes += table.nbytes
+        # Always keep the partition just added, even if it alone exceeds the budget
+        while self.resident_bytes > self.budget_bytes and len(self._resident) > 1:
+            _, evicted = self._resident.popitem(last=False)
+            self.resident_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _load(self, course_id: int) -> NeighbourTable:
+        try:
+            with np.load(os.path.join(self.path, _partition_file(course_id))) as arrays:
+                return NeighbourTable(arrays['item_ids'], arrays['indptr'], arrays['neighbour_ids'],
+                                      arrays['scores'], built_at=self.built_at,
+                                      score_scales=arrays['score_scales'] if 'score_scales' in arrays.files else None)
+        except OSError as e:
+            # A newer generation may have replaced this one on disk
+            logger.error(f"Missing partition {course_id} in {self.path}: {e}")
+            return NeighbourTable.from_rows([])
+
+    def lookup(self, item_id: int, limit: int = NEIGHBOURS_PER_ITEM) -> List[Tuple[int, float]]:
+        """Neighbours of a lesson, best first (empty if the lesson is unknown)."""
+        course_id = self.course_of(item_id)
+        if course_id is None:
+            return []
+        return self.partition(course_id).lookup(item_id, limit)
+
+    def resident_courses(self) -> List[int]:
+        """Resident partitions, most recently used last."""
+        with self._lock:
+            return list(self._resident)
+
+    def warm(self, course_ids: Iterable[int]):
+        """Load partitions ahead of traffic."""
+        known = set(self.partition_ids.tolist())
+        for course_id in course_ids:
+            if course_id in known:
+                self.partition(course_id)
+
+    def take_over(self, previous: 'PartitionedNeighbours'):
+        """
+        Make the previous generation's hot set resident here, in the same LRU
+        order: unchanged partitions reuse its tables, changed ones are loaded.
+        """
+        with previous._lock:
+            resident = list(previous._resident.items())
+        known = set(self.partition_ids.tolist())
+        for course_id, table in resident:
+            if course_id not in known:
+                continue
+            digest = self.digest(course_id)
+            if digest is not None and digest == previous.digest(course_id):
+                with self._lock:
+                    if course_id not in self._resident:
+                        self._admit(course_id, table)
+            else:
+                self.partition(course_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'generation': os.path.basename(self.path),
+            'lessons': len(self),
+            'partitions': len(self.partition_ids),
+            'resident_partitions': len(self._resident),
+            'resident_bytes': self.resident_bytes,
+            'budget_bytes': self.budget_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,152 @@
+"""
+Precomputed item-item neighbour tables.
+
+Each table keeps the top-K neighbours of every item in flat CSR-style arrays
+(sorted item ids, row offsets, neighbour ids, scores), so answering "items
+similar to X" is a binary search plus an array slice. Neighbour ids are int32
+(ids are INTEGER columns) and scores are stored at REC_NEIGHBOUR_PRECISION
+(see quantization.py), dequantized per looked-up row.
+"""
+import os
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from quantization import quantize_segments
+
+NEIGHBOURS_PER_ITEM = int(os.getenv('REC_NEIGHBOURS_PER_ITEM', '20'))
+NEIGHBOURS_REFRESH_SECONDS = int(os.getenv('REC_NEIGHBOURS_REFRESH_SECONDS', '300'))
+# float32, float16 or int8 (one scale per item)
+NEIGHBOUR_PRECISION = os.getenv('REC_NEIGHBOUR_PRECISION', 'float16')
+
+
+class NeighbourTable:
+    """
+    Immutable top-K neighbour lists for a set of items.
+    """
+
+    def __init__(self, item_ids: np.ndarray, indptr: np.ndarray,
+                 neighbour_ids: np.ndarray, scores: np.ndarray,
+                 built_at: Optional[float] = None, score_scales: Optional[np.ndarray] = None):
+        self.item_ids = item_ids
+        self.indptr = indptr
+        self.neighbour_ids = neighbour_ids
+        self.scores = scores
+        # Per-item scales of int8 scores, None otherwise
+        self.score_scales = score_scales
+        self.built_at = built_at if built_at is not None else time.time()
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.item_ids, self.indptr, self.neighbour_ids, self.scores, self.score_scales)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, np.ndarray, np.ndarray]],
+                  k: int = NEIGHBOURS_PER_ITEM, precision: str = NEIGHBOUR_PRECISION) -> 'NeighbourTable':
+        """
+        Build a table from (item_id, candidate_ids, candidate_scores) rows,
+        keeping the ``k`` best-scored candidates of each item.
+        """
+        item_ids, lengths, neighbour_chunks, score_chunks = [], [], [], []
+        for item_id, candidates, scores in rows:
+            if not len(candidates):
+                continue
+            keep = top_k_indices(scores, k)
+            item_ids.append(item_id)
+            lengths.append(len(keep))
+            neighbour_chunks.append(np.asarray(candidates)[keep])
+            score_chunks.append(np.asarray(scores)[keep])
+
+        if not item_ids:
+            return cls(np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                       np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+
+        order = np.argsort(item_ids, kind='stable')
+        indptr = np.zeros(len(item_ids) + 1, dtype=np.int64)
+        np.cumsum(np.asarray(lengths)[order], out=indptr[1:])
+        scores, score_scales = quantize_segments(
+            np.concatenate([score_chunks[i] for i in order]), indptr, precision
+        )
+        return cls(
+            np.asarray(item_ids, dtype=np.int64)[order],
+            indptr,
+            np.concatenate([neighbour_chunks[i] for i in order]).astype(np.int32),
+            scores,
+            score_scales=score_scales,
+        )
+
+    def lookup(self, item_id: int, limit: int = NEIGHBOURS_PER_ITEM) -> List[Tuple[int, float]]:
+        """Neighbours of ``item_id``, best first (empty if the item is unknown)."""
+        index = int(np.searchsorted(self.item_ids, item_id))
+        if index >= len(self.item_ids) or self.item_ids[index] != item_id:
+            return []
+        start = self.indptr[index]
+        end = min(self.indptr[index + 1], start + limit)
+        scores = self.scores[start:end].astype(np.float32)
+        if self.score_scales is not None:
+            scores *= self.score_scales[index]
+        return list(zip(self.neighbour_ids[start:end].tolist(), scores.tolist()))
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` highest scores, best first."""
+    scores = np.asarray(scores)
+    if len(scores) > k:
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates], kind='stable')[::-1]]
+
+
+def build_lesson_neighbours(similarity, k: int = NEIGHBOURS_PER_ITEM) -> NeighbourTable:
+    """Snapshot the online lesson co-occurrence index into a neighbour table."""
+    def rows():
+        for lesson_id in similarity.item_ids():
+            neighbours = similarity.neighbours(lesson_id)
+            yield (
+                lesson_id,
+                np.fromiter(neighbours.keys(), dtype=np.int64, count=len(neighbours)),
+                np.fromiter(neighbours.values(), dtype=np.float32, count=len(neighbours)),
+            )
+    return NeighbourTable.from_rows(rows(), k)
+
+
+def build_course_neighbours(graph, k: int = NEIGHBOURS_PER_ITEM) -> NeighbourTable:
+    """
+    "Students also took": cosine similarity between courses over the sets of
+    users connected to them in the user-course graph.
+    """
+    user_courses, course_users = graph.user_courses, graph.course_users
+    n_courses = len(graph.course_ids)
+    sizes = np.diff(course_users.indptr).astype(np.float64)
+
+    def rows():
+        for course in range(n_courses):
+            edges, _ = user_courses.edges_of(course_users.row(course))
+            shared = np.bincount(user_courses.indices[edges], minlength=n_courses).astype(np.float64)
+            shared[course] = 0.0
+            others = np.flatnonzero(shared)
+            scores = shared[others] / np.sqrt(sizes[course] * sizes[others])
+            yield int(graph.course_ids[course]), graph.course_ids[others], scores
+
+    return NeighbourTable.from_rows(rows(), k)
+
+
+def recommend_from_neighbours(table: NeighbourTable, item_ids: Iterable[int], limit: int,
+                              per_item: int = NEIGHBOURS_PER_ITEM) -> List[Tuple[int, float]]:
+    """
+    Rank the neighbours of a set of items by summed similarity, leaving out
+    the items themselves.
+    """
+    known = set(int(item_id) for item_id in item_ids)
+    scores = {}
+    for item_id in known:
+        for neighbour_id, score in table.lookup(item_id, per_item):
+            if neighbour_id not in known:
+                scores[neighbour_id] = scores.get(neighbour_id, 0.0) + score
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
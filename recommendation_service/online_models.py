@@ -0,0 +1,157 @@
+"""
+In-memory recommendation models fed by interaction events.
+"""
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from feature_store import (
+    INTERACTION_TYPES, TAG_AFFINITY, TAG_BUCKETS, FeatureStore, interaction_type_code
+)
+from impression_store import ImpressionStore, lesson_key
+from item_similarity import CooccurrenceIndex
+from mastery_store import MasteryStore
+from session_store import SessionStore, recency_weights, score_session
+
+
+SESSION_REASON = "Baseado na sua sessão de estudo atual"
+HISTORY_REASON = "Baseado nas suas lições recentes"
+
+# Boost of a session_knn_features candidate whose tags match the user's
+# strongest tag affinity (score x (1 + weight))
+FEATURE_AFFINITY_WEIGHT = float(os.getenv('REC_FEATURE_AFFINITY_WEIGHT', '0.5'))
+# Candidates taken from session kNN per requested item before re-ranking
+_FEATURE_CANDIDATES = 3
+
+_BUCKET_BITS = np.arange(TAG_BUCKETS, dtype=np.uint32)
+# Ranges of the stores' columns (int32 lesson ids, uint32 epoch seconds)
+_INT32_MAX = np.iinfo(np.int32).max
+_INT64_MAX = np.iinfo(np.int64).max
+_UINT32_MAX = np.iinfo(np.uint32).max
+
+
+def check_interaction(user_id: int, lesson_id: int, timestamp: float, type_code: int,
+                      score: Optional[float], tags: int):
+    """Raise ValueError if an interaction does not fit the model stores."""
+    if not 0 <= user_id <= _INT64_MAX:
+        raise ValueError(f"user_id out of range: {user_id}")
+    if not 0 <= lesson_id <= _INT32_MAX:
+        raise ValueError(f"lesson_id out of range: {lesson_id}")
+    if not 0 <= timestamp <= _UINT32_MAX:
+        raise ValueError(f"timestamp out of range: {timestamp}")
+    if not 0 <= type_code < len(INTERACTION_TYPES):
+        raise ValueError(f"unknown interaction type code: {type_code}")
+    if score is not None and score == score and not math.isfinite(score):
+        raise ValueError(f"score must be finite: {score}")
+    if not 0 <= tags <= _UINT32_MAX:
+        raise ValueError(f"tag mask out of range: {tags}")
+
+
+class OnlineModels:
+    """
+    Bundles the per-user session buffers, the item similarity index, the
+    user feature store, the impression buffers and the mastery estimates so
+    every consumer (HTTP handlers, batch jobs) updates them the same way.
+    """
+
+    def __init__(self, sessions: Optional[SessionStore] = None,
+                 similarity: Optional[CooccurrenceIndex] = None,
+                 features: Optional[FeatureStore] = None,
+                 impressions: Optional[ImpressionStore] = None,
+                 mastery: Optional[MasteryStore] = None):
+        self.sessions = sessions or SessionStore()
+        self.similarity = similarity or CooccurrenceIndex()
+        self.features = features or FeatureStore()
+        self.impressions = impressions or ImpressionStore()
+        self.mastery = mastery or MasteryStore()
+
+    def apply_interaction(self, user_id: int, lesson_id: int, timestamp: float,
+                          type_code: int = interaction_type_code('view'),
+                          score: Optional[float] = None, tags: int = 0):
+        """
+        Update every model with a single interaction. ``type_code`` and
+        ``tags`` come from ``interaction_type_code`` and ``tag_mask``.
+        Raises ValueError (before touching any model) for out-of-range input.
+        """
+        check_interaction(user_id, lesson_id, timestamp, type_code, score, tags)
+        # Lessons in the same session co-occur; record before appending the new one
+        session_lessons, session_timestamps = self.sessions.current_session(user_id, now=timestamp)
+        self.similarity.add(lesson_id, session_lessons, recency_weights(session_timestamps, timestamp))
+        self.sessions.record(user_id, lesson_id, timestamp)
+        self.features.update(user_id, type_code, timestamp, score, tags)
+        self.impressions.click(user_id, lesson_key(lesson_id))
+        self.mastery.update(user_id, lesson_id, type_code, score, tags)
+
+    def user_features(self, user_id: int, now: Optional[float] = None) -> Optional[np.ndarray]:
+        """Feature vector of a user (see feature_store.FEATURE_NAMES)."""
+        return self.features.vector(user_id, now)
+
+    def recommend_with_features(self, user_id: int, limit: int,
+                                weight: float = FEATURE_AFFINITY_WEIGHT) -> List[Tuple[int, float]]:
+        """
+        Session (or history) kNN candidates re-ranked by the user's tag
+        affinity features: each candidate's score is scaled by
+        ``1 + weight * a``, where ``a`` is the mean affinity of the lesson's
+        tag buckets relative to the user's strongest bucket.
+        """
+        ranked, _ = self.recommend_session(user_id, limit * _FEATURE_CANDIDATES)
+        if not ranked:
+            ranked = self.recommend_history(user_id, limit * _FEATURE_CANDIDATES)
+        features = self.user_features(user_id)
+        if not ranked or features is None:
+            return ranked[:limit]
+        affinity = features[TAG_AFFINITY]
+        if not affinity.any():
+            return ranked[:limit]
+
+        lesson_ids = [lesson_id for lesson_id, _ in ranked]
+        buckets = (self.mastery.lesson_tags(lesson_ids)[:, np.newaxis] >> _BUCKET_BITS) & 1
+        tagged = buckets.sum(axis=1)
+        lesson_affinity = np.divide(buckets @ affinity, tagged, out=np.zeros(len(ranked)), where=tagged > 0)
+        scores = np.array([score for _, score in ranked]) * (1 + weight * lesson_affinity / affinity.max())
+        order = np.argsort(-scores, kind='stable')[:limit]
+        return [(lesson_ids[i], float(scores[i])) for i in order]
+
+    def recommend_weak_skills(self, user_id: int, limit: int) -> List[Tuple[int, float]]:
+        """Rank lessons that exercise the user's least mastered skills."""
+        return self.mastery.weak_lessons(user_id, limit)
+
+    def last_activity(self, user_id: int) -> Optional[float]:
+        """Timestamp of the user's newest buffered interaction, if any."""
+        _, timestamps = self.sessions.history(user_id)
+        return float(timestamps[0]) if len(timestamps) else None
+
+    def recommend_session(self, user_id: int, limit: int,
+                          now: Optional[float] = None) -> Tuple[List[Tuple[int, float]], int]:
+        """
+        Rank lessons against the user's current study session.
+
+        Returns:
+            Tuple[List[Tuple[int, float]], int]: ranked (lesson_id, score)
+            pairs and the session length
+        """
+        lessons, timestamps = self.sessions.current_session(user_id, now=now)
+        return score_session(lessons, timestamps, self.similarity, limit=limit, now=now), len(lessons)
+
+    def recommend_history(self, user_id: int, limit: int) -> List[Tuple[int, float]]:
+        """Rank lessons against the user's whole buffer, weighted from the last activity."""
+        lessons, timestamps = self.sessions.history(user_id)
+        return rank_history(lessons, timestamps, self.similarity, limit)
+
+
+def rank_history(lessons: np.ndarray, timestamps: np.ndarray, similarity,
+                 limit: int) -> List[Tuple[int, float]]:
+    """Score a newest-first history with recency measured from its newest entry."""
+    if not len(lessons):
+        return []
+    return score_session(lessons, timestamps, similarity, limit=limit, now=float(timestamps[0]))
+
+
+def format_recommendations(ranked: List[Tuple[int, float]], reason: str) -> List[Dict[str, Any]]:
+    """Turn ranked (lesson_id, score) pairs into API recommendation items."""
+    return [
+        {"lesson_id": lesson_id, "score": round(score, 4), "reason": reason}
+        for lesson_id, score in ranked
+    ]
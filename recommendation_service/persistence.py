@@ -0,0 +1,245 @@
+"""
+Snapshot + write-ahead log persistence for the online models.
+
+Every interaction applied through ``ModelPersistence`` is also appended to a
+WAL segment as a fixed-size binary record. Periodically the whole model state
+is dumped to a single ``.npz`` snapshot and the WAL is rotated, so on startup
+the service loads the snapshot and replays only the segments written after it
+instead of rebuilding everything from recommendation_db.
+
+Layout of ``REC_STATE_DIR``:
+
+    snapshot.npz            latest complete snapshot (replaced atomically)
+    wal-00000042.v2.log     WAL segments, replayed from the snapshot's segment on
+"""
+import os
+import re
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from feature_store import FeatureStore
+from impression_store import ImpressionStore
+from item_similarity import CooccurrenceIndex
+from logging_config import get_logger, log_algorithm_event
+from mastery_store import MasteryStore
+from online_models import OnlineModels
+from session_store import SessionStore
+
+
+STATE_DIR = os.getenv('REC_STATE_DIR', 'state')
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv('REC_SNAPSHOT_INTERVAL_SECONDS', '300'))
+
+SNAPSHOT_FILE = 'snapshot.npz'
+SNAPSHOT_VERSION = 2
+
+# user_id, lesson_id, timestamp, interaction type code, score (NaN if none), tag mask
+WAL_RECORD = struct.Struct('<qqdBfI')
+WAL_DTYPE = np.dtype([
+    ('user_id', '<i8'), ('lesson_id', '<i8'), ('timestamp', '<f8'),
+    ('type_code', 'u1'), ('score', '<f4'), ('tags', '<u4'),
+])
+# Bumped with WAL_RECORD; segments of other formats are never replayed
+WAL_FORMAT = 2
+_WAL_NAME = re.compile(rf'^wal-(\d{{8}})\.v{WAL_FORMAT}\.log$')
+
+logger = get_logger('recommendation_service.persistence')
+
+
+class WriteAheadLog:
+    """
+    Append-only log of interactions split in numbered segments.
+
+    Records are flushed to the OS on every append (so they survive a process
+    crash) and fsynced when a segment is closed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.sequence: Optional[int] = None
+        self._file = None
+
+    def segment_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f'wal-{sequence:08d}.v{WAL_FORMAT}.log')
+
+    def segments(self) -> List[Tuple[int, str]]:
+        """Existing (sequence, path) segments, oldest first."""
+        found = []
+        for name in os.listdir(self.directory):
+            match = _WAL_NAME.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def open(self, sequence: int):
+        self.close()
+        self.sequence = sequence
+        self._file = open(self.segment_path(sequence), 'ab')
+
+    def append(self, user_id: int, lesson_id: int, timestamp: float,
+               type_code: int, score: Optional[float], tags: int):
+        self._file.write(WAL_RECORD.pack(
+            user_id, lesson_id, timestamp, type_code,
+            float('nan') if score is None else score, tags
+        ))
+        self._file.flush()
+
+    def rotate(self) -> int:
+        """Close the current segment and start the next one; returns its sequence."""
+        self.open(self.sequence + 1)
+        return self.sequence
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def discard_before(self, sequence: int):
+        """Delete the segments already covered by a snapshot."""
+        for number, path in self.segments():
+            if number < sequence:
+                os.remove(path)
+
+    @staticmethod
+    def read(path: str) -> np.ndarray:
+        """Records of a segment; a torn record at the end (crash mid-write) is dropped."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % WAL_DTYPE.itemsize
+        return np.frombuffer(data[:usable], dtype=WAL_DTYPE)
+
+
+def models_to_arrays(models: OnlineModels) -> Dict[str, np.ndarray]:
+    arrays = {}
+    components = (('sessions', models.sessions), ('similarity', models.similarity),
+                  ('features', models.features), ('impressions', models.impressions),
+                  ('mastery', models.mastery))
+    for prefix, component in components:
+        for key, value in component.to_arrays().items():
+            arrays[f'{prefix}.{key}'] = value
+    return arrays
+
+
+def _component(arrays, prefix: str) -> Dict[str, np.ndarray]:
+    return {key[len(prefix) + 1:]: arrays[key] for key in arrays.files if key.startswith(prefix + '.')}
+
+
+class ModelPersistence:
+    """
+    Owns the write path of the online models: applies each interaction and
+    logs it to the WAL under one lock, so a snapshot always matches the WAL
+    position it records.
+    """
+
+    def __init__(self, models: OnlineModels, directory: str = STATE_DIR):
+        self.models = models
+        self.directory = directory
+        self.wal = WriteAheadLog(directory)
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    def apply_interaction(self, user_id: int, lesson_id: int, timestamp: float,
+                          type_code: int, score: Optional[float] = None, tags: int = 0):
+        with self._lock:
+            self.models.apply_interaction(user_id, lesson_id, timestamp, type_code, score, tags)
+            self.wal.append(user_id, lesson_id, timestamp, type_code, score, tags)
+
+    def restore(self) -> Dict[str, float]:
+        """
+        Load the latest snapshot and replay the WAL written after it, then
+        open a fresh segment for new events. Call once, before serving.
+        """
+        started = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        first_segment, users = 0, 0
+        if os.path.exists(self.snapshot_path):
+            try:
+                first_segment, users = self._load_snapshot()
+            except (OSError, KeyError, ValueError) as e:
+                logger.error(f"Ignoring unreadable snapshot {self.snapshot_path}: {e}")
+        loaded = time.perf_counter()
+
+        replayed, last_segment = 0, first_segment - 1
+        for sequence, path in self.wal.segments():
+            last_segment = max(last_segment, sequence)
+            if sequence < first_segment:
+                continue
+            records = WriteAheadLog.read(path)
+            columns = [records[name].tolist() for name in WAL_DTYPE.names]
+            for user_id, lesson_id, timestamp, type_code, score, tags in zip(*columns):
+                self.models.apply_interaction(user_id, lesson_id, timestamp, type_code, score, tags)
+            replayed += len(records)
+
+        # Never append after a possibly torn record
+        self.wal.open(last_segment + 1)
+        stats = {
+            'snapshot_users': users,
+            'wal_records': replayed,
+            'snapshot_seconds': round(loaded - started, 3),
+            'replay_seconds': round(time.perf_counter() - loaded, 3),
+        }
+        log_algorithm_event(event_type="state_restored", algorithm="online_models", performance_data=stats)
+        return stats
+
+    def _load_snapshot(self) -> Tuple[int, int]:
+        with np.load(self.snapshot_path, allow_pickle=False) as arrays:
+            if int(arrays['meta.version']) != SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported snapshot version {int(arrays['meta.version'])}")
+            sessions = _component(arrays, 'sessions')
+            if sessions['lessons'].shape[1] != self.models.sessions.buffer_size:
+                raise ValueError("session buffer size changed since the snapshot was taken")
+            self.models.sessions = SessionStore.from_arrays(sessions, self.models.sessions.gap_seconds)
+            self.models.similarity = CooccurrenceIndex.from_arrays(_component(arrays, 'similarity'))
+            self.models.features = FeatureStore.from_arrays(_component(arrays, 'features'))
+            # Impressions are not in the WAL; snapshots taken before they existed lack them
+            impressions = _component(arrays, 'impressions')
+            if impressions:
+                self.models.impressions = ImpressionStore.from_arrays(impressions)
+            # Older snapshots lack mastery too; it then covers only the replayed WAL
+            mastery = _component(arrays, 'mastery')
+            if mastery:
+                self.models.mastery = MasteryStore.from_arrays(mastery)
+            return int(arrays['meta.wal_segment']), len(self.models.sessions)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Write a snapshot of the current state and drop the WAL segments it
+        covers. Safe to call while events keep arriving.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            segment = self.wal.rotate()
+            arrays = models_to_arrays(self.models)
+        captured = time.perf_counter()
+
+        arrays['meta.version'] = np.array(SNAPSHOT_VERSION)
+        arrays['meta.wal_segment'] = np.array(segment)
+        arrays['meta.created_at'] = np.array(time.time())
+        temporary = self.snapshot_path + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.snapshot_path)
+        self.wal.discard_before(segment)
+
+        stats = {
+            'users': len(arrays['sessions.user_ids']),
+            'pairs': len(arrays['similarity.pair_rows']),
+            'bytes': os.path.getsize(self.snapshot_path),
+            'lock_seconds': round(captured - started, 3),
+            'duration_seconds': round(time.perf_counter() - started, 3),
+        }
+        log_algorithm_event(event_type="state_snapshot", algorithm="online_models", performance_data=stats)
+        return stats
+
+    def close(self):
+        self.wal.close()
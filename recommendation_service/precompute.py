@@ -0,0 +1,266 @@
+"""
+Materialized top-N recommendations for recently active users.
+
+The batch job replays the interaction log from recommendation_db to build the
+item similarity index once, then fans the active users out to a process pool
+in contiguous user_id ranges. Each worker rebuilds the buffers of its own
+users, ranks them and upserts the rows into ``precomputed_recommendations``.
+
+Usage:
+    python precompute.py --days 30 --workers 4 --limit 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from database import ensure_schema, get_connection
+from item_similarity import CooccurrenceIndex
+from logging_config import log_algorithm_event
+from online_models import (
+    OnlineModels, HISTORY_REASON, format_recommendations, rank_history
+)
+from session_store import SessionStore
+
+
+PRECOMPUTE_ACTIVE_DAYS = int(os.getenv('REC_PRECOMPUTE_ACTIVE_DAYS', '30'))
+PRECOMPUTE_LIMIT = int(os.getenv('REC_PRECOMPUTE_LIMIT', '20'))
+PRECOMPUTE_WORKERS = int(os.getenv('REC_PRECOMPUTE_WORKERS', str(os.cpu_count() or 1)))
+# Rows older than this are recomputed online on the next request
+PRECOMPUTE_TTL_SECONDS = int(os.getenv('REC_PRECOMPUTE_TTL_SECONDS', '86400'))
+PRECOMPUTE_ALGORITHM = 'session_knn_history'
+
+_BATCH_SIZE = 1000
+_FETCH_SIZE = 10000
+
+# Similarity index shared by the pool workers, set by _init_worker
+_worker_similarity: Optional[CooccurrenceIndex] = None
+
+
+def _since(days: int) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def iter_interactions(since: datetime,
+                      user_range: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[int, int, float]]:
+    """
+    Stream (user_id, lesson_id, epoch) rows ordered by user and time through a
+    server-side cursor, so memory stays flat regardless of table size.
+    """
+    query = (
+        "SELECT user_id, lesson_id, EXTRACT(EPOCH FROM created_at) "
+        "FROM interactions WHERE created_at >= %s"
+    )
+    params: List[Any] = [since]
+    if user_range is not None:
+        query += " AND user_id BETWEEN %s AND %s"
+        params.extend(user_range)
+    query += " ORDER BY user_id, created_at"
+
+    with get_connection() as conn:
+        with conn.cursor(name='precompute_interactions') as cursor:
+            cursor.itersize = _FETCH_SIZE
+            cursor.execute(query, params)
+            for user_id, lesson_id, epoch in cursor:
+                yield user_id, lesson_id, float(epoch)
+
+
+def active_user_ids(since: datetime) -> List[int]:
+    """Ids of users with at least one interaction since ``since``, ascending."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT DISTINCT user_id FROM interactions WHERE created_at >= %s ORDER BY user_id",
+                (since,)
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def shard_user_ranges(user_ids: List[int], shards: int) -> List[Tuple[int, int]]:
+    """
+    Split ascending user ids into at most ``shards`` contiguous, inclusive
+    (first_id, last_id) ranges holding roughly the same number of users.
+    """
+    if not user_ids:
+        return []
+    shards = max(1, min(shards, len(user_ids)))
+    bounds = np.linspace(0, len(user_ids), shards + 1).astype(int)
+    return [
+        (user_ids[start], user_ids[end - 1])
+        for start, end in zip(bounds[:-1], bounds[1:])
+        if end > start
+    ]
+
+
+def build_similarity(since: datetime) -> CooccurrenceIndex:
+    """Replay the interaction log through the online models to build the index."""
+    models = OnlineModels()
+    for user_id, lesson_id, epoch in iter_interactions(since):
+        models.apply_interaction(user_id, lesson_id, epoch)
+    return models.similarity
+
+
+def save_recommendations(rows: List[Tuple[int, List[Dict[str, Any]]]],
+                         algorithm: str = PRECOMPUTE_ALGORITHM):
+    """Upsert precomputed rows keyed by user_id."""
+    if not rows:
+        return
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            execute_values(
+                cursor,
+                "INSERT INTO precomputed_recommendations (user_id, recommendations, algorithm, computed_at) "
+                "VALUES %s ON CONFLICT (user_id) DO UPDATE SET "
+                "recommendations = EXCLUDED.recommendations, "
+                "algorithm = EXCLUDED.algorithm, "
+                "computed_at = EXCLUDED.computed_at",
+                [(user_id, json.dumps(recs), algorithm) for user_id, recs in rows],
+                template="(%s, %s::jsonb, %s, now())",
+                page_size=_BATCH_SIZE,
+            )
+
+
+def fetch_precomputed(user_id: int) -> Optional[Dict[str, Any]]:
+    """Primary-key lookup of a user's precomputed row."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT recommendations, algorithm, EXTRACT(EPOCH FROM computed_at) "
+                "FROM precomputed_recommendations WHERE user_id = %s",
+                (user_id,)
+            )
+            row = cursor.fetchone()
+    if row is None:
+        return None
+    return {
+        'recommendations': row[0],
+        'algorithm': row[1],
+        'computed_at': float(row[2]),
+    }
+
+
+def is_fresh(row: Dict[str, Any], last_activity: Optional[float] = None,
+             now: Optional[float] = None) -> bool:
+    """
+    A row is fresh while it is younger than the TTL and no interaction
+    happened after it was computed.
+    """
+    now = time.time() if now is None else now
+    if now - row['computed_at'] > PRECOMPUTE_TTL_SECONDS:
+        return False
+    return last_activity is None or last_activity <= row['computed_at']
+
+
+def _init_worker(similarity_arrays: Dict[str, np.ndarray]):
+    # The index holds a lock and cannot be pickled; ship its arrays instead
+    global _worker_similarity
+    _worker_similarity = CooccurrenceIndex.from_arrays(similarity_arrays)
+
+
+def precompute_shard(user_range: Tuple[int, int], since: datetime, limit: int) -> int:
+    """Rank and store every active user in an inclusive user_id range."""
+    sessions = SessionStore()
+    for user_id, lesson_id, epoch in iter_interactions(since, user_range):
+        sessions.record(user_id, lesson_id, epoch)
+
+    rows = []
+    stored = 0
+    for user_id in sessions.user_ids():
+        lessons, timestamps = sessions.history(user_id)
+        ranked = rank_history(lessons, timestamps, _worker_similarity, limit)
+        rows.append((user_id, format_recommendations(ranked, HISTORY_REASON)))
+        if len(rows) >= _BATCH_SIZE:
+            save_recommendations(rows)
+            stored += len(rows)
+            rows = []
+    save_recommendations(rows)
+    return stored + len(rows)
+
+
+def precompute_user(models: OnlineModels, user_id: int, limit: int = PRECOMPUTE_LIMIT,
+                    days: int = PRECOMPUTE_ACTIVE_DAYS) -> List[Dict[str, Any]]:
+    """
+    Recompute and store a single user's row, e.g. after login or enrollment.
+    Falls back to the user's history in recommendation_db when this process
+    has not seen them yet.
+    """
+    lessons, timestamps = models.sessions.history(user_id)
+    if not len(lessons):
+        lessons, timestamps = load_user_history(user_id, _since(days), models.sessions.buffer_size)
+    recommendations = format_recommendations(
+        rank_history(lessons, timestamps, models.similarity, limit), HISTORY_REASON
+    )
+    save_recommendations([(user_id, recommendations)])
+    return recommendations
+
+
+def load_user_history(user_id: int, since: datetime, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Last ``size`` interactions of a user, newest first."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT lesson_id, EXTRACT(EPOCH FROM created_at) FROM interactions "
+                "WHERE user_id = %s AND created_at >= %s ORDER BY created_at DESC LIMIT %s",
+                (user_id, since, size)
+            )
+            rows = cursor.fetchall()
+    lessons = np.array([row[0] for row in rows], dtype=np.int32)
+    timestamps = np.array([float(row[1]) for row in rows], dtype=np.uint32)
+    return lessons, timestamps
+
+
+def run_precompute(days: int = PRECOMPUTE_ACTIVE_DAYS, workers: int = PRECOMPUTE_WORKERS,
+                   limit: int = PRECOMPUTE_LIMIT) -> int:
+    """Precompute recommendations for every user active in the last ``days``."""
+    started = time.perf_counter()
+    since = _since(days)
+    user_ids = active_user_ids(since)
+    ranges = shard_user_ranges(user_ids, workers)
+    similarity = build_similarity(since)
+
+    stored = 0
+    # spawn keeps inherited DB connections out of the workers
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, len(ranges)), mp_context=context,
+                             initializer=_init_worker, initargs=(similarity.to_arrays(),)) as executor:
+        futures = [executor.submit(precompute_shard, user_range, since, limit) for user_range in ranges]
+        for future in futures:
+            stored += future.result()
+
+    log_algorithm_event(
+        event_type="precompute_completed",
+        algorithm=PRECOMPUTE_ALGORITHM,
+        performance_data={
+            'duration_seconds': round(time.perf_counter() - started, 3),
+            'users': stored,
+            'shards': len(ranges),
+        },
+        details={'active_days': days, 'limit': limit}
+    )
+    return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute recommendations for active users")
+    parser.add_argument('--days', type=int, default=PRECOMPUTE_ACTIVE_DAYS,
+                        help="Only users active in the last N days")
+    parser.add_argument('--workers', type=int, default=PRECOMPUTE_WORKERS,
+                        help="Number of worker processes (one user_id range each)")
+    parser.add_argument('--limit', type=int, default=PRECOMPUTE_LIMIT,
+                        help="Recommendations stored per user")
+    args = parser.parse_args()
+
+    ensure_schema()
+    stored = run_precompute(days=args.days, workers=args.workers, limit=args.limit)
+    print(f"Precomputed recommendations for {stored} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Reduced-precision storage for model matrices.
+
+Factor / embedding matrices (one row per user or item) and ragged score rows
+are stored as float32, float16 or int8 with one float32 scale per row
+(``row ~= values * scale``, scale = max |row| / 127). Scoring dequantizes on
+the fly, one block of rows at a time, so the float32 copy of the matrix is
+never materialized:
+
+    float32   4 bytes/value   exact
+    float16   2 bytes/value   ~3 significant digits
+    int8      1 byte/value    + 4 bytes/row, ~1% of the row maximum
+
+For int8 the per-row scale factors out of a dot product, so a block is scored
+as ``(values @ query) * scales`` on the int8 values cast to float32. Where
+NumPy has no vectorized half-float conversion, float16 scans are several
+times slower than int8 ones (see benchmarks/bench_quantization.py).
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+_INT8_MAX = 127
+_BLOCK_ROWS = 4096
+
+
+def _check_precision(precision: str):
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+
+
+def quantize_rows(matrix: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Store a 2-D matrix at ``precision``.
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: stored values and the
+        float32 per-row scales (None unless int8)
+    """
+    _check_precision(precision)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if precision != 'int8':
+        return matrix.astype(precision), None
+    scales = np.abs(matrix).max(axis=1) / _INT8_MAX if matrix.size else np.zeros(len(matrix), dtype=np.float32)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    values = np.rint(matrix / scales[:, np.newaxis]).clip(-_INT8_MAX, _INT8_MAX).astype(np.int8)
+    return values, scales
+
+
+def quantize_segments(values: np.ndarray, indptr: np.ndarray,
+                      precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Store the ragged rows of a CSR array (``values[indptr[i]:indptr[i + 1]]``)
+    at ``precision``, with one scale per row for int8.
+    """
+    _check_precision(precision)
+    values = np.asarray(values, dtype=np.float32)
+    if precision != 'int8':
+        return values.astype(precision), None
+    lengths = np.diff(indptr)
+    maxima = np.zeros(len(lengths), dtype=np.float32)
+    filled = lengths > 0
+    if filled.any():
+        maxima[filled] = np.maximum.reduceat(np.abs(values), indptr[:-1][filled])
+    scales = np.where(maxima > 0, maxima / _INT8_MAX, 1.0).astype(np.float32)
+    stored = np.rint(values / np.repeat(scales, lengths)).clip(-_INT8_MAX, _INT8_MAX).astype(np.int8)
+    return stored, scales
+
+
+class QuantizedMatrix:
+    """
+    A row-major factor / embedding matrix stored at reduced precision.
+    """
+
+    def __init__(self, values: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.values = values
+        self.scales = scales
+
+    @classmethod
+    def from_float(cls, matrix: np.ndarray, precision: str = 'float16') -> 'QuantizedMatrix':
+        return cls(*quantize_rows(matrix, precision))
+
+    @property
+    def precision(self) -> str:
+        return self.values.dtype.name
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.values.shape
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def rows(self, index) -> np.ndarray:
+        """Dequantized float32 rows (``index`` is an int, slice or index array)."""
+        rows = self.values[index].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[index][..., np.newaxis]
+        return rows
+
+    def scores(self, query: np.ndarray, block_rows: int = _BLOCK_ROWS) -> np.ndarray:
+        """Dot product of every row with ``query`` (float32, one score per row)."""
+        query = np.asarray(query, dtype=np.float32)
+        out = np.empty(len(self.values), dtype=np.float32)
+        for start in range(0, len(self.values), block_rows):
+            end = start + block_rows
+            np.dot(self.values[start:end].astype(np.float32, copy=False), query, out=out[start:end])
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def top_k(self, query: np.ndarray, k: int,
+              exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows with the ``k`` highest scores against ``query``, best first.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: row indices and their scores
+        """
+        scores = self.scores(query)
+        if exclude is not None and len(exclude):
+            scores[exclude] = -np.inf
+        best = np.argpartition(scores, -k)[-k:] if len(scores) > k else np.arange(len(scores))
+        best = best[np.argsort(scores[best], kind='stable')[::-1]]
+        best = best[np.isfinite(scores[best])]
+        return best, scores[best]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {'values': self.values}
+        if self.scales is not None:
+            arrays['scales'] = self.scales
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'QuantizedMatrix':
+        return cls(arrays['values'], arrays.get('scales'))
@@ -0,0 +1,186 @@
+"""
+Per-user token-bucket rate limiting for the recommendation routes.
+
+Every user (the trusted ``X-User-Id`` set by the gateway, the same id
+``get_current_user`` returns) owns a bucket of ``REC_RATE_LIMIT_BURST``
+tokens refilled at ``REC_RATE_LIMIT_PER_MINUTE``; each request takes one token
+and a request that finds the bucket empty is answered 429 + Retry-After.
+
+The default store is a dict in the worker process (a few microseconds per
+check, see benchmarks/bench_rate_limit.py). With ``REC_RATE_LIMIT_STORE=postgres``
+the buckets live in an UNLOGGED table of recommendation_db and every check is
+one atomic UPSERT, so the limit holds across workers and replicas at the cost
+of a database round trip; while the database is unreachable the check falls
+back to the local buckets.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from database import DatabaseError, DatabaseUnavailable, get_connection
+from logging_config import get_logger
+
+
+RATE_LIMIT_PER_MINUTE = float(os.getenv('REC_RATE_LIMIT_PER_MINUTE', '120'))
+RATE_LIMIT_BURST = float(os.getenv('REC_RATE_LIMIT_BURST', '30'))
+# "memory" (per worker) or "postgres" (shared by every worker)
+RATE_LIMIT_STORE = os.getenv('REC_RATE_LIMIT_STORE', 'memory')
+RATE_LIMIT_PRUNE_SECONDS = int(os.getenv('REC_RATE_LIMIT_PRUNE_SECONDS', '60'))
+# After a failed round trip the shared store is skipped for this long
+_SHARED_RETRY_SECONDS = 30.0
+
+logger = get_logger('recommendation_service.rate_limit')
+
+
+class TokenBucketLimiter:
+    """
+    In-process token buckets: key -> [tokens, last refill (monotonic)].
+    """
+
+    # Checks are cheap enough to run on the event loop
+    blocking = False
+    store = "memory"
+
+    def __init__(self, per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST):
+        self.rate = per_minute / 60
+        self.burst = max(burst, 1.0)
+        self.allowed_total = 0
+        self.limited_total = 0
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """
+        Take one token from ``key``'s bucket.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise the seconds until
+            a token is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = [self.burst - 1, now]
+                self.allowed_total += 1
+                return 0.0
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                self.allowed_total += 1
+                return 0.0
+            bucket[0] = tokens
+            self.limited_total += 1
+        return (1 - tokens) / self.rate
+
+    def prune(self) -> int:
+        """Forget buckets that have refilled completely; returns how many."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, (tokens, updated) in self._buckets.items()
+                    if tokens + (now - updated) * self.rate >= self.burst]
+            for key in idle:
+                del self._buckets[key]
+        return len(idle)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'store': self.store,
+            'per_minute': self.rate * 60,
+            'burst': self.burst,
+            'tracked_keys': len(self._buckets),
+            'allowed_total': self.allowed_total,
+            'limited_total': self.limited_total,
+        }
+
+
+# One statement reads, refills and takes a token under the row lock. In the
+# UPDATE branch every expression sees the old row, so ``allowed`` and
+# ``tokens`` are computed from the same refill.
+_ACQUIRE_SQL = """
+INSERT INTO rate_limit_buckets AS bucket (key, tokens, allowed, updated_at)
+VALUES (%(key)s, %(burst)s - 1, TRUE, clock_timestamp())
+ON CONFLICT (key) DO UPDATE SET
+    tokens = CASE
+        WHEN LEAST(%(burst)s, bucket.tokens + EXTRACT(EPOCH FROM clock_timestamp() - bucket.updated_at) * %(rate)s) >= 1
+        THEN LEAST(%(burst)s, bucket.tokens + EXTRACT(EPOCH FROM clock_timestamp() - bucket.updated_at) * %(rate)s) - 1
+        ELSE LEAST(%(burst)s, bucket.tokens + EXTRACT(EPOCH FROM clock_timestamp() - bucket.updated_at) * %(rate)s)
+    END,
+    allowed = LEAST(%(burst)s, bucket.tokens + EXTRACT(EPOCH FROM clock_timestamp() - bucket.updated_at) * %(rate)s) >= 1,
+    updated_at = clock_timestamp()
+RETURNING allowed, tokens
+"""
+
+_PRUNE_SQL = """
+DELETE FROM rate_limit_buckets
+WHERE updated_at < clock_timestamp() - make_interval(secs => %(full_after)s)
+"""
+
+
+class PostgresTokenBucketLimiter(TokenBucketLimiter):
+    """
+    Token buckets shared through recommendation_db; local buckets are the
+    fallback while the database is unavailable.
+    """
+
+    # Each check is a database round trip: run it off the event loop
+    blocking = True
+    store = "postgres"
+
+    def __init__(self, per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST):
+        super().__init__(per_minute, burst)
+        self.fallback_total = 0
+        self._retry_at = 0.0
+
+    def acquire(self, key: str) -> float:
+        if time.monotonic() < self._retry_at:
+            self.fallback_total += 1
+            return super().acquire(key)
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(_ACQUIRE_SQL, {'key': key, 'burst': self.burst, 'rate': self.rate})
+                    allowed, tokens = cursor.fetchone()
+        except DatabaseUnavailable as e:
+            logger.error(f"Shared rate limit store unavailable, using local buckets: {e}")
+            self._retry_at = time.monotonic() + _SHARED_RETRY_SECONDS
+            self.fallback_total += 1
+            return super().acquire(key)
+        except DatabaseError as e:
+            # A statement error is about this key, not the store: keep using it
+            logger.error(f"Shared rate limit check failed for {key!r}, using local bucket: {e}")
+            self.fallback_total += 1
+            return super().acquire(key)
+
+        if allowed:
+            self.allowed_total += 1
+            return 0.0
+        self.limited_total += 1
+        return (1 - tokens) / self.rate
+
+    def prune(self) -> int:
+        pruned = super().prune()
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(_PRUNE_SQL, {'full_after': self.burst / self.rate})
+                    pruned += cursor.rowcount
+        except DatabaseError as e:
+            logger.error(f"Failed to prune shared rate limit buckets: {e}")
+        return pruned
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), fallback_total=self.fallback_total)
+
+
+def create_limiter(store: str = RATE_LIMIT_STORE) -> Optional[TokenBucketLimiter]:
+    """The limiter configured by the REC_RATE_LIMIT_* variables; None when disabled."""
+    if RATE_LIMIT_PER_MINUTE <= 0:
+        return None
+    if store == "postgres":
+        return PostgresTokenBucketLimiter()
+    if store != "memory":
+        logger.error(f"Unknown rate limit store {store!r}, using memory")
+    return TokenBucketLimiter()
@@ -0,0 +1,198 @@
+"""
+Session-aware state for the recommendation service.
+
+Keeps, for every user, a fixed-size ring buffer with the last N interactions
+(lesson id + timestamp). All buffers live in two shared NumPy matrices indexed
+by a user slot map, so the per-user cost is ``N * 8`` bytes plus a few bytes of
+bookkeeping (256 + 4 bytes with the default N=32).
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+SESSION_BUFFER_SIZE = int(os.getenv('REC_SESSION_BUFFER_SIZE', '32'))
+# Interactions separated by more than this gap belong to different sessions
+SESSION_GAP_SECONDS = int(os.getenv('REC_SESSION_GAP_SECONDS', '1800'))
+# Weight of an interaction halves every half-life
+SESSION_HALF_LIFE_SECONDS = float(os.getenv('REC_SESSION_HALF_LIFE_SECONDS', '600'))
+
+_INITIAL_CAPACITY = 1024
+
+
+class SessionStore:
+    """
+    Per-user ring buffers of recent interactions stored in compact arrays.
+    """
+
+    def __init__(self, buffer_size: int = SESSION_BUFFER_SIZE,
+                 gap_seconds: int = SESSION_GAP_SECONDS,
+                 initial_capacity: int = _INITIAL_CAPACITY):
+        if not 0 < buffer_size <= 255:
+            raise ValueError("buffer_size must be between 1 and 255")
+        self.buffer_size = buffer_size
+        self.gap_seconds = gap_seconds
+        self._slots: Dict[int, int] = {}
+        self._lessons = np.zeros((initial_capacity, buffer_size), dtype=np.int32)
+        # Seconds since epoch fit in uint32 until 2106
+        self._timestamps = np.zeros((initial_capacity, buffer_size), dtype=np.uint32)
+        self._head = np.zeros(initial_capacity, dtype=np.uint8)
+        self._size = np.zeros(initial_capacity, dtype=np.uint8)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def user_ids(self) -> List[int]:
+        """Ids of every user with a buffer."""
+        with self._lock:
+            return list(self._slots)
+
+    def _slot_for(self, user_id: int) -> int:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = len(self._slots)
+            if slot >= self._lessons.shape[0]:
+                self._grow()
+            self._slots[user_id] = slot
+        return slot
+
+    def _grow(self):
+        capacity = self._lessons.shape[0] * 2
+        self._lessons = _resize_rows(self._lessons, capacity)
+        self._timestamps = _resize_rows(self._timestamps, capacity)
+        self._head = _resize_rows(self._head, capacity)
+        self._size = _resize_rows(self._size, capacity)
+
+    def record(self, user_id: int, lesson_id: int, timestamp: Optional[float] = None):
+        """
+        Append an interaction to the user's ring buffer, overwriting the oldest
+        entry once the buffer is full.
+        """
+        ts = int(timestamp if timestamp is not None else time.time())
+        with self._lock:
+            slot = self._slot_for(user_id)
+            head = int(self._head[slot])
+            self._lessons[slot, head] = lesson_id
+            self._timestamps[slot, head] = ts
+            self._head[slot] = (head + 1) % self.buffer_size
+            if self._size[slot] < self.buffer_size:
+                self._size[slot] += 1
+
+    def history(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (lesson_ids, timestamps) for the buffered interactions of a user,
+        newest first.
+        """
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                return _EMPTY_LESSONS, _EMPTY_TIMESTAMPS
+            size = int(self._size[slot])
+            head = int(self._head[slot])
+            order = (head - 1 - np.arange(size)) % self.buffer_size
+            return self._lessons[slot, order], self._timestamps[slot, order]
+
+    def current_session(self, user_id: int, now: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the interactions of the user's current study session, newest
+        first. A session ends at the first gap longer than ``gap_seconds``; if
+        the newest interaction itself is older than the gap, the session is empty.
+        """
+        lessons, timestamps = self.history(user_id)
+        if not len(lessons):
+            return lessons, timestamps
+
+        now = time.time() if now is None else now
+        if now - float(timestamps[0]) > self.gap_seconds:
+            return _EMPTY_LESSONS, _EMPTY_TIMESTAMPS
+
+        gaps = timestamps[:-1].astype(np.int64) - timestamps[1:].astype(np.int64)
+        breaks = np.flatnonzero(gaps > self.gap_seconds)
+        end = int(breaks[0]) + 1 if len(breaks) else len(lessons)
+        return lessons[:end], timestamps[:end]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Copy of every tracked buffer as plain arrays (see ``from_arrays``)."""
+        with self._lock:
+            count = len(self._slots)
+            user_ids = np.fromiter(self._slots.keys(), dtype=np.int64, count=count)
+            slots = np.fromiter(self._slots.values(), dtype=np.int64, count=count)
+            return {
+                'user_ids': user_ids,
+                'lessons': self._lessons[slots],
+                'timestamps': self._timestamps[slots],
+                'head': self._head[slots],
+                'size': self._size[slots],
+            }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray],
+                    gap_seconds: int = SESSION_GAP_SECONDS) -> 'SessionStore':
+        """Rebuild a store from the output of ``to_arrays``."""
+        count, buffer_size = arrays['lessons'].shape
+        store = cls(buffer_size=buffer_size, gap_seconds=gap_seconds,
+                    initial_capacity=max(count, _INITIAL_CAPACITY))
+        store._slots = dict(zip(arrays['user_ids'].tolist(), range(count)))
+        store._lessons[:count] = arrays['lessons']
+        store._timestamps[:count] = arrays['timestamps']
+        store._head[:count] = arrays['head']
+        store._size[:count] = arrays['size']
+        return store
+
+    def memory_bytes(self) -> int:
+        """Bytes used by the buffers of the users currently tracked."""
+        per_user = (self._lessons.itemsize + self._timestamps.itemsize) * self.buffer_size + 2
+        return per_user * len(self._slots)
+
+
+_EMPTY_LESSONS = np.zeros(0, dtype=np.int32)
+_EMPTY_TIMESTAMPS = np.zeros(0, dtype=np.uint32)
+
+
+def _resize_rows(array: np.ndarray, capacity: int) -> np.ndarray:
+    resized = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    resized[:array.shape[0]] = array
+    return resized
+
+
+def recency_weights(timestamps: np.ndarray, now: Optional[float] = None,
+                    half_life: float = SESSION_HALF_LIFE_SECONDS) -> np.ndarray:
+    """Exponential recency weights: 1.0 for an interaction happening now."""
+    now = time.time() if now is None else now
+    age = np.maximum(now - timestamps.astype(np.float64), 0.0)
+    return np.power(0.5, age / half_life)
+
+
+def score_session(lessons: np.ndarray, timestamps: np.ndarray, similarity,
+                  limit: int = 10, now: Optional[float] = None,
+                  exclude: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+    """
+    Score candidate lessons by recency-weighted similarity to the session.
+
+    ``similarity`` must expose ``neighbours(lesson_id) -> Dict[int, float]``.
+    Lessons already in the session (and any in ``exclude``) are not returned.
+
+    Returns:
+        List[Tuple[int, float]]: (lesson_id, score) pairs, best first
+    """
+    if not len(lessons):
+        return []
+
+    weights = recency_weights(timestamps, now)
+    seen = set(int(lesson_id) for lesson_id in lessons)
+    if exclude:
+        seen.update(exclude)
+
+    scores: Dict[int, float] = {}
+    for lesson_id, weight in zip(lessons.tolist(), weights.tolist()):
+        for candidate, sim in similarity.neighbours(lesson_id).items():
+            if candidate in seen:
+                continue
+            scores[candidate] = scores.get(candidate, 0.0) + weight * sim
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return ranked[:limit]
@@ -0,0 +1,90 @@
+"""
+LRU cache of verified JWT claims.
+
+Entries are keyed by the SHA-256 digest of the token (the token itself is not
+kept) and live until the token's ``exp``, so a repeated Bearer token skips the
+RS256 signature check. Tokens without ``exp`` and failed verifications are
+never cached. Each entry keeps the token's ``kid``: callers check it is still
+in the JWKS on every hit, so a key revoked by the auth service stops being
+accepted once the keyset refreshes, not at ``exp``. ``stats()`` reports the hit ratio and the CPU time saved
+(hits x mean CPU cost of a verification).
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+TOKEN_CACHE_SIZE = int(os.getenv('REC_TOKEN_CACHE_SIZE', '10000'))
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class VerifiedTokenCache:
+    """
+    Verified claims by token digest, bounded (LRU) and expiring at ``exp``.
+    Used from the event loop only, so it takes no locks.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.verifications = 0
+        self.verify_cpu_seconds = 0.0
+        self._entries: 'OrderedDict[bytes, Tuple[float, str, Dict[str, Any]]]' = OrderedDict()
+
+    def get(self, digest: bytes) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Cached (kid, claims), or None (counted as a miss) if absent or
+        expired. Callers must check the kid is still published.
+        """
+        entry = self._entries.get(digest)
+        if entry is not None:
+            expires_at, kid, claims = entry
+            if time.time() < expires_at:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return kid, claims
+            del self._entries[digest]
+        self.misses += 1
+        return None
+
+    def discard(self, digest: bytes):
+        """Drop an entry whose signing key is gone (the hit becomes a miss)."""
+        if self._entries.pop(digest, None) is not None:
+            self.hits -= 1
+            self.misses += 1
+
+    def put(self, digest: bytes, kid: str, claims: Dict[str, Any], cpu_seconds: float = 0.0):
+        """Store claims of a token signed by ``kid``, verified at a cost of ``cpu_seconds``."""
+        self.verifications += 1
+        self.verify_cpu_seconds += cpu_seconds
+        exp = claims.get('exp')
+        if not isinstance(exp, (int, float)) or exp <= time.time() or self.max_entries <= 0:
+            return
+        self._entries[digest] = (float(exp), kid, claims)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        mean_verify = self.verify_cpu_seconds / self.verifications if self.verifications else 0.0
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'mean_verify_cpu_ms': round(mean_verify * 1000, 3),
+            'cpu_seconds_saved': round(self.hits * mean_verify, 3),
+        }
+
+
+token_cache = VerifiedTokenCache()